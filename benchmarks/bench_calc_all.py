@@ -0,0 +1,48 @@
+"""
+Check that calculator.calc_students scales linearly with the number of grade rows.
+
+Usage: uv run python -m benchmarks.bench_calc_all
+"""
+
+import argparse
+import tempfile
+import time
+
+from gpp_calculator import calculator, lectures, rules_toml
+
+from . import synth
+
+
+def run(n_students, grades_per_student, n_lectures):
+    toml = synth.make_rules()
+    lec = lectures.Lectures(toml, synth.make_lectures_df(n_lectures))
+    students_df = synth.make_students_df(n_students, grades_per_student, n_lectures)
+    with tempfile.TemporaryDirectory() as log_path:
+        start = time.perf_counter()
+        calculator.calc_students(
+            rules_toml.compile_rules(toml), lec, students_df, log_path
+        )
+        elapsed = time.perf_counter() - start
+    return len(students_df), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--students", type=int, default=250)
+    parser.add_argument("--grades", type=int, default=40)
+    parser.add_argument("--lectures", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'sec':>9} {'rows/sec':>10} {'usec/row':>9}")
+    for step in range(args.steps):
+        n_students = args.students * 2**step
+        rows, elapsed = run(n_students, args.grades, args.lectures)
+        print(
+            f"{rows:>10} {elapsed:>9.2f} {rows / elapsed:>10.0f}"
+            f" {elapsed / rows * 1e6:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare PersonalLectures.make_grades_df with the former regex-alternation lookup.
+
+Usage: uv run python -m benchmarks.bench_grades_lookup
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from gpp_calculator import lectures
+
+from . import synth
+
+
+def regex_grades_df(pl):
+    """The lookup make_grades_df used before lectures were indexed by key."""
+    pattern = "|".join(pl.grades_df[pl.key_col_name].tolist())
+    dst_df = pl.all_lectures_df[
+        pl.all_lectures_df[pl.key_col_name].str.fullmatch(pattern)
+    ]
+    dst_df = dst_df.merge(
+        pl.grades_df, on=pl.key_col_name, how="left", suffixes=("", "_student")
+    )
+    dst_df["point"] = dst_df[pl.credit_col_name].astype(float) * dst_df["GP"].astype(
+        float
+    )
+    dst_df[pl.category_col_name] = dst_df[pl.category_col_name].fillna("Closed")
+    return dst_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lectures", type=int, default=20000)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--grades", type=int, default=60)
+    args = parser.parse_args()
+
+    toml = synth.make_rules()
+    col = toml["columns_in_lectures"]
+    lec = lectures.Lectures(toml, synth.make_lectures_df(args.lectures))
+    students_df = synth.make_students_df(args.students, args.grades, args.lectures)
+    pl = lectures.PersonalLectures(
+        lec.get_lectures(),
+        col["key"],
+        col["category"],
+        col["credit"],
+        toml["columns_in_students"]["grade"],
+    )
+    groups = [df for _, df in students_df.groupby("Student ID", sort=False)]
+
+    regex_sec = 0.0
+    keyed_sec = 0.0
+    for grade_df in groups:
+        pl.set_grades(grade_df)
+        start = time.perf_counter()
+        expected = regex_grades_df(pl)
+        regex_sec += time.perf_counter() - start
+
+        start = time.perf_counter()
+        pl.make_grades_df()
+        keyed_sec += time.perf_counter() - start
+        pd.testing.assert_frame_equal(pl.my_lectures_df, expected)
+
+    print(f"catalog rows: {args.lectures}  students: {len(groups)}")
+    print(f"regex: {regex_sec:.3f} sec  keyed: {keyed_sec:.3f} sec")
+    print(f"speedup: x{regex_sec / keyed_sec:.1f}")
+
+
+if __name__ == "__main__":
+    main()
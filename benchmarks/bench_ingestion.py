@@ -0,0 +1,64 @@
+"""
+Compare memory and read time of str-only and typed ingestion of both CSVs.
+
+Usage: uv run python -m benchmarks.bench_ingestion
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from gpp_calculator.input_formatting import preprocess
+
+from . import synth
+
+
+def measure(read, *args, **kwargs):
+    start = time.perf_counter()
+    df = read(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    return len(df), elapsed, df.memory_usage(deep=True).sum() / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lectures", type=int, default=20000)
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--grades", type=int, default=60)
+    args = parser.parse_args()
+
+    toml = synth.make_rules()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lectures_csv_path = os.path.join(tmp_dir, "lectures.csv")
+        students_csv_path = os.path.join(tmp_dir, "students.csv")
+        synth.make_lectures_df(args.lectures).to_csv(lectures_csv_path, index=False)
+        synth.make_students_df(args.students, args.grades, args.lectures).to_csv(
+            students_csv_path, index=False
+        )
+
+        cases = [
+            ("lectures", preprocess.read_lectures_csv, lectures_csv_path, None),
+            ("lectures", preprocess.read_lectures_csv, lectures_csv_path, "typed"),
+            ("students", preprocess.read_students_csv, students_csv_path, None),
+            ("students", preprocess.read_students_csv, students_csv_path, "typed"),
+        ]
+        print(
+            f"{'table':<9} {'dtype':<6} {'rows':>8} {'sec':>6} {'rows/sec':>10} {'MiB':>7}"
+        )
+        for table, read, path, mode in cases:
+            if mode is None:
+                dtype = str
+            elif table == "lectures":
+                dtype = preprocess.lectures_dtype(toml)
+            else:
+                dtype = preprocess.students_dtype(toml)
+            rows, elapsed, mib = measure(read, path, "utf-8", dtype=dtype)
+            print(
+                f"{table:<9} {mode or 'str':<6} {rows:>8} {elapsed:>6.2f}"
+                f" {rows / elapsed:>10.0f} {mib:>7.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Micro-benchmark of lectures.select_lecture_to_knapsack against the row-by-row
+implementation it replaced. tests/test_knapsack.py checks that both agree.
+
+Usage: uv run python -m benchmarks.bench_knapsack
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from gpp_calculator import lectures
+
+COL_NAMES = {"key": "Lecture ID", "credit": "Credits"}
+
+
+def reference_select_lecture_to_knapsack(
+    src_df: pd.DataFrame, max_credits: float, col_names: dict
+):
+    """The row-by-row implementation select_lecture_to_knapsack replaced."""
+
+    selected_df = pd.DataFrame(columns=src_df.columns)
+
+    # Step 1: Sort the DataFrame based on priority
+    # If 'is_home' column exists, prioritize False values first, then by GP
+    if "is_home" in src_df.columns:
+        sorted_df = src_df.sort_values(
+            by=["is_home", "GP", col_names["credit"]],
+            ascending=[True, False, True],
+        ).reset_index(drop=True)
+    else:
+        # If column doesn't exist, just sort by GP (high to low)
+        sorted_df = src_df.sort_values(
+            by=["GP", col_names["credit"]], ascending=[False, True]
+        ).reset_index(drop=True)
+
+    # Step 2: Select lectures to maximize points while staying within credit limit
+    total_credits = 0
+    idx = 0
+    next_idx = None
+    for idx, row in sorted_df.iterrows():
+        if total_credits + row[col_names["credit"]] > max_credits:
+            next_idx = idx
+            break
+        selected_df = pd.concat([selected_df, row.to_frame().T], ignore_index=False)
+        total_credits += row[col_names["credit"]]
+    if next_idx is None:
+        next_idx = idx + 1
+    # for debugging
+    # print(f"Total credits after selection: {total_credits}")
+
+    # Step 3: If we haven't reached the minimum credits, add one more lectures from idx
+    if total_credits < max_credits and next_idx < len(sorted_df):
+        if selected_df.empty:
+            selected_df = lectures.appended_to_empty(sorted_df.loc[[next_idx]])
+        else:
+            selected_df = pd.concat(
+                [selected_df, sorted_df.loc[[next_idx]]], ignore_index=False
+            )
+        total_credits += sorted_df.loc[next_idx, col_names["credit"]]
+
+    # Extract unselected lecture information
+    unselected_df = sorted_df[~sorted_df.index.isin(selected_df.index)]
+
+    # Step 4: If we exceed the max credits, split the last lecture
+    if total_credits > max_credits:
+        over_credits = total_credits - max_credits
+
+        last_row = selected_df.iloc[-1].copy()
+        org_last_row = last_row.copy()
+        # update 'credit' and 'point' columns
+        last_row[col_names["credit"]] = org_last_row[col_names["credit"]] - over_credits
+        last_row["point"] = org_last_row["point"] - over_credits * org_last_row["GP"]
+
+        selected_df.iloc[-1] = last_row
+
+        # Add the split lecture to unselected_df
+        unselected_row = org_last_row.copy()
+        unselected_row[col_names["key"]] = org_last_row[col_names["key"]] + "-sep"
+        unselected_row[col_names["credit"]] = total_credits - max_credits
+        unselected_row["point"] = over_credits * unselected_row["GP"]
+        unselected_df = pd.concat(
+            [unselected_df, unselected_row.to_frame().T], ignore_index=False
+        )
+
+    return selected_df, unselected_df
+
+
+def make_lectures(rng, n_rows, with_is_home):
+    df = pd.DataFrame(
+        {
+            "Lecture ID": [f"L{i:04d}" for i in range(n_rows)],
+            "Category": rng.choice(["A", "B", "C"], n_rows),
+            "Credits": rng.choice([0.5, 1.0, 1.5, 2.0, 4.0], n_rows),
+            "GP": rng.choice([0.0, 1.0, 2.0, 3.0, 4.0], n_rows),
+        }
+    )
+    df["point"] = df["Credits"] * df["GP"]
+    if with_is_home:
+        df["is_home"] = rng.random(n_rows) < 0.3
+    return df
+
+
+def timeit(func, src_df, max_credits, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(src_df, max_credits, COL_NAMES)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'rows':>6} {'reference ms':>13} {'vectorized ms':>14} {'speedup':>8}")
+    for n_rows in [10, 40, 160]:
+        src_df = make_lectures(rng, n_rows, True)
+        max_credits = float(src_df["Credits"].sum() / 2)
+        ref = timeit(
+            reference_select_lecture_to_knapsack, src_df, max_credits, args.repeat
+        )
+        vec = timeit(
+            lectures.select_lecture_to_knapsack, src_df, max_credits, args.repeat
+        )
+        print(f"{n_rows:>6} {ref * 1e3:>13.2f} {vec * 1e3:>14.2f} {ref / vec:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
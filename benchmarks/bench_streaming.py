@@ -0,0 +1,60 @@
+"""
+Compare peak memory of reading students.csv whole and streaming it in chunks.
+
+Usage: uv run python -m benchmarks.bench_streaming
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from gpp_calculator import calculator
+from gpp_calculator.input_formatting import preprocess
+
+from . import synth
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    n_students = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return n_students, elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--grades", type=int, default=40)
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    students_df = synth.make_students_df(args.students, args.grades, 2000)
+    students_df = students_df.sort_values("Student ID", kind="stable")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "students.csv")
+        students_df.to_csv(csv_path, index=False)
+        del students_df
+
+        def read_whole():
+            df = preprocess.read_students_csv(csv_path, "utf-8")
+            return sum(1 for _ in calculator.iter_student_grades(df, "Student ID"))
+
+        def read_stream():
+            stream = preprocess.StudentsCsvStream(
+                csv_path, "utf-8", "Student ID", chunksize=args.chunk_rows
+            )
+            return sum(1 for _ in stream)
+
+        print(f"{'mode':<8} {'students':>9} {'sec':>7} {'peak MiB':>9}")
+        for name, func in [("whole", read_whole), ("stream", read_stream)]:
+            n_students, elapsed, peak = measure(func)
+            print(f"{name:<8} {n_students:>9} {elapsed:>7.2f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
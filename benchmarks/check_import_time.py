@@ -0,0 +1,81 @@
+"""
+Enforce the import-time budget of gpp_calculator entry points with -X importtime.
+
+Each module is imported in a fresh interpreter. The check fails if its
+cumulative import time exceeds the budget or if it pulls in a module that
+belongs to another code path (e.g. tkinter while only calculating).
+
+Usage: uv run python -m benchmarks.check_import_time [--scale 2.0]
+tests/test_import_time.py checks the imported modules, not the time, under pytest.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# module: (budget in milliseconds, top-level packages it must not import)
+BUDGETS = {
+    "gpp_calculator.cli": (100, {"pandas", "numpy", "tkinter", "ttkthemes"}),
+    "gpp_calculator.rules_toml": (100, {"pandas", "numpy", "tkinter", "ttkthemes"}),
+    "gpp_calculator.calculator": (1500, {"tkinter", "ttkthemes"}),
+    "gpp_calculator.lectures": (1500, {"tkinter", "ttkthemes"}),
+    # The window opens before pandas is needed
+    "gpp_calculator.app_calculator": (300, {"pandas", "numpy"}),
+}
+
+
+def measure(module):
+    """
+    :return: cumulative import time in milliseconds, set of imported top-level packages
+    """
+    src_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src_path, env.get("PYTHONPATH")]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    total_us = None
+    packages = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        packages.add(name.strip().split(".")[0])
+        if name.strip() == module:
+            total_us = int(cumulative)
+    return total_us / 1000, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiply every budget by this"
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for module, (budget_ms, forbidden) in BUDGETS.items():
+        # best of three, to keep disk cache effects out of the number
+        results = [measure(module) for _ in range(3)]
+        elapsed_ms = min(r[0] for r in results)
+        unexpected = sorted(results[0][1] & forbidden)
+        ok = elapsed_ms <= budget_ms * args.scale and not unexpected
+        failed |= not ok
+        status = "OK  " if ok else "FAIL"
+        print(
+            f"{status} {module:<28} {elapsed_ms:>7.1f} ms / {budget_ms * args.scale:.0f} ms"
+        )
+        if unexpected:
+            print(f"     imports {', '.join(unexpected)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
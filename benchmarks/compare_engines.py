@@ -0,0 +1,321 @@
+"""
+Compare per-student results of the reference calculation with another engine, reporting the first diverging category step.
+
+An engine is a function engine(toml, lec, students_df, traces) returning the
+list of result dictionaries, like calculator.calc_students, and optionally
+filling traces with the trace of each student (see report.py). Engines are
+given by name (see ENGINES) or as "package.module:function".
+
+The reference side is either the reference engine run now, or a golden file
+saved earlier with --save-golden, e.g. on the commit before an optimization.
+tests/test_compare_engines.py runs the cohort engine against the reference
+at a reduced small scale under pytest.
+
+Usage:
+    uv run python -m benchmarks.compare_engines --engine parallel --scale small --seeds 5
+    uv run python -m benchmarks.compare_engines --engine cohort --scale regex --seeds 3
+    uv run python -m benchmarks.compare_engines --engine parallel \\
+        --lectures lectures.csv --students students.csv --rules rules.toml
+    uv run python -m benchmarks.compare_engines --scale small --save-golden golden.json
+    uv run python -m benchmarks.compare_engines --scale small --golden golden.json
+"""
+
+import argparse
+import contextlib
+import copy
+import importlib
+import json
+import math
+import os
+import sys
+import tempfile
+import tomllib
+
+from gpp_calculator import calculator, lectures, rules_toml
+
+from . import suite, synth
+
+# How each result field is compared: "exact", or "close" within --rtol/--atol
+FIELD_RULES = {
+    "student_name": "exact",
+    "gpp": "close",
+    "gpa": "exact",
+    "total_credits": "close",
+    "extrapolate_gpp": "close",
+    "credits_in_pool": "close",
+}
+
+
+def _calc_students(toml, lec, students_df, traces, **params):
+    toml = copy.deepcopy(toml)
+    toml["params"]["incremental"] = False
+    toml["params"].update(params)
+    rules = rules_toml.compile_rules(toml)
+    with tempfile.TemporaryDirectory() as log_path:
+        return calculator.calc_students(
+            rules, lec, students_df, log_path, traces=traces
+        )
+
+
+def reference_engine(toml, lec, students_df, traces):
+    return _calc_students(toml, lec, students_df, traces, workers=1)
+
+
+def parallel_engine(toml, lec, students_df, traces):
+    return _calc_students(toml, lec, students_df, traces, workers=os.cpu_count() or 1)
+
+
+def cohort_engine(toml, lec, students_df, traces):
+    return _calc_students(toml, lec, students_df, traces, engine="cohort")
+
+
+ENGINES = {
+    "reference": reference_engine,
+    "parallel": parallel_engine,
+    "cohort": cohort_engine,
+}
+
+
+def load_engine(name):
+    if name in ENGINES:
+        return ENGINES[name]
+    module_name, _, func_name = name.partition(":")
+    if not func_name:
+        raise ValueError(f"Unknown engine: {name}")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _plain(value):
+    # NumPy scalars and missing names, as they come out of json.load
+    if isinstance(value, str) or value is None:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def run_engine(engine, toml, lec, students_df):
+    """
+    :return: Results and traces, keyed by student ID as a string
+    """
+    traces = {}
+    calc_res = engine(toml, lec, students_df, traces)
+    results = {
+        str(res["student_id"]): {k: _plain(v) for k, v in res.items()}
+        for res in calc_res
+    }
+    # Round-trip through JSON so that both sides compare as a golden file would
+    traces = json.loads(json.dumps({str(k): v for k, v in traces.items()}))
+    return results, traces
+
+
+def _same(a, b, rule, rtol, atol):
+    numbers = (
+        isinstance(a, (int, float))
+        and isinstance(b, (int, float))
+        and not isinstance(a, bool)
+        and not isinstance(b, bool)
+    )
+    if not numbers:
+        return a == b
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    if rule == "exact":
+        return a == b
+    return math.isclose(a, b, rel_tol=rtol, abs_tol=atol)
+
+
+def _keys(block):
+    if block is None:
+        return None
+    return block["data"][block["columns"].index(block["key"])]
+
+
+def _numbers(block, column):
+    if block is None or column not in block["columns"]:
+        return None
+    return block["data"][block["columns"].index(column)]
+
+
+def first_diverging_step(ref_trace, alt_trace, numeric_columns, rtol, atol):
+    """
+    Walk both traces category by category.
+    :param numeric_columns: Columns of the lecture tables compared within tolerance
+    :return: Description of the first difference, or None
+    """
+    ref_steps = ref_trace["categories"] + [
+        dict(ref_trace["overflow_pool"], name="Overflow Pool")
+    ]
+    alt_steps = alt_trace["categories"] + [
+        dict(alt_trace["overflow_pool"], name="Overflow Pool")
+    ]
+    for ref, alt in zip(ref_steps, alt_steps):
+        if ref["name"] != alt["name"]:
+            return f"category order: {ref['name']} != {alt['name']}"
+        for block_name in ("selected", "overflow", "lectures"):
+            if block_name not in ref:
+                continue
+            if _keys(ref[block_name]) != _keys(alt.get(block_name)):
+                return (
+                    f"[{ref['name']}] {block_name} lectures:"
+                    f" {_keys(ref[block_name])} != {_keys(alt.get(block_name))}"
+                )
+            for column in numeric_columns:
+                a = _numbers(ref[block_name], column)
+                b = _numbers(alt.get(block_name), column)
+                if (
+                    a is not None
+                    and b is not None
+                    and not all(_same(x, y, "close", rtol, atol) for x, y in zip(a, b))
+                ):
+                    return f"[{ref['name']}] {block_name} {column}: {a} != {b}"
+        for field in (
+            "to_pools",
+            "from_secondary",
+            "to_secondary",
+            "points",
+            "credits",
+        ):
+            if field not in ref:
+                continue
+            a, b = ref[field], alt.get(field)
+            if isinstance(a, dict) and isinstance(b, dict):
+                same = a.keys() == b.keys() and all(
+                    _same(a[k], b[k], "close", rtol, atol) for k in a
+                )
+            else:
+                same = _same(a, b, "close", rtol, atol)
+            if not same:
+                return f"[{ref['name']}] {field}: {a} != {b}"
+    if len(ref_steps) != len(alt_steps):
+        return f"number of categories: {len(ref_steps)} != {len(alt_steps)}"
+    return None
+
+
+def compare(reference, alternative, numeric_columns, rtol, atol):
+    """
+    :param reference: Results and traces of the reference, from run_engine or a golden file
+    :param alternative: Results and traces of the engine under test
+    :param numeric_columns: Columns of the lecture tables compared within tolerance
+    :return: List of (student ID, description) of every difference
+    """
+    ref_results, ref_traces = reference
+    alt_results, alt_traces = alternative
+    diffs = []
+    for student_id in ref_results.keys() | alt_results.keys():
+        ref = ref_results.get(student_id)
+        alt = alt_results.get(student_id)
+        if ref is None or alt is None:
+            diffs.append(
+                (student_id, "only in " + ("engine" if ref is None else "reference"))
+            )
+            continue
+        fields = [
+            f"{field} {ref.get(field)} != {alt.get(field)}"
+            for field, rule in FIELD_RULES.items()
+            if not _same(ref.get(field), alt.get(field), rule, rtol, atol)
+        ]
+        if not fields:
+            continue
+        description = ", ".join(fields)
+        if student_id in ref_traces and student_id in alt_traces:
+            step = first_diverging_step(
+                ref_traces[student_id],
+                alt_traces[student_id],
+                numeric_columns,
+                rtol,
+                atol,
+            )
+            if step is not None:
+                description += f"; first divergence at {step}"
+        diffs.append((student_id, description))
+    return sorted(diffs)
+
+
+def datasets(args):
+    """
+    Yield (name, toml, lec, students_df) for the real dataset given on the
+    command line, or for --seeds generated datasets at --scale.
+    """
+    if args.lectures:
+        with open(args.rules, "rb") as f:
+            toml = tomllib.load(f)
+        toml["params"]["csv_cache"] = False
+        toml["params"]["stream_students"] = False
+        lec, students_df = calculator.load_inputs(
+            toml,
+            args.lectures,
+            args.students,
+            csv_encoding=rules_toml.get_csv_encoding(toml),
+        )
+        yield args.students, toml, lec, students_df
+        return
+    for seed in range(args.seeds):
+        scale = suite.SCALES[args.scale]._replace(seed=seed)
+        toml, lectures_df, students_df = synth.make_scaled_inputs(scale)
+        lec = lectures.Lectures(toml, lectures_df)
+        yield f"{args.scale} seed={seed}", toml, lec, students_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--engine", default="reference")
+    parser.add_argument("--scale", choices=suite.SCALES, default="small")
+    parser.add_argument("--seeds", type=int, default=1)
+    parser.add_argument(
+        "--lectures", help="real lectures.csv (with --students and --rules)"
+    )
+    parser.add_argument("--students")
+    parser.add_argument("--rules")
+    parser.add_argument("--golden", help="compare with results saved by --save-golden")
+    parser.add_argument(
+        "--save-golden", help="save the reference results and traces to this file"
+    )
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    parser.add_argument("--atol", type=float, default=1e-9)
+    parser.add_argument(
+        "--show", type=int, default=20, help="differences to print per dataset"
+    )
+    args = parser.parse_args()
+    if args.lectures and not (args.students and args.rules):
+        parser.error("--lectures needs --students and --rules")
+
+    engine = load_engine(args.engine)
+    golden = {}
+    if args.golden:
+        with open(args.golden, encoding="utf-8") as f:
+            golden = json.load(f)
+
+    failed = False
+    saved = {}
+    for name, toml, lec, students_df in datasets(args):
+        # The calculator reports undefined lectures on stdout
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if name in golden:
+                reference = (golden[name]["results"], golden[name]["traces"])
+            else:
+                reference = run_engine(reference_engine, toml, lec, students_df)
+            alternative = run_engine(engine, toml, lec, students_df)
+        saved[name] = {"results": reference[0], "traces": reference[1]}
+
+        numeric_columns = [toml["columns_in_lectures"]["credit"], "GP", "point"]
+        diffs = compare(reference, alternative, numeric_columns, args.rtol, args.atol)
+        source = "golden" if name in golden else "reference"
+        print(
+            f"{name}: {len(reference[0])} students, {len(diffs)} differ ({args.engine} vs {source})"
+        )
+        for student_id, description in diffs[: args.show]:
+            print(f"  {student_id}: {description}")
+        failed = failed or bool(diffs)
+
+    if args.save_golden:
+        with open(args.save_golden, "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False)
+        print(f"Golden results written to {args.save_golden}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
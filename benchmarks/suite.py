@@ -0,0 +1,228 @@
+"""
+Time calc_all (with each engine), calc_gpt_score, the knapsack and CSV ingestion on synthetic inputs and compare with a JSON baseline.
+
+Baselines are machine specific and kept in benchmarks/baselines/<scale>.json,
+which is not tracked. Record one on a known-good commit, then rerun to see the
+ratio of each case to it; the exit status is 1 if any case is slower than the
+baseline by more than --tolerance.
+
+Usage:
+    uv run python -m benchmarks.suite --scale small --save-baseline
+    uv run python -m benchmarks.suite --scale small
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import pandas as pd
+
+from gpp_calculator import calculator, category_resolver, lectures, rules_toml
+
+from . import synth
+
+SCALES = {
+    "small": synth.Scale(n_lectures=500, n_students=200, grades_per_student=40),
+    "medium": synth.Scale(
+        n_lectures=2000,
+        n_students=2000,
+        grades_per_student=60,
+        n_categories=6,
+        n_pools=2,
+    ),
+    "regex": synth.Scale(
+        n_lectures=2000,
+        n_students=1000,
+        grades_per_student=60,
+        n_categories=8,
+        n_pools=3,
+        regex_heavy=True,
+    ),
+    "large": synth.Scale(
+        n_lectures=20000,
+        n_students=15000,
+        grades_per_student=60,
+        n_categories=8,
+        n_pools=3,
+        regex_heavy=True,
+    ),
+}
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Students whose calc_gpt_score and knapsack inputs are timed
+SAMPLE_STUDENTS = 200
+
+
+def best_of(repeat, func):
+    """
+    :return: Shortest wall time of repeat calls of func, in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def sample_students(toml, students_df):
+    grades = calculator.iter_student_grades(
+        students_df, toml["columns_in_students"]["key"]
+    )
+    return [grade_df for _, grade_df in grades if not grade_df.empty][:SAMPLE_STUDENTS]
+
+
+def knapsack_inputs(toml, lectures_df, grade_dfs, resolver):
+    """
+    The per-category inputs calc_gpt_score passes to select_lecture_to_knapsack.
+    """
+    col = toml["columns_in_lectures"]
+    inputs = []
+    for grade_df in grade_dfs:
+        pl = lectures.PersonalLectures(
+            lectures_df,
+            col["key"],
+            col["category"],
+            col["credit"],
+            toml["columns_in_students"]["grade"],
+        )
+        pl.set_grades(grade_df)
+        pl.make_grades_df()
+        for v in toml["categories"].values():
+            df = pl.extract_lecture_by_category(v["category"], resolver)
+            if len(v["my_courses"]) > 0:
+                df = lectures.add_is_home_col(
+                    df, col["category"], v["my_courses"], resolver
+                )
+            inputs.append((df, float(v["max_credits"])))
+    return inputs
+
+
+def run_cases(scale, repeat):
+    toml, lectures_df, students_df = synth.make_scaled_inputs(scale)
+    # Measure the calculation itself, not the caches
+    toml["params"]["incremental"] = False
+    toml["params"]["csv_cache"] = False
+    rules = rules_toml.compile_rules(toml)
+    col = toml["columns_in_lectures"]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as root_path:
+        synth.write_inputs(root_path, toml, lectures_df, students_df)
+        lecture_csv_path = os.path.join(root_path, "lectures.csv")
+        student_csv_path = os.path.join(root_path, "students.csv")
+
+        results["ingestion"] = best_of(
+            repeat,
+            lambda: calculator.load_inputs(
+                toml, lecture_csv_path, student_csv_path, csv_encoding="utf-8"
+            ),
+        )
+        lec, students = calculator.load_inputs(
+            toml, lecture_csv_path, student_csv_path, csv_encoding="utf-8"
+        )
+
+        with mock.patch.object(calculator, "get_runtime_root_path", lambda: root_path):
+            results["calc_all"] = best_of(
+                repeat, lambda: calculator.calc_all(rules, csv_encoding="utf-8")
+            )
+            cohort_rules = rules_toml.compile_rules(
+                dict(toml, params=dict(toml["params"], engine="cohort"))
+            )
+            results["calc_all (cohort)"] = best_of(
+                repeat, lambda: calculator.calc_all(cohort_rules, csv_encoding="utf-8")
+            )
+
+    resolver = category_resolver.CategoryResolver(toml)
+    resolver.resolve_all(lec.get_lectures()[col["category"]])
+    grade_dfs = sample_students(toml, students)
+
+    def calc_gpt_scores():
+        for grade_df in grade_dfs:
+            calculator.calc_gpt_score(rules, lec.get_lectures(), grade_df, resolver)
+
+    results["calc_gpt_score"] = best_of(repeat, calc_gpt_scores) / len(grade_dfs)
+
+    inputs = knapsack_inputs(toml, lec.get_lectures(), grade_dfs, resolver)
+
+    def knapsacks():
+        for df, max_credits in inputs:
+            lectures.select_lecture_to_knapsack(df, max_credits, col)
+
+    results["select_lecture_to_knapsack"] = best_of(repeat, knapsacks) / len(inputs)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print each case against the baseline.
+    :return: True if no case is slower than the baseline by more than tolerance
+    """
+    ok = True
+    print(f"{'case':<28} {'sec':>10} {'baseline':>10} {'ratio':>6}")
+    for case, seconds in results.items():
+        base = baseline["cases"].get(case) if baseline else None
+        if base is None:
+            print(f"{case:<28} {seconds:>10.4f} {'-':>10} {'-':>6}")
+            continue
+        ratio = seconds / base
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{case:<28} {seconds:>10.4f} {base:>10.4f} {ratio:>6.2f}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--baseline", help="baseline JSON (default: baselines/<scale>.json)"
+    )
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    print(f"{args.scale}: {scale}")
+    # The calculator reports undefined lectures on stdout; keep the table readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = run_cases(scale, args.repeat)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{args.scale}.json")
+    record = {
+        "scale": scale._asdict(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cases": results,
+    }
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+        compare(results, None, args.tolerance)
+        print(f"Baseline written to {baseline_path}")
+        return
+
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["scale"] != scale._asdict():
+            print(f"Ignoring {baseline_path}: recorded at a different scale")
+            baseline = None
+    if not compare(results, baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ["CoreA", "CoreB", "CoreHomeX", "CoreHomeY", "ElecA", "ElecB", "GenA"]
+GRADES = ["S", "A", "B", "C", "F", "Ａ", "4", "2"]
+CREDITS = ["0.5", "1", "1.5", "2", "2", "2", "4"]
+
+
+def make_rules():
+    return {
+        "params": {
+            "extrapolate_target_credits": 124,
+            "csv_encoding": "utf-8",
+        },
+        "columns_in_students": {
+            "key": "Student ID",
+            "name": "Student name",
+            "grade": "Grade",
+        },
+        "columns_in_lectures": {
+            "key": "Lecture ID",
+            "name": "Lecture name",
+            "category": "Category",
+            "credit": "Credits",
+        },
+        "categories": {
+            "Core": {
+                "max_credits": 20,
+                "category": ["Core.*"],
+                "my_courses": ["CoreHome.*"],
+            },
+            "Elective": {
+                "max_credits": 24,
+                "category": ["Elec.*"],
+                "my_courses": ["ElecA"],
+            },
+            "General": {"max_credits": 10, "category": ["Gen.*"], "my_courses": []},
+        },
+        "secondary_categories": {
+            "Elective": {"max_credits": 8, "category": ["Gen.*"]},
+        },
+    }
+
+
+def make_lectures_df(n_lectures, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "Lecture ID": [f"L{i:06d}" for i in range(n_lectures)],
+            "Lecture name": [f"Lecture {i}" for i in range(n_lectures)],
+            "Category": rng.choice(CATEGORIES, n_lectures),
+            "Credits": rng.choice(CREDITS, n_lectures),
+        }
+    )
+
+
+def make_students_df(n_students, grades_per_student, n_lectures, seed=0):
+    """
+    Every student takes grades_per_student distinct lectures, and rows are
+    shuffled so that a student's grades are spread over the whole table.
+    """
+    rng = np.random.default_rng(seed)
+    student_idx = np.repeat(np.arange(n_students), grades_per_student)
+    lecture_idx = np.concatenate(
+        [
+            rng.choice(n_lectures, grades_per_student, replace=False)
+            for _ in range(n_students)
+        ]
+    )
+    df = pd.DataFrame(
+        {
+            "Student ID": [f"S{i:06d}" for i in student_idx],
+            "Student name": [f"Student {i}" for i in student_idx],
+            "Lecture ID": [f"L{i:06d}" for i in lecture_idx],
+            "Grade": rng.choice(GRADES, len(student_idx)),
+        }
+    )
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+class Scale(NamedTuple):
+    n_lectures: int = 2000
+    n_students: int = 1000
+    grades_per_student: int = 40
+    n_categories: int = 3
+    n_pools: int = 1
+    regex_heavy: bool = False
+    seed: int = 0
+
+
+def scaled_categories(n_categories):
+    """
+    Category strings of lectures.csv for each primary category c: two plain
+    ones and two home course ones, e.g. G0A, G0B, G0Home1, G0Home2.
+    """
+    return {
+        f"Cat{c}": [f"G{c}A", f"G{c}B", f"G{c}Home1", f"G{c}Home2"]
+        for c in range(n_categories)
+    }
+
+
+def make_scaled_rules(scale: Scale):
+    """
+    Rules with scale.n_categories primary categories and scale.n_pools
+    secondary pools. A pool is named after a primary category, which draws on
+    it, and collects the overflow of the next category. With regex_heavy, each
+    category is matched by several patterns with alternations and classes
+    instead of a single prefix pattern.
+    """
+    rng = np.random.default_rng(scale.seed)
+    toml = make_rules()
+    toml["categories"] = {}
+    for c in range(scale.n_categories):
+        if scale.regex_heavy:
+            patterns = [f"G{c}(?:A|B|X)", f"G{c}Home[0-9]+", f"G{c}[C-F]{{1,2}}"]
+            my_courses = [f"G{c}Home1", f"G{c}Ho(?:me)?2"]
+        else:
+            patterns = [f"G{c}.*"]
+            my_courses = [f"G{c}Home.*"]
+        toml["categories"][f"Cat{c}"] = {
+            "max_credits": int(rng.choice([8, 10, 16, 20, 24])),
+            "category": patterns,
+            "my_courses": my_courses,
+        }
+    toml["secondary_categories"] = {}
+    for p in range(min(scale.n_pools, scale.n_categories)):
+        source = (p + 1) % scale.n_categories
+        if scale.regex_heavy:
+            patterns = [f"G{source}(?:A|B)", f"G{source}Home[0-9]+"]
+        else:
+            patterns = [f"G{source}.*"]
+        toml["secondary_categories"][f"Cat{p}"] = {
+            "max_credits": 8,
+            "category": patterns,
+        }
+    return toml
+
+
+def make_scaled_inputs(scale: Scale):
+    """
+    :return: rules, lectures DataFrame and students DataFrame, as read from CSVs.
+    About 2% of the lectures have no category and 1% of the grades refer to
+    lectures missing from the catalog or have a grade that is not counted.
+    """
+    rng = np.random.default_rng(scale.seed)
+    category_strings = [
+        s for v in scaled_categories(scale.n_categories).values() for s in v
+    ]
+    lectures_df = make_lectures_df(scale.n_lectures, scale.seed)
+    lectures_df["Category"] = rng.choice(category_strings, scale.n_lectures)
+    lectures_df.loc[rng.random(scale.n_lectures) < 0.02, "Category"] = ""
+
+    students_df = make_students_df(
+        scale.n_students, scale.grades_per_student, scale.n_lectures, scale.seed
+    )
+    odd = rng.random(len(students_df)) < 0.01
+    students_df.loc[odd, "Lecture ID"] = "LX99999"
+    odd = rng.random(len(students_df)) < 0.01
+    students_df.loc[odd, "Grade"] = "P"
+    return make_scaled_rules(scale), lectures_df, students_df
+
+
+def write_inputs(dir_path, toml, lectures_df, students_df):
+    """
+    Write rules.toml, lectures.csv and students.csv into dir_path.
+    """
+    import toml as toml_lib
+
+    with open(os.path.join(dir_path, "rules.toml"), "w", encoding="utf-8") as f:
+        toml_lib.dump(toml, f)
+    lectures_df.to_csv(os.path.join(dir_path, "lectures.csv"), index=False)
+    students_df.to_csv(os.path.join(dir_path, "students.csv"), index=False)
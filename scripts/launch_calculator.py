@@ -1,4 +1,8 @@
+import multiprocessing
+
 from gpp_calculator.cli import main
 
 if __name__ == "__main__":
+    # Needed by the process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
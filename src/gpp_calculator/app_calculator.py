@@ -1,15 +1,32 @@
 import os
+import queue
 import sys
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk
 
 import ttkthemes
 
-from . import app_rules, calculator, csv_export, icon_data, rules_toml
+from . import icon_data, results_view, rules_toml, rules_watcher
 from .runtime_path import get_runtime_root_path
 
 IS_DARWIN = sys.platform.startswith("darwin")
 
+# Interval and batch size for handing calculation events to the UI
+POLL_INTERVAL_MS = 50
+MAX_EVENTS_PER_POLL = 500
+# Interval for checking whether rules.toml was changed
+RULES_POLL_INTERVAL_MS = 1000
+
+
+def format_eta(seconds):
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours > 0:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
 
 class App(ttk.Frame):
     def __init__(self, master):
@@ -17,14 +34,22 @@ class App(ttk.Frame):
         master.title("GPP Calculator")
 
         self.rules = rules_toml.Rules()
-        self.rules.load_rules()
+        self.load_rules()
+        self.rules_watcher = rules_watcher.RulesWatcher(self.rules)
+        self.rules_watcher.subscribe(self._on_rules_changed)
 
         head_frame = ttk.Frame(master)
         head_frame.pack(padx=10, pady=(15, 5), fill=tk.X)
-        calc_btn = ttk.Button(
+        self.calc_btn = ttk.Button(
             head_frame, text="Calculate", width=13, command=self.calculate
         )
-        calc_btn.pack(padx=5, side=tk.LEFT)
+        self.calc_btn.pack(padx=5, side=tk.LEFT)
+
+        self.cancel_btn = ttk.Button(
+            head_frame, text="Cancel", width=13, command=self.cancel
+        )
+        self.cancel_btn.pack(padx=5, side=tk.LEFT)
+        self.cancel_btn["state"] = "disabled"
 
         self.export_btn = ttk.Button(
             head_frame, text="Export", width=13, command=self.export
@@ -32,10 +57,22 @@ class App(ttk.Frame):
         self.export_btn.pack(padx=5, side=tk.LEFT)
         self.export_btn["state"] = "disabled"
 
-        setting_btn = ttk.Button(
+        self.export_reports_btn = ttk.Button(
+            head_frame, text="Export Reports", command=self.export_reports
+        )
+        self.export_reports_btn.pack(padx=5, side=tk.LEFT)
+        self.export_reports_btn["state"] = "disabled"
+
+        self.validation_btn = ttk.Button(
+            head_frame, text="Validation", command=self.open_validation_report
+        )
+        self.validation_btn.pack(padx=5, side=tk.LEFT)
+        self.validation_btn["state"] = "disabled"
+
+        self.setting_btn = ttk.Button(
             head_frame, text="Settings", command=self.open_settings
         )
-        setting_btn.pack(padx=5, side=tk.RIGHT)
+        self.setting_btn.pack(padx=5, side=tk.RIGHT)
 
         # Error message label
         self.error_var = tk.StringVar()
@@ -50,64 +87,78 @@ class App(ttk.Frame):
         # Progress bar
         progress_frame = ttk.Frame(master)
         progress_frame.pack(fill=tk.X, padx=20, pady=(0, 3))
+        self.status_var = tk.StringVar()
+        ttk.Label(progress_frame, textvariable=self.status_var).pack(
+            padx=(5, 0), side=tk.RIGHT
+        )
         self.progress_bar = ttk.Progressbar(progress_frame)
         self.progress_bar.pack(fill=tk.X)
 
-        # Treeview Frame with Scrollbar
-        tree_frame = ttk.Frame(master)
-        tree_frame.pack(padx=10, pady=(0, 10), fill=tk.BOTH, expand=True)
-
-        self.tree = ttk.Treeview(
-            tree_frame,
-            columns=(
-                "student_id",
-                "student_name",
-                "gpp",
-                "gpa",
-                "total_credits",
-                "extrapolate_gpp",
-                "credits_in_pool",
-            ),
-            show="headings",
+        # Incremental search by student ID
+        search_frame = ttk.Frame(master)
+        search_frame.pack(fill=tk.X, padx=20, pady=(0, 3))
+        ttk.Label(search_frame, text="Search ID:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add(
+            "write", lambda *args: self.results_view.search(self.search_var.get())
         )
-        self.tree.heading("student_id", text="Student ID")
-        self.tree.heading("student_name", text="Student Name")
-        self.tree.heading("gpp", text="Points")
-        self.tree.heading("gpa", text="GPA")
-        self.tree.heading("total_credits", text="Credits")
-        self.tree.heading("extrapolate_gpp", text="Extrapolate Points")
-        self.tree.heading("credits_in_pool", text="Credits in Pool")
-        self.tree.column("student_id", width=100)
-        self.tree.column("student_name", width=100)
-        self.tree.column("gpp", width=100)
-        self.tree.column("gpa", width=100)
-        self.tree.column("total_credits", width=100)
-        self.tree.column("extrapolate_gpp", width=100)
-        self.tree.column("credits_in_pool", width=100)
-        self.tree.pack(
-            padx=(10, 0), pady=(0, 10), fill=tk.BOTH, expand=True, side=tk.LEFT
+        ttk.Entry(search_frame, textvariable=self.search_var, width=20).pack(
+            padx=5, side=tk.LEFT
         )
 
-        self.scrollbar = ttk.Scrollbar(
-            tree_frame, orient=tk.VERTICAL, command=self.tree.yview
-        )
-        self.tree.configure(yscrollcommand=self.scrollbar.set)
-        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        # event binding double click to open log file
-        self.tree.bind(
-            "<Double-1>",
-            lambda event: self.open_log_file(
-                self.tree.item(self.tree.selection())["values"][0]
-            ),
+        # Results table; double click or Enter opens the report
+        self.results_view = results_view.ResultsView(
+            master, on_open=lambda res: self.open_log_file(res["student_id"])
         )
+        self.results_view.pack(padx=10, pady=(0, 10), fill=tk.BOTH, expand=True)
 
         self.res_table = []
+        # Reports are rendered from these traces only when opened or exported
+        self.traces = {}
+        # Lectures missing from lectures.csv and categories matching no rule
+        self.validation_report = {}
+        # CompiledRules the results in the table were calculated with
+        self.results_rules = None
+        # Message shown for the state of rules.toml, cleared when it is resolved
+        self._rules_message = ""
+
+        # Calculation running in a worker thread, and the events it sends to the UI
+        self.worker = None
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.calc_start = 0.0
+
+        self.after(RULES_POLL_INTERVAL_MS, self.poll_rules)
 
     def load_rules(self):
         self.rules.load_rules()
         self.toml = self.rules.toml
 
+    def poll_rules(self):
+        self.rules_watcher.poll()
+        self.after(RULES_POLL_INTERVAL_MS, self.poll_rules)
+
+    def _on_rules_changed(self, rules, error):
+        """
+        Called by the rules watcher when rules.toml changed. Results in the table
+        are not recalculated, only marked as outdated until Calculate is pressed.
+        """
+        self.toml = rules.toml
+        message = ""
+        if error is not None:
+            message = f"Invalid rules.toml: {error}"
+        elif self.results_rules is not None:
+            try:
+                if rules.get_compiled_rules().digest != self.results_rules.digest:
+                    message = (
+                        "rules.toml has changed. Results are outdated; press Calculate."
+                    )
+            except ValueError as e:
+                message = f"Invalid rules.toml: {e}"
+        if message or self.error_var.get() == self._rules_message:
+            self.error_var.set(message)
+        self._rules_message = message
+
     def check_csv_exist(self):
         root_path = get_runtime_root_path()
         lecture_csv_path = os.path.join(root_path, "lectures.csv")
@@ -129,58 +180,212 @@ class App(ttk.Frame):
         return True
 
     def calculate(self):
+        """
+        Start calculating in a worker thread. Progress, results and errors come
+        back through self.events, which poll_events() drains on the Tk main loop.
+        """
+        if self.worker is not None:
+            return
+
         self.clear_tree()
-        self.load_rules()
+        self.results_rules = None
+        # Re-read rules.toml only if it changed since the watcher last looked
+        self.rules_watcher.poll()
         ok = self.check_csv_exist()
         if not ok:
             return
+        # Invalid rules are reported here, before any student is calculated
+        error = self.rules_watcher.error
+        if error is None:
+            try:
+                rules = self.rules.get_compiled_rules()
+            except ValueError as e:
+                error = e
+        if error is not None:
+            self.error_var.set(f"Invalid rules.toml: {error}")
+            return
+        self.results_rules = rules
+        self._rules_message = ""
+        self.export_btn["state"] = "disabled"
 
+        self.res_table = []
+        self.traces = {}
+        self.validation_report = {}
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.calc_start = time.perf_counter()
+        self.status_var.set("")
+        self.progress_bar.configure(mode="determinate", value=0)
         self.progress_bar.pack(fill=tk.X)
-        calc_res = calculator.calc_all(
-            self.toml,
-            csv_encoding=self.toml["params"]["csv_encoding"],
-            progress_bar=self.progress_bar,
-            master=self.master,
+        self.calc_btn["state"] = "disabled"
+        self.setting_btn["state"] = "disabled"
+        self.cancel_btn["state"] = "normal"
+
+        self.worker = threading.Thread(
+            target=self._calculate_in_worker,
+            args=(
+                rules,
+                self.rules.get_category_resolver(),
+                self.traces,
+                self.validation_report,
+                self.events,
+                self.cancel_event,
+            ),
+            daemon=True,
         )
+        self.worker.start()
+        self.after(POLL_INTERVAL_MS, self.poll_events)
+
+    @staticmethod
+    def _calculate_in_worker(
+        rules, resolver, traces, validation_report, events, cancel_event
+    ):
+        """
+        Runs in the worker thread; must not touch any widget.
+        """
+        # pandas is only needed from here on, so the window opens without it
+        from . import calculator
 
+        try:
+            calc_res = calculator.calc_all(
+                rules,
+                csv_encoding=rules.csv_encoding,
+                progress=lambda done, total, res: events.put(
+                    ("progress", done, total, res)
+                ),
+                cancel_event=cancel_event,
+                resolver=resolver,
+                traces=traces,
+                validation_report=validation_report,
+            )
+        except calculator.CalculationCancelled:
+            events.put(("cancelled",))
+        except Exception as e:
+            # Tell the main loop, then let the thread print the traceback
+            events.put(("error", e))
+            raise
+        else:
+            events.put(("done", calc_res))
+
+    def poll_events(self):
+        for _ in range(MAX_EVENTS_PER_POLL):
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "progress":
+                self._on_progress(*event[1:])
+            else:
+                self._on_finished(*event)
+                return
+        self.results_view.refresh()
+        self.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def _on_progress(self, done, total, res):
+        self.results_view.append(res)
+        rate = done / max(time.perf_counter() - self.calc_start, 1e-9)
+        if total is None:
+            # Streamed students: the total is not known in advance
+            self.progress_bar.configure(mode="indeterminate")
+            self.progress_bar.step()
+            self.status_var.set(f"{done} students  {rate:.0f}/s")
+        else:
+            self.progress_bar.configure(maximum=total, value=done)
+            eta = format_eta((total - done) / rate)
+            self.status_var.set(f"{done}/{total}  ETA {eta}")
+
+    def _on_finished(self, kind, *args):
+        from . import validation
+
+        self.worker = None
+        self.calc_btn["state"] = "normal"
+        self.setting_btn["state"] = "normal"
+        self.cancel_btn["state"] = "disabled"
+        self.progress_bar.pack_forget()
+        self.status_var.set("")
+
+        if kind == "cancelled":
+            self.clear_tree()
+            self.res_table = []
+            self.traces = {}
+            self.results_rules = None
+            self.error_var.set("Calculation cancelled.")
+            return
+        if kind == "error":
+            self.clear_tree()
+            self.res_table = []
+            self.traces = {}
+            self.results_rules = None
+            self.error_var.set(f"Calculation failed: {args[0]}")
+            return
+
+        calc_res = args[0]
+        # Rows were appended as students finished; show them in the final order
+        # (cached results arrive first), sorted if a column is sorted
+        self.results_view.set_rows(calc_res)
+        self.res_table = calc_res
         if calc_res:
             self.export_btn["state"] = "normal"
+            self.export_reports_btn["state"] = "normal"
+        if validation.has_issues(self.validation_report):
+            self.validation_btn["state"] = "normal"
 
-            for res in calc_res:
-                self.tree.insert(
-                    "",
-                    tk.END,
-                    values=(
-                        res["student_id"],
-                        res["student_name"],
-                        f"{res['gpp']:.1f}",
-                        f"{res['gpa']:.2f}",
-                        f"{res['total_credits']:.1f}",
-                        f"{res['extrapolate_gpp']:.2f}",
-                        f"{res['credits_in_pool']:.1f}",
-                    ),
-                )
-
-            # Hide progress bar
-            self.progress_bar.pack_forget()
-        else:
-            self.export_btn["state"] = "disabled"
-        self.res_table = calc_res
+    def cancel(self):
+        if self.worker is not None:
+            self.cancel_event.set()
+            self.cancel_btn["state"] = "disabled"
 
     def clear_tree(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.results_view.clear()
         self.export_btn["state"] = "disabled"
+        self.export_reports_btn["state"] = "disabled"
+        self.validation_btn["state"] = "disabled"
 
     def export(self):
+        from . import csv_export
+
         csv_export.export_csv(self.res_table, "results.csv")
 
+    def export_reports(self):
+        """
+        Render the reports of all students into the log directory, and write
+        their traces to log/traces.json. Not available with the cohort engine,
+        which records no traces.
+        """
+        from . import report
+
+        if self.results_rules is not None and self.results_rules.engine == "cohort":
+            self.error_var.set(
+                'Export Reports needs params.engine = "student"; the cohort engine'
+                " records no traces. Double-click a student to see their report."
+            )
+            return
+        log_path = os.path.join(get_runtime_root_path(), "log")
+        os.makedirs(log_path, exist_ok=True)
+        report.write_reports(self.toml, self.traces, log_path)
+        report.dump_json(self.traces, os.path.join(log_path, "traces.json"))
+        print(f"Reports exported to {log_path}")
+
+    def open_validation_report(self):
+        from . import validation
+
+        dlg_modal = tk.Toplevel(self)
+        dlg_modal.transient(self.master)
+        dlg_modal.geometry("900x600+100+100")
+        dlg_modal.title("Validation")
+        text_widget = tk.Text(dlg_modal, wrap=tk.WORD)
+        text_widget.insert(tk.END, validation.render(self.validation_report))
+        text_widget.pack(expand=True, fill=tk.BOTH)
+        text_widget.config(state=tk.DISABLED)
+
     def open_settings(self):
+        from . import app_rules
+
         dlg_modal = tk.Toplevel(self)
         dlg_modal.transient(self.master)
         dlg_modal.geometry("1050x600+100+100")
         dlg_modal.grab_set()
-        a = app_rules.App(dlg_modal)
+        a = app_rules.App(dlg_modal, rules=self.rules)
         dlg_modal.protocol(
             "WM_DELETE_WINDOW",
             lambda: [dlg_modal.destroy(), a.close()],
@@ -188,13 +393,29 @@ class App(ttk.Frame):
         self.wait_window(dlg_modal)
 
     def open_log_file(self, student_id):
-        current_dir = get_runtime_root_path()
-        log_path = "log"
-        log_file = os.path.join(current_dir, log_path, f"{student_id}.txt")
+        from . import calculator, report, report_sink
+
+        log_path = os.path.join(get_runtime_root_path(), "log")
         try:
-            font = (self.toml["params"]["font_in_report"], 11)
-            with open(log_file, "r", encoding="utf-8") as f:
-                log_content = f.read()
+            self.rules.check_font_in_report()
+            font = (self.rules.get_font_in_report(), 11)
+            # The results shown were calculated with these rules, even if outdated
+            rules = self.results_rules
+            if student_id in self.traces:
+                log_content = report.render(self.traces[student_id])
+            elif rules.engine == "cohort":
+                # The cohort engine writes no reports; calculate this student alone
+                trace = calculator.calc_trace(
+                    rules,
+                    student_id,
+                    csv_encoding=rules.csv_encoding,
+                    resolver=self.rules.get_category_resolver(),
+                )
+                if trace is None:
+                    raise FileNotFoundError(f"no grades for {student_id}")
+                log_content = report.render(trace)
+            else:
+                log_content = report_sink.read_report(self.toml, log_path, student_id)
             dlg_modal = tk.Toplevel(self)
             dlg_modal.transient(self.master)
             dlg_modal.geometry("1300x900+100+100")
@@ -208,8 +429,8 @@ class App(ttk.Frame):
                 "WM_DELETE_WINDOW",
                 lambda: [dlg_modal.destroy()],
             )
-        except FileNotFoundError:
-            print(f"Log file {log_file} not found.")
+        except FileNotFoundError as e:
+            print(f"Log file not found: {e}")
 
 
 def quit(root):
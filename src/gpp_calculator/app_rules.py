@@ -1,3 +1,4 @@
+import copy
 import os
 import sys
 import tkinter as tk
@@ -5,15 +6,18 @@ from tkinter import messagebox, ttk
 
 import ttkthemes
 
-from . import lectures, rules_toml
-from .input_formatting import preprocess
+from . import rules_toml
 from .runtime_path import get_runtime_root_path
 
 IS_DARWIN = sys.platform.startswith("darwin")
 
 
 class App(ttk.Frame):
-    def __init__(self, master):
+    def __init__(self, master, rules=None):
+        """
+        :param rules: Rules object shared with the main window; rules.toml is
+            then read again only if it changed since it was last read
+        """
         super().__init__(master)
         master.title("Settings")
         self.master = master
@@ -22,8 +26,9 @@ class App(ttk.Frame):
         # TOML file path
         root_path = get_runtime_root_path()
         self.toml_file = os.path.join(root_path, "rules.toml")
-        self.toml_data = rules_toml.Rules()
-        self.toml_data.load_rules()
+        if rules is None:
+            rules = rules_toml.Rules()
+        self.toml_data = rules
 
         # Initialize GUI elements
         self.create_widgets()
@@ -86,6 +91,14 @@ class App(ttk.Frame):
             row=0, column=5, sticky=tk.W
         )
 
+        ttk.Label(params_frame, text="Workers:").grid(
+            row=0, column=6, sticky=tk.W, padx=(50, 10)
+        )
+        self.workers_var = tk.StringVar()
+        ttk.Entry(params_frame, textvariable=self.workers_var, width=5).grid(
+            row=0, column=7, sticky=tk.W
+        )
+
         ttk.Separator(main_frame, orient="horizontal").pack(fill=tk.X, pady=5)
         ttk.Label(main_frame, text="Columns name definition of students.csv").pack(
             anchor=tk.W
@@ -204,7 +217,17 @@ class App(ttk.Frame):
 
     def load_toml(self):
         """Load TOML file"""
-        self.toml_data.load_rules()
+        try:
+            self.toml_data.reload_if_changed()
+        except ValueError:
+            pass
+        # Also reported if the main window found the file invalid first
+        if self.toml_data.load_error is not None:
+            messagebox.showerror(
+                "Error", f"Failed to load: {self.toml_data.load_error}"
+            )
+        if self.toml_data.toml is None:
+            return
         self.update_gui()
 
     def update_gui(self):
@@ -213,6 +236,7 @@ class App(ttk.Frame):
         self.target_credits_var.set(self.toml_data.get_extrapolate_target_credits())
         self.csv_encoding_var.set(self.toml_data.get_csv_encoding())
         self.font_var.set(self.toml_data.get_font_in_report())
+        self.workers_var.set(self.toml_data.get_workers())
 
         # Student columns
         student_rules = self.toml_data.get_student_rules()
@@ -371,7 +395,15 @@ class App(ttk.Frame):
 
     def update_toml_data(self):
         """Update data from GUI"""
-        toml_data = {}
+        current = self.toml_data.get_toml()
+        # Keep the settings this dialog does not edit, e.g. the grade scale
+        toml_data = copy.deepcopy(
+            {
+                k: v
+                for k, v in current.items()
+                if k not in ("categories", "secondary_categories")
+            }
+        )
         if "params" not in toml_data:
             toml_data["params"] = {}
 
@@ -380,6 +412,11 @@ class App(ttk.Frame):
         )
         toml_data["params"]["csv_encoding"] = self.csv_encoding_var.get() or "utf-8"
         toml_data["params"]["font_in_report"] = self.font_var.get() or "Arial"
+        try:
+            toml_data["params"]["workers"] = int(self.workers_var.get())
+        except ValueError:
+            print("Warning: Invalid workers. Setting to 1.")
+            toml_data["params"]["workers"] = 1
 
         # Student columns
         if "columns_in_students" not in toml_data:
@@ -455,17 +492,13 @@ class App(ttk.Frame):
         self.toml_data.set_toml(toml_data)
 
     def get_category_names(self):
+        from . import calculator
+
         toml_data = self.toml_data.get_toml()
         if "columns_in_lectures" in toml_data:
             root_path = get_runtime_root_path()
             lecture_csv_path = os.path.join(root_path, "lectures.csv")
-            lectures_df = preprocess.read_lectures_csv(
-                lecture_csv_path, toml_data["params"]["csv_encoding"]
-            )
-            lec = lectures.Lectures(
-                toml_data,
-                lectures_df,
-            )
+            lec = calculator.load_lectures(toml_data, lecture_csv_path)
             categories = lec.get_category_names(
                 toml_data["columns_in_lectures"]["category"]
             )
@@ -1,37 +1,48 @@
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 import pandas as pd
 
 from . import (
+    category_resolver,
     credit_pool,
+    csv_cache,
+    instrumentation,
     lectures,
+    report,
+    report_sink,
+    result_cache,
+    rules_toml,
+    validation,
 )
 from .input_formatting import preprocess
 from .runtime_path import get_runtime_root_path
 
 
-def calc_gpt_score(toml, lectures_df, grade_df):
-    t_categories = toml["categories"]
-    secondary_categories = toml["secondary_categories"]
-    col = toml["columns_in_lectures"]
-
-    log_str = ""
-
-    def _df_to_log_string(df, key_col):
-        return df.set_index(key_col).to_string(
-            max_rows=None,
-            max_cols=None,
-            line_width=None,
-        )
+def calc_gpt_score(rules, lectures_df, grade_df, resolver=None, gpa=None):
+    """
+    Calculate the points of one student per category.
+    The report is not rendered here. The returned trace holds the lectures
+    selected and overflowed in each category, the credits moved through the
+    secondary pools and the totals; report.render(trace) turns it into text.
+    :param rules: CompiledRules
+    :param gpa: GPA of the student from lectures.calculate_gpas(), calculated here if None
+    :return: Points and credits per category, GPA, trace
+    """
+    if resolver is None:
+        resolver = category_resolver.CategoryResolver(rules.toml)
+    col = rules.lecture_columns
 
     pl = lectures.PersonalLectures(
         lectures_df,
         col["key"],
         col["category"],
         col["credit"],
-        toml["columns_in_students"]["grade"],
+        rules.student_columns["grade"],
     )
-    pl.set_grades(grade_df)
+    pl.set_grades(grade_df, rules.grade_scale)
     pl.make_grades_df()
     use_cols = [
         col["key"],
@@ -41,44 +52,50 @@ def calc_gpt_score(toml, lectures_df, grade_df):
         "GP",
         "point",
     ]
-    if toml["params"].get("year_filter", False):
+    if rules.year_filter:
         use_cols.append("year")
         append_cols = pd.Index(["point", "GP", "year"])
     else:
         append_cols = pd.Index(["point", "GP"])
 
-    gpts = {k: {"credit": 0, "gpp": 0} for k in t_categories.keys()}
+    gpts = {rule.name: {"credit": 0, "gpp": 0} for rule in rules.categories}
     gpts["Overflow_pool"] = {"credit": 0, "gpp": 0}
 
     # CreditPool
-    credit_pools = {}
-    for k, v in secondary_categories.items():
-        credit_pools[k] = credit_pool.CreditPool(v["max_credits"], v["category"])
+    bank = credit_pool.CreditPoolBank.from_pool_rules(
+        rules.secondary_categories, dtype=object
+    )
+    credit_pools = {k: bank.view(k) for k in bank.names()}
 
     # concat用のDataFrameを作成、column名を揃える
     columns = lectures_df.columns
     columns = columns.append(append_cols)
     pool_df = pd.DataFrame(columns=columns)
 
-    # student_idをlog_strに追加
-    student_id_col_name = toml["columns_in_students"]["key"]
-    student_name_col_name = toml["columns_in_students"]["name"]
+    # student_idをtraceに追加
+    student_id_col_name = rules.student_columns["key"]
+    student_name_col_name = rules.student_columns["name"]
     student_id = grade_df[student_id_col_name].values[0]
     student_name = grade_df[student_name_col_name].values[0]
-    log_str += f"{student_id} {student_name}\n"
+    trace = {
+        "student_id": report.plain(student_id),
+        "student_name": report.plain(student_name),
+        "categories": [],
+    }
 
     used_by_secondary_credits = 0
-    for k, v in t_categories.items():
-        log_str += f"\n======== [{k}] ========\n"
-        categories = v["category"]
-        max_credits = v["max_credits"]
-        my_courses = v["my_courses"]
-        home_lecture_df = pl.extract_lecture_by_category(categories)
+    for rule in rules.categories:
+        k = rule.name
+        step = {"name": k, "to_pools": {}, "from_secondary": None, "overflow": None}
+        categories = rule.patterns
+        max_credits = rule.max_credits
+        my_courses = rule.my_courses
+        home_lecture_df = pl.extract_lecture_by_category(categories, resolver)
 
         # 自コースの講義がある場合は、is_homeを追加
         if len(my_courses) > 0:
             home_lecture_df = lectures.add_is_home_col(
-                home_lecture_df, col["category"], my_courses
+                home_lecture_df, col["category"], my_courses, resolver
             )
             # sort by is_home
             home_lecture_df = home_lecture_df.sort_values(
@@ -89,35 +106,37 @@ def calc_gpt_score(toml, lectures_df, grade_df):
         a_df, b_df = lectures.select_lecture_to_knapsack(
             home_lecture_df, float(max_credits), col
         )
-        log_str += _df_to_log_string(a_df[use_cols], col["key"]) + "\n"
+        step["selected"] = report.frame_to_block(a_df[use_cols], col["key"])
         total_point = a_df["point"].sum()
         total_credits = home_lecture_df[col["credit"]].sum()
 
         # secondary categories
         if total_credits > max_credits:
-            for cp in credit_pools.values():
-                v_df = b_df[
-                    b_df[col["category"]].str.fullmatch(
-                        "|".join(cp.get_category_names())
-                    )
-                ]
-                surplus_credits = v_df[col["credit"]].sum()
-                surplus_credits = cp.add_credits(surplus_credits)
+            with instrumentation.phase("secondary pools"):
+                for pool_name, cp in credit_pools.items():
+                    v_df = b_df[
+                        resolver.fullmatch(
+                            b_df[col["category"]], "|".join(cp.get_category_names())
+                        )
+                    ]
+                    surplus_credits = v_df[col["credit"]].sum()
+                    step["to_pools"][pool_name] = report.number(surplus_credits)
+                    surplus_credits = cp.add_credits(surplus_credits)
             total_credits = max_credits
         elif total_credits < max_credits:
             shortage_credits = max_credits - total_credits
             if k in credit_pools:
                 got_credits = credit_pools[k].use_credits(shortage_credits)
                 total_credits += got_credits
-                log_str += f"<From secondary categories: {got_credits:+}>\n"
+                step["from_secondary"] = report.number(got_credits)
                 used_by_secondary_credits += got_credits
 
-        log_str += (
-            f"Points: {total_point:.1f}  Credits: {total_credits}/{max_credits}\n"
-        )
+        step["points"] = report.number(total_point)
+        step["credits"] = report.number(total_credits)
+        step["max_credits"] = report.number(max_credits)
         if len(b_df) > 0:
-            log_str += "-------- Overflow --------\n"
-            log_str += _df_to_log_string(b_df[use_cols], col["key"]) + "\n"
+            step["overflow"] = report.frame_to_block(b_df[use_cols], col["key"])
+        trace["categories"].append(step)
 
         gpts[k]["credits"] = total_credits
         gpts[k]["gpp"] = total_point
@@ -139,27 +158,24 @@ def calc_gpt_score(toml, lectures_df, grade_df):
     pool_credits = pool_df[col["credit"]].sum() - used_by_secondary_credits
     gpts["Overflow_pool"]["credits"] = pool_credits
     gpts["Overflow_pool"]["gpp"] = total_point
-    log_str += "\n======== [Overflow Pool] ========\n"
-    log_str += _df_to_log_string(pool_df[use_cols], col["key"]) + "\n"
-    if used_by_secondary_credits > 0:
-        log_str += f"<To secondary categories: {used_by_secondary_credits * (-1):+}>\n"
-    log_str += f"Points: {total_point:.1f}  Credits: {pool_credits}\n"
-    log_str += f"\nTotal Points: {sum(v['gpp'] for v in gpts.values()):.1f}"
+    trace["overflow_pool"] = {
+        "lectures": report.frame_to_block(pool_df[use_cols], col["key"]),
+        "to_secondary": report.number(used_by_secondary_credits),
+        "points": report.number(total_point),
+        "credits": report.number(pool_credits),
+    }
+    trace["total_points"] = report.number(sum(v["gpp"] for v in gpts.values()))
 
     # calculate GPA. Not use gpp
-    gpa = pl.calculate_gpa()
-    log_str += f" (GPA: {gpa:.2f})"
+    if gpa is None:
+        gpa = pl.calculate_gpa()
+    trace["gpa"] = report.number(gpa)
 
-    return gpts, gpa, log_str
+    return gpts, gpa, trace
 
 
-def extrapolate_by_gpa(toml, gpp, total_credits, gpa):
-    target_credits = toml["params"]["extrapolate_target_credits"]
-    if not isinstance(target_credits, (int, float, str)):
-        raise ValueError(f"total_gpp must be an integer or float: {target_credits}")
-    else:
-        target_credits = int(target_credits)
-
+def extrapolate_by_gpa(rules, gpp, total_credits, gpa):
+    target_credits = rules.extrapolate_target_credits
     if total_credits >= target_credits:
         result = gpp
     else:
@@ -167,7 +183,508 @@ def extrapolate_by_gpa(toml, gpp, total_credits, gpa):
     return result
 
 
-def calc_all(toml, csv_encoding: str = "utf-8", progress_bar=None, master=None):
+def iter_student_grades(students_df, student_id_col_name):
+    """
+    Partition students_df by student once and yield each student's rows.
+    Rows are stably sorted by student so that every student's grades become a
+    contiguous block, and each block is handed out as a positional slice.
+    Students are yielded in order of first appearance, as unique() does.
+    :param students_df: DataFrame of all grade rows
+    :param student_id_col_name: Column name for student ID
+    :return: Iterator of (student_id, grade_df)
+    """
+    codes, student_ids = pd.factorize(
+        students_df[student_id_col_name], use_na_sentinel=False
+    )
+    order = np.argsort(codes, kind="stable")
+    sorted_df = students_df.take(order)
+    offsets = np.zeros(len(student_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=len(student_ids)), out=offsets[1:])
+
+    for i, student_id in enumerate(student_ids):
+        if pd.isna(student_id):
+            # Missing IDs never compare equal, so no rows belong to them
+            yield student_id, sorted_df.iloc[0:0]
+            continue
+        yield student_id, sorted_df.iloc[offsets[i] : offsets[i + 1]]
+
+
+def calc_student(rules, lec, student_id, grade_df, resolver, gpa=None):
+    """
+    Calculate GPP for one student.
+    :param rules: CompiledRules
+    :param lec: Lectures object holding the validated lecture catalog
+    :param student_id: Student ID
+    :param grade_df: DataFrame of the student's grade rows
+    :param resolver: CategoryResolver built from toml
+    :param gpa: Precomputed GPA of the student, if any (see calculate_gpas)
+    :return: Result dictionary, trace of the report (None if the student has no grades)
+    """
+    student_name = rules.student_columns["name"]
+
+    if grade_df.empty:
+        print(f"Warning: No grades found for student {student_id}. Skipping.")
+        res_dict = {
+            "student_id": student_id,
+            "student_name": "Unknown",
+            "gpp": 0,
+            "gpa": 0,
+            "total_credits": 0,
+            "extrapolate_gpp": 0,
+            "credits_in_pool": 0,
+        }
+        return res_dict, None
+
+    res_dict = {
+        "student_id": student_id,
+        "student_name": grade_df[student_name].values[0],
+        "gpp": 0,
+        "gpa": 0,
+        "total_credits": 0,
+        "extrapolate_gpp": 0,
+    }
+
+    gpts, gpa, trace = calc_gpt_score(
+        rules, lec.get_lectures(), grade_df, resolver, gpa
+    )
+    gpt_score = 0
+    total_credits = 0
+    for k, v in gpts.items():
+        gpt_score += v["gpp"]
+        if k != "Overflow_pool":
+            total_credits += v["credits"]
+    extrapolate_gpt = extrapolate_by_gpa(rules, gpt_score, total_credits, gpa)
+    res_dict["gpp"] = gpt_score
+    res_dict["gpa"] = gpa
+    res_dict["total_credits"] = total_credits
+    res_dict["extrapolate_gpp"] = extrapolate_gpt
+    res_dict["credits_in_pool"] = gpts["Overflow_pool"]["credits"]
+    return res_dict, trace
+
+
+def _calc_and_render(rules, lec, student_id, grade_df, gpa, resolver, render):
+    """
+    calc_student, followed by rendering the report text if render is true.
+    :return: Result dictionary, trace, report text (None unless rendered)
+    """
+    with instrumentation.student(student_id):
+        res_dict, trace = calc_student(rules, lec, student_id, grade_df, resolver, gpa)
+        log_str = None
+        if render and trace is not None:
+            log_str = report.render(trace)
+    return res_dict, trace, log_str
+
+
+# Number of streamed students calculated together
+STREAM_BATCH_STUDENTS = 1000
+
+# Read-only inputs of a worker process, set once by _init_worker
+_worker_inputs = {}
+
+
+def _init_worker(rules, lec, render, instrument):
+    resolver = category_resolver.CategoryResolver(rules.toml)
+    resolver.resolve_all(lec.get_lectures()[rules.lecture_columns["category"]])
+    _worker_inputs.update(rules=rules, lec=lec, resolver=resolver, render=render)
+    if instrument:
+        instrumentation.enable(rules.toml["params"].get("profile_top", 10))
+
+
+def _calc_chunk(chunk):
+    """
+    :return: Results of the chunk, and what instrumentation recorded for it
+    """
+    results = [
+        _calc_and_render(
+            _worker_inputs["rules"],
+            _worker_inputs["lec"],
+            student_id,
+            grade_df,
+            gpa,
+            _worker_inputs["resolver"],
+            _worker_inputs["render"],
+        )
+        for student_id, grade_df, gpa in chunk
+    ]
+    return results, instrumentation.take()
+
+
+def get_workers(rules):
+    """
+    Number of worker processes from params.workers in rules.toml.
+    1 (the default) calculates all students in this process.
+    """
+    return min(rules.workers, os.cpu_count() or 1)
+
+
+def _calc_students_parallel(executor, student_grades, workers):
+    """
+    Shard students across a process pool and yield results in the original order.
+    The lecture catalog is sent to each worker once by the pool initializer, and
+    each task only carries the grade rows of a chunk of students. Reports are
+    rendered by the workers and written by this process.
+    """
+    chunk_size = max(1, len(student_grades) // (workers * 8))
+    chunks = [
+        student_grades[i : i + chunk_size]
+        for i in range(0, len(student_grades), chunk_size)
+    ]
+    for chunk_res, stats in executor.map(_calc_chunk, chunks):
+        instrumentation.merge(stats)
+        yield from chunk_res
+
+
+def _iter_batches(student_grades, batch_size):
+    batch = []
+    for item in student_grades:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _calc_gpas(rules, lec, grades_df):
+    """
+    GPA of every student in grades_df, in one pass over the grade rows.
+    :return: Dictionary of student ID to GPA
+    """
+    col = rules.lecture_columns
+    return lectures.calculate_gpas(
+        lec.get_lectures(),
+        grades_df,
+        col["key"],
+        col["credit"],
+        rules.student_columns["grade"],
+        rules.student_columns["key"],
+    )
+
+
+def _with_gp(rules, grades_df):
+    """
+    grades_df with the GP column, adding it if it was not added at ingestion.
+    """
+    if lectures.GP_COL_NAME in grades_df.columns:
+        return grades_df
+    return lectures.add_gp_column(
+        grades_df, rules.student_columns["grade"], rules.grade_scale
+    )
+
+
+class CalculationCancelled(Exception):
+    pass
+
+
+def _calc_students_cohort(
+    rules, lec, students, resolver, report_progress, validation_report
+):
+    """
+    calc_students with the cohort engine. Streamed students are calculated a
+    batch at a time, in the order they are read.
+    """
+    from . import cohort
+
+    if isinstance(students, pd.DataFrame):
+        calc_res = cohort.calc_cohort(rules, lec, students, resolver)
+        for res_dict in calc_res:
+            report_progress(res_dict)
+        return calc_res
+
+    calc_res = []
+    for batch in _iter_batches(students, STREAM_BATCH_STUDENTS):
+        grade_dfs = [grade_df for _, grade_df in batch if not grade_df.empty]
+        batch_res = iter([])
+        if grade_dfs:
+            grades_df = pd.concat(grade_dfs)
+            validation.check_grades(validation_report, rules, lec, grades_df)
+            batch_res = iter(cohort.calc_cohort(rules, lec, grades_df, resolver))
+        for student_id, grade_df in batch:
+            if grade_df.empty:
+                res_dict, _ = calc_student(rules, lec, student_id, grade_df, resolver)
+            else:
+                res_dict = next(batch_res)
+            calc_res.append(res_dict)
+            report_progress(res_dict)
+    return calc_res
+
+
+def calc_students(
+    rules,
+    lec,
+    students,
+    log_path,
+    progress=None,
+    cancel_event=None,
+    resolver=None,
+    traces=None,
+    validation_report=None,
+    render_reports=None,
+):
+    """
+    Calculate GPP for every student.
+    Students are calculated in params.workers processes when it is more than 1.
+    Unless params.incremental is false, students whose grade rows, lectures and
+    rules are unchanged since the last run take their result from the cache in
+    log_path, and their reports are not rewritten.
+    Reports are written on a background thread while calculating, into one file
+    per student or, with params.report_archive, into log_path/reports.zip.
+    If traces is given, the trace of each student is stored in it, and unless
+    render_reports is true, reports are neither rendered nor written; they can
+    then be rendered on demand with report.render().
+    Before calculating, grade rows are checked once for lectures missing from
+    lectures.csv, and the categories of lectures.csv for ones no category in
+    rules.toml matches (see validation.py); a summary is printed if any.
+    With params.engine = "cohort", all students are calculated at once; no
+    reports are written, traces is left empty and the cache is not used.
+    progress is called on the thread running calc_students. When that is not a
+    GUI's main thread, progress should hand its values to the main loop, e.g.
+    through a queue, instead of updating widgets.
+    :param rules: CompiledRules, e.g. Rules.get_compiled_rules()
+    :param lec: Lectures object holding the validated lecture catalog
+    :param students: DataFrame of all grade rows, or an iterable of (student_id, grade_df) such as preprocess.StudentsCsvStream
+    :param log_path: Directory where per-student reports are written
+    :param progress: Function called as progress(done, total, res_dict) after each student; total is None for streamed students
+    :param cancel_event: threading.Event; once set, CalculationCancelled is raised after the current student
+    :param resolver: CategoryResolver built from rules.toml, e.g. Rules.get_category_resolver()
+    :param traces: Dictionary to store the trace of each student by student ID, if any
+    :param validation_report: Dictionary to store the validation report in, if any (see validation.new_report)
+    :param render_reports: Whether to render and write reports; by default only if traces is None
+    :return: List of result dictionaries in order of first appearance
+    :raises CalculationCancelled: If cancel_event is set
+    """
+    toml = rules.toml
+    student_id_col_name = rules.student_columns["key"]
+    workers = get_workers(rules)
+
+    # Match every category of lectures.csv once, before the per-student loop
+    if resolver is None:
+        resolver = category_resolver.CategoryResolver(toml)
+    resolver.resolve_all(lec.get_lectures()[rules.lecture_columns["category"]])
+
+    if validation_report is None:
+        validation_report = {}
+    validation_report.update(validation.new_report())
+    validation.check_categories(validation_report, rules, lec, resolver)
+
+    total_students = None
+    if isinstance(students, pd.DataFrame):
+        students = _with_gp(rules, students)
+        total_students = students[student_id_col_name].nunique(dropna=False)
+        validation.check_grades(validation_report, rules, lec, students)
+    else:
+        students = ((k, _with_gp(rules, g)) for k, g in students)
+    done = 0
+
+    def _report(res_dict):
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress(done, total_students, res_dict)
+        if cancel_event is not None and cancel_event.is_set():
+            raise CalculationCancelled()
+
+    if rules.engine == "cohort":
+        calc_res = _calc_students_cohort(
+            rules, lec, students, resolver, _report, validation_report
+        )
+        if validation.has_issues(validation_report):
+            print(validation.summary(validation_report))
+        return calc_res
+
+    if isinstance(students, pd.DataFrame):
+        batches = [(list(iter_student_grades(students, student_id_col_name)), students)]
+    else:
+        # Streamed students are calculated a batch at a time to bound memory
+        def stream_batches():
+            for batch in _iter_batches(students, STREAM_BATCH_STUDENTS):
+                grades_df = pd.concat([grade_df for _, grade_df in batch])
+                validation.check_grades(validation_report, rules, lec, grades_df)
+                yield batch, grades_df
+
+        batches = stream_batches()
+
+    render = traces is None if render_reports is None else render_reports
+    sink = report_sink.open_sink(toml, log_path) if render else None
+
+    cache = None
+    if result_cache.is_enabled(toml):
+        cache = result_cache.ResultCache(
+            toml,
+            lec.get_lectures(),
+            log_path,
+            report_exists=sink.exists if render else None,
+        )
+
+    executor = None
+    if workers > 1:
+        # Spawn rather than fork: the report writer thread is already running,
+        # and the GUI calls this from a worker thread
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(rules, lec, render, instrumentation.is_enabled()),
+        )
+
+    calc_res = []
+    try:
+        for student_grades, grades_df in batches:
+            batch_res = [None] * len(student_grades)
+            # GPA of the whole batch at once, from all of its grade rows
+            gpas = _calc_gpas(rules, lec, grades_df)
+
+            # Reuse results of students whose inputs have not changed since the last run
+            fingerprints = {}
+            if cache is not None:
+                for i, (student_id, grade_df) in enumerate(student_grades):
+                    if grade_df.empty:
+                        continue
+                    fingerprints[i] = cache.fingerprint(grade_df)
+                    hit = cache.get(student_id, fingerprints[i])
+                    if hit is not None:
+                        batch_res[i], trace = hit
+                        if traces is not None:
+                            traces[student_id] = trace
+                        _report(batch_res[i])
+            todo = [i for i, res_dict in enumerate(batch_res) if res_dict is None]
+            pending = [
+                (student_id, grade_df, gpas.get(student_id))
+                for student_id, grade_df in (student_grades[i] for i in todo)
+            ]
+
+            if executor is not None and len(pending) > 1:
+                results = _calc_students_parallel(executor, pending, workers)
+            else:
+                results = (
+                    _calc_and_render(
+                        rules, lec, student_id, grade_df, gpa, resolver, render
+                    )
+                    for student_id, grade_df, gpa in pending
+                )
+            for i, (res_dict, trace, log_str) in zip(todo, results):
+                student_id = student_grades[i][0]
+                batch_res[i] = res_dict
+                if trace is not None and traces is not None:
+                    traces[student_id] = trace
+                if log_str is not None:
+                    sink.write(student_id, log_str)
+                if i in fingerprints:
+                    cache.put(student_id, fingerprints[i], res_dict, trace)
+                _report(res_dict)
+            calc_res.extend(batch_res)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if sink is not None:
+            sink.close()
+
+    if cache is not None:
+        cache.save()
+        print(cache.summary())
+    if validation.has_issues(validation_report):
+        print(validation.summary(validation_report))
+    return calc_res
+
+
+def load_lectures(toml, lecture_csv_path):
+    """
+    Read and validate lectures.csv with params.csv_encoding.
+    Unless params.csv_cache is false, the validated catalog is kept in a sidecar
+    file next to the CSV and reused while the CSV is unchanged.
+    :return: Lectures object
+    """
+    encoding = rules_toml.get_csv_encoding(toml)
+
+    def parse():
+        with instrumentation.phase("read lectures.csv"):
+            lectures_df = preprocess.read_lectures_csv(
+                lecture_csv_path, encoding, dtype=preprocess.lectures_dtype(toml)
+            )
+        return lectures.Lectures(toml, lectures_df).get_lectures()
+
+    with instrumentation.phase("load lectures"):
+        if csv_cache.is_enabled(toml):
+            lectures_df = csv_cache.read_cached(lecture_csv_path, toml, encoding, parse)
+        else:
+            lectures_df = parse()
+        return lectures.Lectures(
+            toml,
+            lectures_df,
+        )
+
+
+def load_inputs(toml, lecture_csv_path, student_csv_path, csv_encoding="utf-8"):
+    """
+    Read lectures.csv and students.csv.
+    With params.stream_students, students.csv is not read here but streamed in
+    chunks of params.stream_chunk_rows rows while calculating. Otherwise it is
+    cached next to the CSV like lectures.csv, unless params.csv_cache is false.
+    Grades are mapped through the grade scale of rules.toml into a float GP
+    column here, once for the whole table (or chunk).
+    :param toml: Dictionary containing rules
+    :param lecture_csv_path: Path to lectures.csv, read with params.csv_encoding
+    :param student_csv_path: Path to students.csv, read with csv_encoding
+    :return: Lectures object, DataFrame of all grade rows (or StudentsCsvStream)
+    """
+    lec = load_lectures(toml, lecture_csv_path)
+
+    grade_scale = rules_toml.get_grade_scale(toml)
+
+    def add_gp(students_df):
+        return lectures.add_gp_column(
+            students_df, toml["columns_in_students"]["grade"], grade_scale
+        )
+
+    students_dtype = preprocess.students_dtype(toml)
+    if toml["params"].get("stream_students", False):
+        students = preprocess.StudentsCsvStream(
+            student_csv_path,
+            csv_encoding,
+            toml["columns_in_students"]["key"],
+            chunksize=int(toml["params"].get("stream_chunk_rows", 100_000)),
+            dtype=students_dtype,
+            transform=add_gp,
+        )
+        return lec, students
+
+    def parse():
+        with instrumentation.phase("read students.csv"):
+            return preprocess.read_students_csv(
+                student_csv_path, encoding=csv_encoding, dtype=students_dtype
+            )
+
+    with instrumentation.phase("load students"):
+        if csv_cache.is_enabled(toml):
+            students_df = csv_cache.read_cached(
+                student_csv_path, toml, csv_encoding, parse
+            )
+        else:
+            students_df = parse()
+        # After the CSV cache, so that the cache does not depend on the grade scale
+        students_df = add_gp(students_df)
+    return lec, students_df
+
+
+def calc_all(
+    rules,
+    csv_encoding: str = "utf-8",
+    progress=None,
+    cancel_event=None,
+    resolver=None,
+    traces=None,
+    validation_report=None,
+):
+    """
+    Calculate every student from lectures.csv and students.csv in the
+    application directory, writing reports and caches to its log directory.
+    With params.profile, prints the time spent in each phase and the slowest
+    students afterwards; params.profile_dump additionally writes a cProfile
+    dump to that path, relative to the log directory.
+    :param rules: CompiledRules, e.g. Rules.get_compiled_rules()
+    """
+    toml = rules.toml
+    instrumentation.configure(toml)
     root_path = get_runtime_root_path()
     lecture_csv_path = os.path.join(root_path, "lectures.csv")
     student_csv_path = os.path.join(root_path, "students.csv")
@@ -179,76 +696,51 @@ def calc_all(toml, csv_encoding: str = "utf-8", progress_bar=None, master=None):
     log_path = os.path.join(root_path, "log")
     os.makedirs(log_path, exist_ok=True)
 
-    lecture_key_col_name = toml["columns_in_lectures"]["key"]
-    student_id_col_name = toml["columns_in_students"]["key"]
-    student_name = toml["columns_in_students"]["name"]
-
-    lectures_df = preprocess.read_lectures_csv(
-        lecture_csv_path, toml["params"]["csv_encoding"]
-    )
-    lec = lectures.Lectures(
-        toml,
-        lectures_df,
-    )
-    lectures_df = lec.get_lectures()
+    profile_dump = toml["params"].get("profile_dump")
+    if profile_dump:
+        profile_dump = os.path.join(log_path, profile_dump)
+    with instrumentation.profiling(profile_dump or None):
+        lec, students = load_inputs(
+            toml, lecture_csv_path, student_csv_path, csv_encoding=csv_encoding
+        )
+        calc_res = calc_students(
+            rules,
+            lec,
+            students,
+            log_path,
+            progress=progress,
+            cancel_event=cancel_event,
+            resolver=resolver,
+            traces=traces,
+            validation_report=validation_report,
+        )
+    if instrumentation.is_enabled():
+        print(instrumentation.summary())
+    return calc_res
 
-    students_df = preprocess.read_students_csv(student_csv_path, encoding=csv_encoding)
-    students_list = students_df[student_id_col_name].unique().tolist()
 
-    calc_res = []
-    if progress_bar is not None and master is not None:
-        total_students = len(students_list)
-        progress_bar.configure(maximum=total_students)
-    for student_id in students_list:
-        if progress_bar is not None and master is not None:
-            progress_bar.configure(value=students_list.index(student_id) + 1)
-            master.update_idletasks()  # Update UI
-
-        grade_df = students_df[students_df[student_id_col_name] == student_id]
-        if grade_df.empty:
-            print(f"Warning: No grades found for student {student_id}. Skipping.")
-            res_dict = {
-                "student_id": student_id,
-                "student_name": "Unknown",
-                "gpp": 0,
-                "gpa": 0,
-                "total_credits": 0,
-                "extrapolate_gpp": 0,
-                "credits_in_pool": 0,
-            }
-            calc_res.append(res_dict)
-            continue
-
-        res_dict = {
-            "student_id": student_id,
-            "student_name": students_df[students_df[student_id_col_name] == student_id][
-                student_name
-            ].values[0],
-            "gpp": 0,
-            "gpa": 0,
-            "total_credits": 0,
-            "extrapolate_gpp": 0,
-        }
-
-        lecture_key_list = grade_df[lecture_key_col_name].unique().tolist()
-        lec.check_undefined_lectures(lecture_key_list, student_id)
-
-        gpts, gpa, log_str = calc_gpt_score(toml, lectures_df, grade_df)
-        with open(
-            os.path.join(log_path, f"{student_id}.txt"), "w", encoding="utf-8"
-        ) as f:
-            f.write(log_str)
-        gpt_score = 0
-        total_credits = 0
-        for k, v in gpts.items():
-            gpt_score += v["gpp"]
-            if k != "Overflow_pool":
-                total_credits += v["credits"]
-        extrapolate_gpt = extrapolate_by_gpa(toml, gpt_score, total_credits, gpa)
-        res_dict["gpp"] = gpt_score
-        res_dict["gpa"] = gpa
-        res_dict["total_credits"] = total_credits
-        res_dict["extrapolate_gpp"] = extrapolate_gpt
-        res_dict["credits_in_pool"] = gpts["Overflow_pool"]["credits"]
-        calc_res.append(res_dict)
-    return calc_res
+def calc_trace(rules, student_id, csv_encoding="utf-8", resolver=None):
+    """
+    Calculate one student from lectures.csv and students.csv in the application
+    directory, e.g. to show the report of a student calculated by the cohort
+    engine, which writes none.
+    :return: Trace of the student, or None if the student has no grades
+    """
+    root_path = get_runtime_root_path()
+    lec, students = load_inputs(
+        rules.toml,
+        os.path.join(root_path, "lectures.csv"),
+        os.path.join(root_path, "students.csv"),
+        csv_encoding=csv_encoding,
+    )
+    student_id_col_name = rules.student_columns["key"]
+    if isinstance(students, pd.DataFrame):
+        grade_df = students[students[student_id_col_name] == student_id]
+    else:
+        grade_df = next((g for k, g in students if k == student_id), None)
+    if grade_df is None or grade_df.empty:
+        return None
+    if resolver is None:
+        resolver = category_resolver.CategoryResolver(rules.toml)
+    _, trace = calc_student(rules, lec, student_id, grade_df, resolver)
+    return trace
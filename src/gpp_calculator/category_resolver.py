@@ -0,0 +1,100 @@
+import re
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class ResolvedCategory(NamedTuple):
+    primary: tuple[str, ...]
+    home: frozenset[str]
+    pools: frozenset[str]
+
+
+class CategoryResolver:
+    def __init__(self, toml):
+        """
+        Resolve category strings of lectures.csv against the categories in rules.toml.
+        Each pattern is compiled once, and each distinct category string is matched
+        against it only the first time it is seen. Per-student work is then a lookup
+        on the distinct values of a category column.
+        :param toml: Dictionary containing categories and secondary_categories
+        """
+        self.categories = toml.get("categories", {})
+        self.secondary_categories = toml.get("secondary_categories", {})
+        self._matchers = {}
+        self._resolved = {}
+
+    def _matcher(self, pattern, fullmatch):
+        """
+        Return a memoized matcher for pattern, with the semantics of
+        Series.str.fullmatch (fullmatch=True) or Series.str.match (fullmatch=False).
+        """
+        key = (pattern, fullmatch)
+        if key not in self._matchers:
+            regex = re.compile(pattern)
+            test = regex.fullmatch if fullmatch else regex.match
+            self._matchers[key] = (test, {})
+        return self._matchers[key]
+
+    def _test(self, category, pattern, fullmatch):
+        test, results = self._matcher(pattern, fullmatch)
+        if category not in results:
+            results[category] = test(category) is not None
+        return results[category]
+
+    def _mask(self, category_sr: pd.Series, pattern: str, fullmatch: bool):
+        codes, uniques = pd.factorize(category_sr)
+        # The trailing False is picked up by code -1 (missing values)
+        flags = np.array(
+            [self._test(c, pattern, fullmatch) for c in uniques] + [False],
+            dtype=bool,
+        )
+        return pd.Series(flags[codes], index=category_sr.index)
+
+    def fullmatch(self, category_sr: pd.Series, pattern: str):
+        """
+        Same as category_sr.str.fullmatch(pattern), except that missing values are False.
+        """
+        return self._mask(category_sr, pattern, True)
+
+    def match(self, category_sr: pd.Series, pattern: str):
+        """
+        Same as category_sr.str.match(pattern), except that missing values are False.
+        """
+        return self._mask(category_sr, pattern, False)
+
+    def resolve(self, category: str) -> ResolvedCategory:
+        """
+        Map a category string to the primary categories it belongs to, the primary
+        categories in which it is a home course (my_courses), and its secondary pools.
+        :param category: Category string in lectures.csv
+        :return: ResolvedCategory
+        """
+        if category not in self._resolved:
+            primary = tuple(
+                k
+                for k, v in self.categories.items()
+                if any(self._test(category, p, True) for p in v["category"])
+            )
+            home = frozenset(
+                k
+                for k, v in self.categories.items()
+                if len(v.get("my_courses", [])) > 0
+                and self._test(category, "|".join(v["my_courses"]), False)
+            )
+            pools = frozenset(
+                k
+                for k, v in self.secondary_categories.items()
+                if self._test(category, "|".join(v["category"]), True)
+            )
+            self._resolved[category] = ResolvedCategory(primary, home, pools)
+        return self._resolved[category]
+
+    def resolve_all(self, categories):
+        """
+        Resolve every distinct category up front, e.g. all categories of lectures.csv.
+        :param categories: Iterable of category strings
+        :return: Dictionary of category string to ResolvedCategory
+        """
+        return {c: self.resolve(c) for c in pd.unique(pd.Series(categories).dropna())}
@@ -1,4 +1,126 @@
-def main() -> None:
+import argparse
+import os
+
+
+def run(args) -> None:
+    """
+    Calculate every student without the GUI. Only the calculation modules are
+    imported here, so this path never loads tkinter or ttkthemes.
+    """
+    import time
+
+    from . import (
+        calculator,
+        csv_export,
+        instrumentation,
+        report,
+        rules_toml,
+        validation,
+    )
+
+    start = time.perf_counter()
+    rules = rules_toml.Rules(args.rules)
+    rules.load_rules()
+    toml = rules.get_toml()
+    # Fail on invalid rules before reading any CSV
+    try:
+        compiled_rules = rules.get_compiled_rules()
+    except ValueError as e:
+        raise SystemExit(f"Invalid rules.toml: {e}")
+    if args.trace_json and compiled_rules.engine == "cohort":
+        raise SystemExit(
+            '--trace-json needs params.engine = "student";'
+            " the cohort engine records no traces."
+        )
+    csv_encoding = rules.get_csv_encoding()
+
+    log_path = args.log_dir
+    if log_path is None:
+        log_path = os.path.join(os.path.dirname(os.path.abspath(args.output)), "log")
+    os.makedirs(log_path, exist_ok=True)
+
+    # --profile turns on what params.profile in rules.toml would
+    instrumentation.configure(toml)
+    if args.profile and not instrumentation.is_enabled():
+        instrumentation.enable(toml["params"].get("profile_top", 10))
+
+    with instrumentation.profiling(args.profile_dump):
+        lec, students = calculator.load_inputs(
+            toml, args.lectures, args.students, csv_encoding=csv_encoding
+        )
+        # Keep the traces only if they are dumped; reports are written either way
+        traces = {} if args.trace_json else None
+        validation_report = {}
+        calc_res = calculator.calc_students(
+            compiled_rules,
+            lec,
+            students,
+            log_path,
+            resolver=rules.get_category_resolver(),
+            traces=traces,
+            validation_report=validation_report,
+            render_reports=True,
+        )
+        csv_export.export_csv(calc_res, args.output, encoding=csv_encoding)
+        if args.validation_json:
+            validation.dump_json(validation_report, args.validation_json)
+        if traces is not None:
+            report.dump_json(traces, args.trace_json)
+    if instrumentation.is_enabled():
+        print(instrumentation.summary())
+
+    elapsed = time.perf_counter() - start
+    # A StudentsCsvStream counts the rows it has read
+    rows = students.rows if hasattr(students, "rows") else len(students)
+    print(
+        f"{len(calc_res)} students, {rows} grade rows in {elapsed:.2f} sec"
+        f" ({rows / elapsed:.0f} rows/sec)"
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="gpp-calculator")
+    subparsers = parser.add_subparsers(dest="command")
+    run_parser = subparsers.add_parser(
+        "run", help="calculate all students without the GUI"
+    )
+    run_parser.add_argument("--lectures", required=True, help="path to lectures.csv")
+    run_parser.add_argument("--students", required=True, help="path to students.csv")
+    run_parser.add_argument("--rules", required=True, help="path to rules.toml")
+    run_parser.add_argument(
+        "--output", required=True, help="path to the results CSV to write"
+    )
+    run_parser.add_argument(
+        "--log-dir",
+        help="directory for per-student reports (default: log next to --output)",
+    )
+    run_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print time per phase and the slowest students (same as params.profile)",
+    )
+    run_parser.add_argument(
+        "--profile-dump", help="also write a cProfile dump to this file"
+    )
+    run_parser.add_argument(
+        "--trace-json",
+        help="also write the calculation trace of every student to this JSON file"
+        " (student engine only)",
+    )
+    run_parser.add_argument(
+        "--validation-json",
+        help="also write the lectures missing from lectures.csv, the categories"
+        " matching no rule and the unknown grades to this JSON file",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        for path in (args.lectures, args.students, args.rules):
+            if not os.path.exists(path):
+                parser.error(f"file not found: {path}")
+        run(args)
+        return
+
     import importlib
 
     mod = importlib.import_module("gpp_calculator.app_calculator")
@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+
+from . import calculator, credit_pool, instrumentation, lectures
+
+
+def _category_flags(resolver, categories, pattern, fullmatch=True):
+    """
+    :param categories: Series of distinct category strings
+    :return: Boolean array, one flag per category
+    """
+    if fullmatch:
+        return resolver.fullmatch(categories, pattern).to_numpy()
+    return resolver.match(categories, pattern).to_numpy()
+
+
+def _group_sum(codes, weights, n):
+    return np.bincount(codes, weights=weights, minlength=n)
+
+
+@instrumentation.timed("cohort engine")
+def calc_cohort(rules, lec, grades_df, resolver):
+    """
+    Calculate GPP for every student of grades_df at once, with the same results
+    as calculator.calc_student gives one student at a time.
+    All grade rows are merged with the lecture catalog once. Within each
+    (student, category), lectures are ranked by is_home, GP and credit as in
+    select_lecture_to_knapsack, and the cut point, split lecture, overflow pool
+    and secondary pool transfers are computed with cumulative sums over the
+    whole cohort, one category at a time.
+    Sums are only exact in any order when credits are multiples of 1/1024;
+    students with other (or missing) credits are calculated with
+    calculator.calc_student instead, so that rounding is the same as there.
+    :param rules: CompiledRules
+    :param lec: Lectures object holding the validated lecture catalog
+    :param grades_df: DataFrame of all grade rows
+    :param resolver: CategoryResolver built from rules.toml
+    :return: List of result dictionaries in order of first appearance
+    """
+    col = rules.lecture_columns
+    student_col = rules.student_columns
+    lectures_df = lec.get_lectures()
+
+    student_codes, student_ids = pd.factorize(
+        grades_df[student_col["key"]], use_na_sentinel=False
+    )
+    n = len(student_ids)
+    if n == 0:
+        return []
+    _, first_rows = np.unique(student_codes, return_index=True)
+    names = grades_df[student_col["name"]].to_numpy()[first_rows]
+    missing_id = np.asarray(pd.isna(student_ids), dtype=bool)
+
+    gp, positions = lectures.lookup_grades(
+        lectures_df, grades_df, col["key"], student_col["grade"]
+    )
+    # Rows as in PersonalLectures.my_lectures_df: catalog order within each student
+    valid = (positions >= 0) & ~np.isnan(gp) & ~missing_id[student_codes]
+    rows = np.flatnonzero(valid)
+    rows = rows[np.lexsort((positions[rows], student_codes[rows]))]
+    codes = student_codes[rows]
+    gp = gp[rows]
+    credits = lectures_df[col["credit"]].to_numpy(dtype=float)[positions[rows]]
+
+    # Students with credits that do not add up exactly take the per-student path
+    fallback = np.zeros(n, dtype=bool)
+    fallback[codes[~(lectures.is_exact(credits) & (credits >= 0))]] = True
+    limits = np.array(
+        [rule.max_credits for rule in rules.categories]
+        + [pool.max_credits for pool in rules.secondary_categories],
+        dtype=float,
+    )
+    if not (lectures.is_exact(limits) & (limits >= 0)).all():
+        fallback[:] = True
+    fallback &= ~missing_id
+    keep = ~fallback[codes]
+    rows, codes, gp, credits = rows[keep], codes[keep], gp[keep], credits[keep]
+    points = gp * credits
+
+    # Categories of lectures not offered in the year are "Closed", as in make_grades_df
+    category_codes, categories = pd.factorize(lectures_df[col["category"]])
+    categories = pd.Series(list(categories) + ["Closed"])
+    category_codes = np.where(category_codes < 0, len(categories) - 1, category_codes)
+    row_categories = category_codes[positions[rows]]
+
+    pool_flags = {
+        pool.name: _category_flags(resolver, categories, "|".join(pool.patterns))[
+            row_categories
+        ]
+        for pool in rules.secondary_categories
+    }
+    bank = credit_pool.CreditPoolBank.from_pool_rules(rules.secondary_categories, n)
+
+    gpp = np.zeros(n)
+    total_credits = np.zeros(n)
+    pool_points = np.zeros(n)
+    pool_credits = np.zeros(n)
+    used_by_secondary = np.zeros(n)
+
+    for rule in rules.categories:
+        max_credits = float(rule.max_credits)
+
+        # One entry per (row, pattern) match, as concatenated per pattern
+        entries = []
+        pattern_order = []
+        for j, pattern in enumerate(rule.patterns):
+            matched = np.flatnonzero(
+                _category_flags(resolver, categories, pattern)[row_categories]
+            )
+            entries.append(matched)
+            pattern_order.append(np.full(len(matched), j))
+        entries = np.concatenate(entries) if entries else np.zeros(0, dtype=np.intp)
+        pattern_order = (
+            np.concatenate(pattern_order) if pattern_order else np.zeros(0, dtype=int)
+        )
+
+        if len(rule.my_courses) > 0:
+            is_home = _category_flags(
+                resolver, categories, "|".join(rule.my_courses), fullmatch=False
+            )[row_categories[entries]]
+        else:
+            is_home = np.zeros(len(entries), dtype=bool)
+
+        # Rank by student, then is_home, GP (descending) and credit, keeping
+        # the concatenation order for ties as the stable sorts do
+        order = np.lexsort(
+            (
+                entries,
+                pattern_order,
+                credits[entries],
+                -gp[entries],
+                is_home,
+                codes[entries],
+            )
+        )
+        entries, is_home = entries[order], is_home[order]
+        e_codes = codes[entries]
+        e_credits = credits[entries]
+        e_points = points[entries]
+        e_gp = gp[entries]
+
+        # Cumulative credits within each student; sums of exact credits
+        cum = np.cumsum(e_credits)
+        starts = np.searchsorted(e_codes, e_codes)
+        cum -= np.concatenate([[0.0], cum])[starts]
+        prev = cum - e_credits
+
+        selected = (prev < max_credits) | (cum <= max_credits)
+        split = selected & (cum > max_credits)
+        over = np.where(split, cum - max_credits, 0.0)
+
+        matched_credits = _group_sum(e_codes, e_credits, n)
+        category_points = _group_sum(
+            e_codes, np.where(selected, e_points, 0.0) - over * e_gp, n
+        )
+        # Unselected lectures, and the part of a split lecture above max_credits
+        rest_credits = np.where(selected, 0.0, e_credits) + over
+        rest_points = np.where(selected, 0.0, e_points) + over * e_gp
+
+        overflowed = matched_credits > max_credits
+        for pool_name, flags in pool_flags.items():
+            surplus = _group_sum(e_codes, rest_credits * flags[entries], n)
+            bank.add_credits(pool_name, np.where(overflowed, surplus, 0.0))
+        category_credits = np.where(overflowed, max_credits, matched_credits)
+
+        if rule.name in bank:
+            short = matched_credits < max_credits
+            got = bank.use_credits(
+                rule.name, np.where(short, max_credits - matched_credits, 0.0)
+            )
+            category_credits += got
+            used_by_secondary += got
+
+        gpp += category_points
+        total_credits += category_credits
+
+        if len(rule.my_courses) > 0:
+            pool_points += _group_sum(e_codes, rest_points * is_home, n)
+            pool_credits += _group_sum(e_codes, rest_credits * is_home, n)
+
+    gpp += pool_points
+    pool_credits -= used_by_secondary
+
+    gpas = lectures.calculate_gpas(
+        lectures_df,
+        grades_df,
+        col["key"],
+        col["credit"],
+        student_col["grade"],
+        student_col["key"],
+    )
+
+    fallback_grades = {}
+    if fallback.any():
+        fallback_df = grades_df[fallback[student_codes]]
+        fallback_grades = dict(
+            calculator.iter_student_grades(fallback_df, student_col["key"])
+        )
+
+    calc_res = []
+    for i, student_id in enumerate(student_ids):
+        if missing_id[i]:
+            res_dict, _ = calculator.calc_student(
+                rules, lec, student_id, grades_df.iloc[0:0], resolver
+            )
+        elif fallback[i]:
+            res_dict, _ = calculator.calc_student(
+                rules,
+                lec,
+                student_id,
+                fallback_grades[student_id],
+                resolver,
+                gpas.get(student_id),
+            )
+        else:
+            gpa = gpas[student_id]
+            res_dict = {
+                "student_id": student_id,
+                "student_name": names[i],
+                "gpp": gpp[i],
+                "gpa": gpa,
+                "total_credits": total_credits[i],
+                "extrapolate_gpp": calculator.extrapolate_by_gpa(
+                    rules, gpp[i], total_credits[i], gpa
+                ),
+                "credits_in_pool": pool_credits[i],
+            }
+        calc_res.append(res_dict)
+    return calc_res
@@ -1,36 +1,138 @@
+import numpy as np
+
+
+class CreditPoolBank:
+    def __init__(
+        self,
+        capacities: dict[str, int],
+        cate_names: dict[str, list[str]],
+        n_students: int = 1,
+        dtype=float,
+    ):
+        """
+        Capacity and balance of every secondary pool for a batch of students,
+        held in arrays so that each operation covers all students at once.
+        :param capacities: Capacity of each pool by name
+        :param cate_names: Category patterns of each pool by name
+        :param n_students: Number of students
+        :param dtype: dtype of the balances; object keeps the Python numbers as given
+        """
+        self._names = list(capacities)
+        self._index = {name: i for i, name in enumerate(self._names)}
+        self._capacity = np.array(
+            [capacities[name] for name in self._names], dtype=dtype
+        )
+        if (self._capacity < 0).any():
+            raise ValueError("Capacity must be a non-negative integer.")
+        self._credits = np.zeros((len(self._names), n_students), dtype=dtype)
+        self._cate_names = {name: cate_names[name] for name in self._names}
+        self._dtype = dtype
+
+    @classmethod
+    def from_pool_rules(cls, pools, n_students=1, dtype=float):
+        """
+        :param pools: PoolRule of each secondary pool, as in CompiledRules.secondary_categories
+        """
+        return cls(
+            {pool.name: pool.max_credits for pool in pools},
+            {pool.name: pool.patterns for pool in pools},
+            n_students,
+            dtype,
+        )
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def names(self) -> list[str]:
+        return list(self._names)
+
+    def get_category_names(self, name) -> list[str]:
+        return self._cate_names[name]
+
+    def credits(self, name) -> np.ndarray:
+        return self._credits[self._index[name]].copy()
+
+    def _amounts(self, amounts):
+        return np.broadcast_to(
+            np.asarray(amounts, dtype=self._dtype), self._credits.shape[1:]
+        )
+
+    def add_credits(self, name, amounts) -> np.ndarray:
+        """
+        Add amounts to the pool of each student, up to the capacity.
+        :param amounts: Credits per student, or one value for all
+        :return: Credits that did not fit, per student
+        """
+        amounts = self._amounts(amounts)
+        if (amounts < 0).any():
+            raise ValueError("Cannot add negative credits.")
+        i = self._index[name]
+        total = self._credits[i] + amounts
+        full = total > self._capacity[i]
+        surplus = np.where(full, total - self._capacity[i], 0)
+        self._credits[i] = np.where(full, self._capacity[i], total)
+        return surplus
+
+    def use_credits(self, name, amounts) -> np.ndarray:
+        """
+        Take amounts from the pool of each student, or all it holds if less.
+        :param amounts: Credits per student, or one value for all
+        :return: Credits granted, per student
+        """
+        amounts = self._amounts(amounts)
+        if (amounts < 0).any():
+            raise ValueError("Cannot use negative credits.")
+        i = self._index[name]
+        short = amounts > self._credits[i]
+        granted = np.where(short, self._credits[i], amounts)
+        self._credits[i] = np.where(short, 0, self._credits[i] - amounts)
+        return granted
+
+    def view(self, name, student=0):
+        """
+        :return: CreditPool of one student, sharing the balance with this bank
+        """
+        return CreditPool.from_bank(self, name, student)
+
+
 class CreditPool:
     def __init__(self, capacity: int, cate_names: list[str]):
-        if capacity < 0:
-            raise ValueError("Capacity must be a non-negative integer.")
-        self._credits = 0
-        self._capacity = capacity
-        self._cate_names = cate_names
+        """
+        Secondary pool of one student: a view of a single-student CreditPoolBank.
+        Balances keep the Python numbers they are given, as reports print them.
+        """
+        bank = CreditPoolBank({None: capacity}, {None: cate_names}, dtype=object)
+        self._bank = bank
+        self._name = None
+        self._student = 0
+
+    @classmethod
+    def from_bank(cls, bank: CreditPoolBank, name, student=0):
+        pool = cls.__new__(cls)
+        pool._bank = bank
+        pool._name = name
+        pool._student = student
+        return pool
 
     def credits(self) -> int:
-        return self._credits
+        return self._bank._credits[self._bank._index[self._name], self._student]
 
-    def add_credits(self, amount: int) -> None:
-        if amount < 0:
-            raise ValueError("Cannot add negative credits.")
+    def _one(self, amount):
+        amounts = np.zeros(self._bank._credits.shape[1:], dtype=self._bank._dtype)
+        amounts[self._student] = amount
+        return amounts
 
-        if self._credits + amount > self._capacity:
-            self._credits = self._capacity
-            surplus_credits = amount - (self._capacity - self._credits)
-        else:
-            self._credits += amount
-            surplus_credits = 0
-        return surplus_credits
+    def add_credits(self, amount: int) -> int:
+        """
+        :return: Credits that did not fit
+        """
+        return self._bank.add_credits(self._name, self._one(amount))[self._student]
 
-    def use_credits(self, amount: int) -> None:
-        if amount < 0:
-            raise ValueError("Cannot use negative credits.")
-        if amount > self._credits:
-            returned_credits = self._credits
-            self._credits = 0
-        else:
-            returned_credits = amount
-            self._credits -= amount
-        return returned_credits
+    def use_credits(self, amount: int) -> int:
+        """
+        :return: Credits granted
+        """
+        return self._bank.use_credits(self._name, self._one(amount))[self._student]
 
     def get_category_names(self) -> list[str]:
-        return self._cate_names
\ No newline at end of file
+        return self._bank.get_category_names(self._name)
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import pickle
+
+from . import __version__
+from .input_formatting import preprocess
+
+SIDECAR_SUFFIX = ".cache.pkl"
+
+
+def is_enabled(toml):
+    return bool(toml["params"].get("csv_cache", True))
+
+
+def _file_signature(csv_path):
+    stat = os.stat(csv_path)
+    with open(csv_path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+
+
+def _parser_key(toml, encoding):
+    """
+    Everything besides the CSV itself that shapes the parsed table: the column
+    definitions, the encoding, the package version and preprocess.py, which
+    holds site-specific processing.
+    """
+    with open(preprocess.__file__, "rb") as f:
+        preprocess_digest = hashlib.sha256(f.read()).hexdigest()
+    key = {
+        "version": __version__,
+        "preprocess": preprocess_digest,
+        "encoding": encoding,
+        "columns_in_lectures": dict(toml["columns_in_lectures"]),
+        "columns_in_students": dict(toml["columns_in_students"]),
+    }
+    return json.dumps(key, sort_keys=True, ensure_ascii=False)
+
+
+def read_cached(csv_path, toml, encoding, parse):
+    """
+    Return parse() for csv_path, reusing a pickled sidecar next to the CSV when
+    the CSV's size, mtime and content hash and the parser settings are unchanged.
+    The sidecar starts with a small header, so a stale one is detected without
+    loading the table.
+    :param csv_path: Path to the CSV file
+    :param toml: Dictionary containing rules
+    :param encoding: Encoding the CSV is read with
+    :param parse: Function that reads and validates the CSV into a DataFrame
+    :return: DataFrame
+    """
+    sidecar_path = csv_path + SIDECAR_SUFFIX
+    header = {"parser": _parser_key(toml, encoding), **_file_signature(csv_path)}
+
+    if os.path.exists(sidecar_path):
+        try:
+            with open(sidecar_path, "rb") as f:
+                if pickle.load(f) == header:
+                    return pickle.load(f)
+        # A truncated sidecar or one pickled by another version of pandas or
+        # this package can fail in many ways; any of them means parsing again
+        except Exception as e:  # noqa: BLE001
+            print(f"Ignoring unreadable cache: {sidecar_path} ({e!r})")
+
+    df = parse()
+    tmp_path = sidecar_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(header, f)
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, sidecar_path)
+    except OSError as e:
+        print(f"Could not write cache {sidecar_path}: {e}")
+    return df
@@ -2,21 +2,22 @@ import csv
 import os
 import tomllib
 
+from .rules_toml import get_csv_encoding
 from .runtime_path import get_runtime_root_path
 
 
-def export_csv(calc_res, file_path):
+def export_csv(calc_res, file_path, encoding=None):
     if not calc_res:
         return
 
-    root_path = get_runtime_root_path()
-    rules_toml_path = os.path.join(root_path, "rules.toml")
-    with open(rules_toml_path, "rb") as f:
-        toml = tomllib.load(f)
+    if encoding is None:
+        root_path = get_runtime_root_path()
+        rules_toml_path = os.path.join(root_path, "rules.toml")
+        with open(rules_toml_path, "rb") as f:
+            toml = tomllib.load(f)
+        encoding = get_csv_encoding(toml)
 
-    with open(
-        file_path, mode="w", newline="", encoding=toml["params"]["csv_encoding"]
-    ) as csvfile:
+    with open(file_path, mode="w", newline="", encoding=encoding) as csvfile:
         fieldnames = [
             "student_id",
             "student_name",
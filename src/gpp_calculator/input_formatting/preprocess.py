@@ -1,8 +1,42 @@
+from collections import defaultdict
+
+import numpy as np
 import pandas as pd
 
 
-def read_lectures_csv(lectures_csv_path, encoding):
-    df = pd.read_csv(lectures_csv_path, encoding=encoding, dtype=str, header=0)
+def lectures_dtype(toml):
+    """
+    Column types of lectures.csv. Credits are parsed as float once here and the
+    category column is held as Categorical. Other columns stay str.
+    """
+    col = toml["columns_in_lectures"]
+    dtype = defaultdict(lambda: str)
+    if "category" in col:
+        dtype[col["category"]] = "category"
+    if "credit" in col:
+        dtype[col["credit"]] = "float64"
+    return dtype
+
+
+def students_dtype(toml):
+    """
+    Column types of students.csv. IDs, names and grades repeat on every row, so
+    they are held as Categorical. Other columns stay str.
+    """
+    dtype = defaultdict(lambda: str)
+    for col_name in [
+        toml["columns_in_students"].get("key"),
+        toml["columns_in_students"].get("name"),
+        toml["columns_in_students"].get("grade"),
+        toml["columns_in_lectures"].get("key"),
+    ]:
+        if col_name is not None:
+            dtype[col_name] = "category"
+    return dtype
+
+
+def read_lectures_csv(lectures_csv_path, encoding, dtype=str):
+    df = pd.read_csv(lectures_csv_path, encoding=encoding, dtype=dtype, header=0)
 
     #### PROCESSING BELOW ####
     # "講義コード"と"履修年度"をconcatenateして"講義コード"を上書き更新
@@ -12,9 +46,16 @@ def read_lectures_csv(lectures_csv_path, encoding):
     return df
 
 
-def read_students_csv(students_csv_path, encoding):
-    df = pd.read_csv(students_csv_path, encoding=encoding, dtype=str, header=0)
+def read_students_csv(students_csv_path, encoding, dtype=str):
+    df = pd.read_csv(students_csv_path, encoding=encoding, dtype=dtype, header=0)
+    return preprocess_students(df)
+
 
+def preprocess_students(df):
+    """
+    Row-wise cleanup of students.csv. It may run on the whole table or on a
+    chunk of it, so it must not depend on rows of other students.
+    """
     #### PROCESSING BELOW ####
     # 上書き再履修が1の行を削除
     if "上書き再履修" in df.columns:
@@ -37,3 +78,90 @@ def read_students_csv(students_csv_path, encoding):
     #### PROCESSING ABOVE ####
 
     return df
+
+
+class StudentsCsvStream:
+    def __init__(
+        self,
+        students_csv_path,
+        encoding,
+        key_col_name,
+        chunksize=100_000,
+        dtype=str,
+        transform=None,
+    ):
+        """
+        Read students.csv in chunks of chunksize rows and yield one student at a
+        time, so that memory is bounded by the chunk size rather than the file.
+        The file must be grouped by key_col_name (e.g. sorted by student), which
+        is checked while reading.
+        :param students_csv_path: Path to students.csv
+        :param encoding: Encoding of students.csv
+        :param key_col_name: Column name for student ID
+        :param chunksize: Number of rows read at once
+        :param dtype: Column types, e.g. students_dtype(toml)
+        :param transform: Function applied to each chunk after preprocess_students, if any
+        """
+        self.students_csv_path = students_csv_path
+        self.encoding = encoding
+        self.key_col_name = key_col_name
+        self.chunksize = chunksize
+        self.dtype = dtype
+        self.transform = transform
+        self.rows = 0
+
+    def __iter__(self):
+        """
+        :return: Iterator of (student_id, grade_df) in file order
+        """
+        self.rows = 0
+        done_ids = set()
+        carry_df = None
+        reader = pd.read_csv(
+            self.students_csv_path,
+            encoding=self.encoding,
+            dtype=self.dtype,
+            header=0,
+            chunksize=self.chunksize,
+        )
+        with reader:
+            for chunk_df in reader:
+                chunk_df = preprocess_students(chunk_df)
+                if self.transform is not None:
+                    chunk_df = self.transform(chunk_df)
+                if carry_df is not None:
+                    chunk_df = pd.concat([carry_df, chunk_df])
+                if chunk_df.empty:
+                    continue
+                starts = self._run_starts(chunk_df)
+                # The last student may continue in the next chunk
+                carry_df = chunk_df.iloc[starts[-1] :]
+                yield from self._split(chunk_df, starts[:-1], starts[-1], done_ids)
+        if carry_df is not None and not carry_df.empty:
+            yield from self._split(carry_df, [0], len(carry_df), done_ids)
+
+    def _run_starts(self, df):
+        """
+        :return: Positions where a run of rows with the same student ID starts
+        """
+        codes, _ = pd.factorize(df[self.key_col_name], use_na_sentinel=False)
+        return [0] + (np.flatnonzero(codes[1:] != codes[:-1]) + 1).tolist()
+
+    def _split(self, df, starts, end, done_ids):
+        for start, stop in zip(starts, starts[1:] + [end]):
+            student_id = df[self.key_col_name].iloc[start]
+            if pd.isna(student_id):
+                if None not in done_ids:
+                    done_ids.add(None)
+                    # Missing IDs never compare equal, so no rows belong to them
+                    yield student_id, df.iloc[0:0]
+                continue
+            if student_id in done_ids:
+                raise ValueError(
+                    f"{self.students_csv_path} is not grouped by {self.key_col_name}: "
+                    f"rows of {student_id} are not contiguous. "
+                    "Sort the file by student or turn off params.stream_students."
+                )
+            done_ids.add(student_id)
+            self.rows += stop - start
+            yield student_id, df.iloc[start:stop]
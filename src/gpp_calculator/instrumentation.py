@@ -0,0 +1,191 @@
+import contextlib
+import functools
+import heapq
+import itertools
+import threading
+import time
+
+# Disabled by default; every hook below is a flag check until enable() is called
+_enabled = False
+_top_n = 10
+_lock = threading.Lock()
+_phases = {}  # phase name -> [total seconds, calls]
+_students = []  # min-heap of (seconds, tie-breaker, student_id), at most _top_n
+_counter = itertools.count()
+_NULL = contextlib.nullcontext()
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable(top_n=10):
+    """
+    Start recording phase times and the slowest top_n students, discarding
+    anything recorded before.
+    """
+    global _enabled, _top_n
+    _top_n = int(top_n)
+    reset()
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    with _lock:
+        _phases.clear()
+        _students.clear()
+
+
+def configure(toml):
+    """
+    Enable instrumentation if params.profile is true in rules.toml, keeping
+    params.profile_top slowest students. Otherwise disable it.
+    """
+    if toml["params"].get("profile", False):
+        enable(toml["params"].get("profile_top", 10))
+    else:
+        disable()
+
+
+def _add(name, seconds, calls=1):
+    with _lock:
+        entry = _phases.get(name)
+        if entry is None:
+            _phases[name] = [seconds, calls]
+        else:
+            entry[0] += seconds
+            entry[1] += calls
+
+
+def _add_student(student_id, seconds):
+    with _lock:
+        item = (seconds, next(_counter), student_id)
+        if len(_students) < _top_n:
+            heapq.heappush(_students, item)
+        elif _students and seconds > _students[0][0]:
+            heapq.heapreplace(_students, item)
+
+
+class _Phase:
+    __slots__ = ("name", "start", "student_id")
+
+    def __init__(self, name, student_id=None):
+        self.name = name
+        self.student_id = student_id
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        _add(self.name, seconds)
+        if self.student_id is not None:
+            _add_student(self.student_id, seconds)
+
+
+def phase(name):
+    """
+    Context manager adding the time spent in its block to phase name.
+    """
+    if not _enabled:
+        return _NULL
+    return _Phase(name)
+
+
+def student(student_id):
+    """
+    Context manager timing the whole calculation of one student.
+    """
+    if not _enabled:
+        return _NULL
+    return _Phase("student (total)", student_id)
+
+
+def timed(name):
+    """
+    Decorator adding the time spent in each call of the function to phase name.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _add(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def take():
+    """
+    Return what has been recorded and reset it, e.g. to send it from a worker
+    process to the main process.
+    :return: Phases and slowest students, for merge()
+    """
+    with _lock:
+        stats = ({k: list(v) for k, v in _phases.items()}, list(_students))
+        _phases.clear()
+        _students.clear()
+    return stats
+
+
+def merge(stats):
+    phases, students = stats
+    for name, (seconds, calls) in phases.items():
+        _add(name, seconds, calls)
+    for seconds, _, student_id in students:
+        _add_student(student_id, seconds)
+
+
+def summary():
+    """
+    :return: Table of cumulative time and calls per phase, and the slowest students
+    """
+    with _lock:
+        phases = sorted(_phases.items(), key=lambda kv: kv[1][0], reverse=True)
+        students = sorted(_students, reverse=True)
+    width = max([len(name) for name, _ in phases] + [5])
+    lines = [f"{'Phase':<{width}}  {'Calls':>8}  {'Total sec':>10}  {'Mean ms':>9}"]
+    for name, (seconds, calls) in phases:
+        lines.append(
+            f"{name:<{width}}  {calls:>8}  {seconds:>10.3f}"
+            f"  {seconds / calls * 1000:>9.3f}"
+        )
+    if students:
+        lines.append("")
+        lines.append(f"Slowest {len(students)} students")
+        for seconds, _, student_id in students:
+            lines.append(f"  {student_id}  {seconds * 1000:.1f} ms")
+    return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def profiling(dump_path=None):
+    """
+    Run the block under cProfile and write the stats to dump_path, to be read
+    with pstats or snakeviz. Does nothing if dump_path is None.
+    """
+    if dump_path is None:
+        yield
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(dump_path)
+        print(f"Profile written to {dump_path}")
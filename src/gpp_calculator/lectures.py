@@ -1,12 +1,26 @@
-from decimal import ROUND_HALF_UP, Decimal, getcontext
+from decimal import ROUND_HALF_EVEN, ROUND_HALF_UP, Context, Decimal
+from itertools import pairwise
 
+import numpy as np
 import pandas as pd
 
+from . import instrumentation
+from .rules_toml import DEFAULT_GRADE_SCALE, normalize_grade
+
 pd.set_option("display.unicode.east_asian", True)
 pd.set_option("display.unicode.ambiguous_as_wide", True)
 
+# Float GP of each grade row, added once to the whole students table
+GP_COL_NAME = "GP"
+
+# GPA is divided to 3 significant digits, then rounded to 2 decimals.
+# Local contexts keep this independent of the thread's decimal context.
+_GPA_DIVISION = Context(prec=3, rounding=ROUND_HALF_EVEN)
+_GPA_ROUNDING = Context(prec=28, rounding=ROUND_HALF_UP)
+
 
 class Lectures:
+    @instrumentation.timed("validate lectures")
     def __init__(self, toml, lectures_df):
         """
         Separate basic tables based on key_col_name in the constructor.
@@ -31,6 +45,10 @@ class Lectures:
             )
             raise ValueError(f"Duplicate values found in {self.key_col_name}.")
 
+        # Index by lecture key so that per-student lookups are hash-based.
+        # The hash table is shared by every copy of this DataFrame.
+        _index_by_key(self.all_lectures_df, self.key_col_name)
+
     def get_category_names(self, tar_col_name):
         return self.all_lectures_df[tar_col_name].unique().tolist()
 
@@ -43,8 +61,8 @@ class Lectures:
         :param key_list: List of lecture IDs
         :return: List of undefined lecture IDs
         """
-        all_lectures = self.all_lectures_df[self.key_col_name].tolist()
-        undefined_lectures = list(set(key_list) - set(all_lectures))
+        key_index = self.all_lectures_df.index
+        undefined_lectures = [k for k in dict.fromkeys(key_list) if k not in key_index]
         if undefined_lectures:
             print(f"===== undefined lecture for student {student_id} =====")
             print(undefined_lectures)
@@ -65,6 +83,15 @@ class Lectures:
         return dst_df
 
 
+def _index_by_key(lectures_df: pd.DataFrame, key_col_name: str):
+    """
+    Replace the index of lectures_df with the values of key_col_name.
+    The index is left unnamed so that merges on key_col_name stay unambiguous.
+    """
+    lectures_df.index = pd.Index(lectures_df[key_col_name])
+    lectures_df.index.name = None
+
+
 class PersonalLectures:
     def __init__(
         self,
@@ -76,7 +103,7 @@ class PersonalLectures:
     ):
         """
         Extract lecture information based on category_col_name
-        :param lectures_df: All lecture information
+        :param lectures_df: All lecture information, indexed by key_col_name as returned by Lectures.get_lectures()
         :param key_col_name: Column name for lecture ID
         """
         self.key_col_name = key_col_name
@@ -84,9 +111,14 @@ class PersonalLectures:
         self.credit_col_name = credit_col_name
         self.grade_col_name = grade_col_name
 
-        # Convert credits to float type
-        lectures_df = lectures_df.copy()
-        lectures_df[credit_col_name] = lectures_df[credit_col_name].astype(float)
+        # Convert credits to float type, unless it was already done at ingestion
+        if lectures_df[credit_col_name].dtype != float or isinstance(
+            lectures_df.index, pd.RangeIndex
+        ):
+            lectures_df = lectures_df.copy()
+            lectures_df[credit_col_name] = lectures_df[credit_col_name].astype(float)
+            if isinstance(lectures_df.index, pd.RangeIndex):
+                _index_by_key(lectures_df, key_col_name)
         self.all_lectures_df = lectures_df
 
     def get_home_lecture_categories(self):
@@ -98,91 +130,67 @@ class PersonalLectures:
 
         return lecture_category_list
 
-    def set_grades(self, grades_df: pd.DataFrame):
-        # convert SABC grades to GP
-        grades_df = grades_df.copy()
-        grades_df = grades_df[
-            grades_df[self.grade_col_name].isin(
-                [
-                    "Ｓ",
-                    "Ａ",
-                    "Ｂ",
-                    "Ｃ",
-                    "Ｆ",
-                    "S",
-                    "A",
-                    "B",
-                    "C",
-                    "F",
-                    "s",
-                    "a",
-                    "b",
-                    "c",
-                    "f",
-                    "4",
-                    "3",
-                    "2",
-                    "1",
-                    "0",
-                ]
+    @instrumentation.timed("set_grades")
+    def set_grades(self, grades_df: pd.DataFrame, grade_scale=None):
+        """
+        Keep the grade rows with a GP. The GP column is normally added to the
+        whole students table at ingestion by add_gp_column().
+        :param grade_scale: Grade scale to add the GP column with if it is missing, DEFAULT_GRADE_SCALE if None
+        """
+        if GP_COL_NAME not in grades_df.columns:
+            grades_df = add_gp_column(
+                grades_df, self.grade_col_name, grade_scale or DEFAULT_GRADE_SCALE
             )
-        ]
-        grades_df["GP"] = grades_df[self.grade_col_name].map(
+        grades_df = grades_df[grades_df[GP_COL_NAME].notna()]
+        # Categorical columns save memory on the whole table, but per student
+        # they only add overhead to every merge and concat, so decode them here
+        self.grades_df = grades_df.astype(
             {
-                "Ｓ": 4.0,
-                "Ａ": 3.0,
-                "Ｂ": 2.0,
-                "Ｃ": 1.0,
-                "Ｆ": 0.0,
-                "S": 4.0,
-                "A": 3.0,
-                "B": 2.0,
-                "C": 1.0,
-                "F": 0.0,
-                "s": 4.0,
-                "a": 3.0,
-                "b": 2.0,
-                "c": 1.0,
-                "f": 0.0,
-                "4": 4.0,
-                "3": 3.0,
-                "2": 2.0,
-                "1": 1.0,
-                "0": 0.0,
+                col_name: object
+                for col_name, dtype in grades_df.dtypes.items()
+                if isinstance(dtype, pd.CategoricalDtype)
             }
         )
-        self.grades_df = grades_df
 
+    @instrumentation.timed("make_grades_df")
     def make_grades_df(self):
-        codes = self.grades_df[self.key_col_name].tolist()
-        pattern = "|".join(codes)
-        dst_df = self.all_lectures_df[
-            self.all_lectures_df[self.key_col_name].str.fullmatch(pattern)
-        ]
+        codes = self.grades_df[self.key_col_name].unique()
+        # Look up catalog rows by key, keeping the catalog order
+        positions = self.all_lectures_df.index.get_indexer(codes)
+        positions = np.sort(positions[positions >= 0])
+        dst_df = self.all_lectures_df.take(positions)
+        if isinstance(dst_df[self.category_col_name].dtype, pd.CategoricalDtype):
+            # Per-student categories are plain strings (e.g. "Closed" below)
+            dst_df[self.category_col_name] = dst_df[self.category_col_name].astype(
+                object
+            )
         dst_df = dst_df.merge(
             self.grades_df, on=self.key_col_name, how="left", suffixes=("", "_student")
         )
-        dst_df["point"] = dst_df[self.credit_col_name].astype(float) * dst_df[
-            "GP"
-        ].astype(float)
+        dst_df["point"] = dst_df[self.credit_col_name] * dst_df["GP"]
 
         # If blank, it seems the lecture was not offered in the relevant year, so replace with Closed
         dst_df[self.category_col_name] = dst_df[self.category_col_name].fillna("Closed")
 
         self.my_lectures_df = dst_df
 
-    def extract_lecture_by_category(self, categories: list[str]):
+    @instrumentation.timed("extract_lecture_by_category")
+    def extract_lecture_by_category(self, categories: list[str], resolver=None):
         """
         Extract lectures from self.my_lectures_df whose category matches any of the given categories.
         :param categories: List of category patterns (regular expressions)
+        :param resolver: CategoryResolver shared across students, if any
         :return: DataFrame of matched lectures, sorted by GP and credit
         """
+        category_sr = self.my_lectures_df[self.category_col_name]
         dst_df = pd.DataFrame()
         for category in categories:
             # Extract lecture information
-            tmp_df = self.my_lectures_df[
-                self.my_lectures_df[self.category_col_name].str.fullmatch(category)
-            ]
+            if resolver is not None:
+                mask = resolver.fullmatch(category_sr, category)
+            else:
+                mask = category_sr.str.fullmatch(category)
+            tmp_df = self.my_lectures_df[mask]
             dst_df = pd.concat([dst_df, tmp_df], ignore_index=True)
         # sort by GP
         dst_df = dst_df.sort_values(
@@ -190,9 +198,11 @@ class PersonalLectures:
         )
         return dst_df
 
+    @instrumentation.timed("calculate_gpa")
     def calculate_gpa(self):
         """
         Calculate GPA based on the GP and credit columns.
+        calculate_gpas() gives the same value for all students at once.
         :return: GPA value
         """
         if self.my_lectures_df.empty:
@@ -203,52 +213,189 @@ class PersonalLectures:
         ).sum()
         total_credits = self.my_lectures_df[self.credit_col_name].sum()
 
-        if total_credits == 0:
-            return 0.0
+        return round_gpa(total_points, total_credits)
 
-        decimal_total_points = Decimal(str(total_points))
-        decimal_total_credits = Decimal(str(total_credits))
-        # Calculate GPA
-        getcontext().prec = 3  # Set precision for Decimal calculations
-        gpa = float(decimal_total_points / decimal_total_credits)
-        rounded_gpa = Decimal(gpa).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-        return float(rounded_gpa)
+def round_gpa(total_points, total_credits):
+    """
+    GPA from the sums of GP x credit and of credits, rounded to 2 decimals.
+    :return: GPA value, 0.0 if total_credits is 0
+    """
+    if total_credits == 0:
+        return 0.0
+    gpa = float(
+        _GPA_DIVISION.divide(Decimal(str(total_points)), Decimal(str(total_credits)))
+    )
+    return float(Decimal(gpa).quantize(Decimal("0.01"), context=_GPA_ROUNDING))
+
+
+def _lookup(sr: pd.Series, func):
+    """
+    Apply func, which maps an Index of values to a float array, to every value of sr.
+    Categorical columns are mapped once per category instead of once per row.
+    """
+    if isinstance(sr.dtype, pd.CategoricalDtype):
+        # Code -1 (missing) takes the NaN appended at the end
+        values = np.append(func(sr.cat.categories), np.nan)
+        return values[sr.cat.codes.to_numpy()]
+    return func(pd.Index(sr))
+
+
+def is_exact(values: np.ndarray):
+    """
+    Mask of the values that float sums keep exact, whatever the order of
+    addition: multiples of 1/1024 (e.g. half credits) below 2**20.
+    """
+    scaled = values * 1024
+    return (scaled == np.round(scaled)) & (np.abs(values) < 2**20)
 
-    def check_undefined_lectures(self, categories: list[str]):
-        """
-        Search the list of categories.category described in the TOML file and combine into a single list
-        :return: List of categories
-        """
-        valid_categories = []
-        for v in categories.values():
-            for k, vv in v.items():
-                if k == "category":
-                    valid_categories.extend(vv)
-        # Extract lecture information that does not match valid_categories
-        dst_df = self.my_lectures_df[
-            ~self.my_lectures_df[self.category_col_name].str.fullmatch(
-                "|".join(valid_categories)
-            )
-        ]
-        if not dst_df.empty:
-            print("===== invalid lecture =====")
-            print(dst_df)
 
+def grade_points(grade_sr: pd.Series, grade_scale: dict):
+    """
+    GP of every grade in grade_sr. Each distinct grade is normalized with
+    normalize_grade() and looked up in grade_scale once.
+    :return: Array of GP, NaN for grades not in grade_scale and missing grades
+    """
+    codes, grades = pd.factorize(grade_sr)
+    # Code -1 (missing) takes the NaN appended at the end
+    values = [
+        grade_scale.get(normalize_grade(g), np.nan) if isinstance(g, str) else np.nan
+        for g in grades
+    ]
+    return np.array(values + [np.nan], dtype=float)[codes]
+
+
+@instrumentation.timed("add_gp_column")
+def add_gp_column(grades_df: pd.DataFrame, grade_col_name: str, grade_scale: dict):
+    """
+    Add the float GP column of grade_col_name to a table of grade rows, so that
+    per-student code does no string work. The rows are not copied.
+    :param grade_scale: GP of each normalized grade, e.g. CompiledRules.grade_scale
+    :return: DataFrame with GP_COL_NAME added
+    """
+    grades_df = grades_df.copy(deep=False)
+    grades_df[GP_COL_NAME] = grade_points(grades_df[grade_col_name], grade_scale)
+    return grades_df
 
-def add_is_home_col(src_df: pd.DataFrame, col_name: str, categories: list[str]):
+
+def lookup_grades(
+    lectures_df: pd.DataFrame,
+    grades_df: pd.DataFrame,
+    key_col_name: str,
+    grade_col_name: str,
+):
+    """
+    GP and catalog row of every grade row, without building per-student frames.
+    :param lectures_df: All lecture information, indexed by key_col_name as returned by Lectures.get_lectures()
+    :param grades_df: Grade rows of any number of students, with the GP column of add_gp_column() (calculated with DEFAULT_GRADE_SCALE if missing)
+    :return: Array of GP (NaN if not a GP grade), array of positions in lectures_df (-1 if undefined)
+    """
+    if GP_COL_NAME in grades_df.columns:
+        gp = grades_df[GP_COL_NAME].to_numpy(dtype=float)
+    else:
+        gp = grade_points(grades_df[grade_col_name], DEFAULT_GRADE_SCALE)
+    return gp, lookup_lectures(lectures_df, grades_df[key_col_name])
+
+
+def lookup_lectures(lectures_df: pd.DataFrame, key_sr: pd.Series):
+    """
+    Catalog row of every lecture key in key_sr.
+    :param lectures_df: All lecture information, indexed by key_col_name as returned by Lectures.get_lectures()
+    :return: Array of positions in lectures_df (-1 if undefined)
+    """
+    positions = _lookup(
+        key_sr, lambda values: lectures_df.index.get_indexer(values).astype(float)
+    )
+    positions[np.isnan(positions)] = -1
+    return positions.astype(np.intp)
+
+
+@instrumentation.timed("calculate_gpas")
+def calculate_gpas(
+    lectures_df: pd.DataFrame,
+    grades_df: pd.DataFrame,
+    key_col_name: str,
+    credit_col_name: str,
+    grade_col_name: str,
+    student_col_name: str,
+):
+    """
+    GPA of every student in grades_df, as PersonalLectures.calculate_gpa()
+    gives it, from a single pass over all grade rows: each row with a GP grade
+    and a lecture in the catalog adds GP x credit and credit to its student.
+    The decimal context of the calling thread is neither used nor changed.
+    :param lectures_df: All lecture information, indexed by key_col_name as returned by Lectures.get_lectures()
+    :param grades_df: Grade rows of any number of students
+    :param student_col_name: Column name for student ID in grades_df
+    :return: Dictionary of student ID to GPA
+    """
+    student_codes, student_ids = pd.factorize(grades_df[student_col_name])
+    if len(student_ids) == 0:
+        return {}
+
+    gp, positions = lookup_grades(lectures_df, grades_df, key_col_name, grade_col_name)
+    valid = (positions >= 0) & ~np.isnan(gp) & (student_codes >= 0)
+
+    codes = student_codes[valid]
+    positions = positions[valid]
+    credits = lectures_df[credit_col_name].to_numpy(dtype=float)[positions]
+    # Missing credits count as 0, as sum() skips them
+    points = np.nan_to_num(gp[valid] * credits)
+    credits = np.nan_to_num(credits)
+
+    if is_exact(points).all() and is_exact(credits).all():
+        total_points = np.bincount(codes, weights=points, minlength=len(student_ids))
+        total_credits = np.bincount(codes, weights=credits, minlength=len(student_ids))
+    else:
+        # Rounding errors depend on the order of addition, so add each student's
+        # rows in catalog order with sum(), as calculate_gpa() does
+        order = np.lexsort((positions, codes))
+        points, credits = points[order], credits[order]
+        bounds = np.searchsorted(codes[order], np.arange(len(student_ids) + 1))
+        total_points = [points[a:b].sum() for a, b in pairwise(bounds)]
+        total_credits = [credits[a:b].sum() for a, b in pairwise(bounds)]
+    return {
+        student_id: round_gpa(p, c)
+        for student_id, p, c in zip(student_ids, total_points, total_credits)
+    }
+
+
+@instrumentation.timed("add_is_home_col")
+def add_is_home_col(
+    src_df: pd.DataFrame, col_name: str, categories: list[str], resolver=None
+):
     """
     Add a boolean column 'is_home' to src_df based on whether the value in col_name matches any of the given categories.
     :param src_df: DataFrame of lecture information
     :param col_name: Name of the column to match categories against
     :param categories: List of categories to match
+    :param resolver: CategoryResolver shared across students, if any
     :return: DataFrame with 'is_home' column added
     """
     category_stmt = "|".join(categories)
-    src_df["is_home"] = src_df[col_name].str.match(category_stmt)
+    if resolver is not None:
+        src_df["is_home"] = resolver.match(src_df[col_name], category_stmt)
+    else:
+        src_df["is_home"] = src_df[col_name].str.match(category_stmt)
     return src_df
 
 
+def appended_to_empty(df: pd.DataFrame):
+    """
+    df as it was when concatenated to an empty DataFrame with the same columns:
+    numpy columns that cannot hold NaN (int, uint and bool) become object, the
+    others keep their dtype.
+    """
+    return df.astype(
+        {
+            col: object
+            for col, dtype in df.dtypes.items()
+            if isinstance(dtype, np.dtype) and dtype.kind in "iub"
+        }
+    )
+
+
+@instrumentation.timed("select_lecture_to_knapsack")
 def select_lecture_to_knapsack(
     src_df: pd.DataFrame, max_credits: float, col_names: dict
 ):
@@ -266,8 +413,6 @@ def select_lecture_to_knapsack(
     :return: selected_df, unselected_df
     """
 
-    selected_df = pd.DataFrame(columns=src_df.columns)
-
     # Step 1: Sort the DataFrame based on priority
     # If 'is_home' column exists, prioritize False values first, then by GP
     if "is_home" in src_df.columns:
@@ -282,29 +427,30 @@ def select_lecture_to_knapsack(
         ).reset_index(drop=True)
 
     # Step 2: Select lectures to maximize points while staying within credit limit
-    total_credits = 0
-    idx = 0
-    next_idx = None
-    for idx, row in sorted_df.iterrows():
-        if total_credits + row[col_names["credit"]] > max_credits:
-            next_idx = idx
-            break
-        selected_df = pd.concat([selected_df, row.to_frame().T], ignore_index=False)
-        total_credits += row[col_names["credit"]]
-    if next_idx is None:
-        next_idx = idx + 1
+    # The first lecture whose cumulative credits exceed max_credits is the cut point
+    credits = sorted_df[col_names["credit"]].to_numpy(dtype=float)
+    cum_credits = np.cumsum(credits)
+    exceeded = cum_credits > max_credits
+    next_idx = int(exceeded.argmax()) if exceeded.any() else len(sorted_df)
+    total_credits = cum_credits[next_idx - 1] if next_idx > 0 else 0
     # for debugging
-    #print(f"Total credits after selection: {total_credits}")
+    # print(f"Total credits after selection: {total_credits}")
 
     # Step 3: If we haven't reached the minimum credits, add one more lectures from idx
+    n_selected = next_idx
     if total_credits < max_credits and next_idx < len(sorted_df):
-        selected_df = pd.concat(
-            [selected_df, sorted_df.loc[[next_idx]]], ignore_index=False
-        )
-        total_credits += sorted_df.loc[next_idx, col_names["credit"]]
+        n_selected += 1
+        total_credits += credits[next_idx]
+
+    # Rows chosen in Step 2 are held as objects, as they were when appended row by
+    # row. A lecture chosen by Step 3 alone is appended to an empty frame instead.
+    if next_idx == 0 and n_selected > 0:
+        selected_df = appended_to_empty(sorted_df.iloc[:n_selected])
+    else:
+        selected_df = sorted_df.iloc[:n_selected].astype(object)
 
     # Extract unselected lecture information
-    unselected_df = sorted_df[~sorted_df.index.isin(selected_df.index)]
+    unselected_df = sorted_df.iloc[n_selected:].copy()
 
     # Step 4: If we exceed the max credits, split the last lecture
     if total_credits > max_credits:
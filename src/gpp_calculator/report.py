@@ -0,0 +1,133 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from . import instrumentation
+
+
+def number(value):
+    """
+    Plain int or float for the trace, keeping ints as ints so that they are
+    rendered as before (e.g. max_credits "20", not "20.0").
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return float(value)
+
+
+def plain(value):
+    """
+    Python scalar for a NumPy scalar, so that the trace can be written as JSON.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+@instrumentation.timed("trace tables")
+def frame_to_block(df: pd.DataFrame, key_col_name: str):
+    """
+    Keep the rows of a report table as plain lists, together with the dtypes
+    they had, so the table renders the same later.
+    :param df: DataFrame of lectures with the report columns
+    :param key_col_name: Column name for lecture ID, used as the row labels
+    :return: Dictionary of key, columns, dtypes and data (one list per column)
+    """
+    return {
+        "key": key_col_name,
+        "columns": list(df.columns),
+        "dtypes": [str(dtype) for dtype in df.dtypes],
+        "data": [[plain(v) for v in df[c].tolist()] for c in df.columns],
+    }
+
+
+def block_to_frame(block):
+    return pd.DataFrame(
+        {
+            c: pd.Series(values, dtype=dtype)
+            for c, dtype, values in zip(
+                block["columns"], block["dtypes"], block["data"]
+            )
+        },
+        columns=block["columns"],
+    )
+
+
+def _render_block(block):
+    return (
+        block_to_frame(block)
+        .set_index(block["key"])
+        .to_string(
+            max_rows=None,
+            max_cols=None,
+            line_width=None,
+        )
+    )
+
+
+@instrumentation.timed("render report")
+def render(trace):
+    """
+    Render the report text of one student from the trace built by
+    calculator.calc_gpt_score.
+    :param trace: Dictionary of the student's calculation steps
+    :return: Report text
+    """
+    with pd.option_context(
+        "display.unicode.east_asian_width",
+        True,
+        "display.unicode.ambiguous_as_wide",
+        True,
+    ):
+        log_str = f"{trace['student_id']} {trace['student_name']}\n"
+        for step in trace["categories"]:
+            log_str += f"\n======== [{step['name']}] ========\n"
+            log_str += _render_block(step["selected"]) + "\n"
+            if step["from_secondary"] is not None:
+                log_str += f"<From secondary categories: {step['from_secondary']:+}>\n"
+            log_str += (
+                f"Points: {step['points']:.1f}"
+                f"  Credits: {step['credits']}/{step['max_credits']}\n"
+            )
+            if step["overflow"] is not None:
+                log_str += "-------- Overflow --------\n"
+                log_str += _render_block(step["overflow"]) + "\n"
+
+        pool = trace["overflow_pool"]
+        log_str += "\n======== [Overflow Pool] ========\n"
+        log_str += _render_block(pool["lectures"]) + "\n"
+        if pool["to_secondary"] > 0:
+            log_str += f"<To secondary categories: {pool['to_secondary'] * (-1):+}>\n"
+        log_str += f"Points: {pool['points']:.1f}  Credits: {pool['credits']}\n"
+        log_str += f"\nTotal Points: {trace['total_points']:.1f}"
+        log_str += f" (GPA: {trace['gpa']:.2f})"
+    return log_str
+
+
+def dump_json(traces, file_path):
+    """
+    Write traces as one JSON object keyed by student ID.
+    Missing values are written as NaN, as json.dump does by default.
+    :param traces: Dictionary of student ID to trace
+    :param file_path: Path to the JSON file to write
+    """
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump({str(k): v for k, v in traces.items()}, f, ensure_ascii=False)
+
+
+def write_reports(toml, traces, log_path):
+    """
+    Render every trace and write the reports to log_path, as
+    calculator.calc_students does when it is not given a traces dictionary.
+    """
+    from . import report_sink
+
+    sink = report_sink.open_sink(toml, log_path)
+    try:
+        for student_id, trace in traces.items():
+            sink.write(student_id, render(trace))
+    finally:
+        sink.close()
@@ -0,0 +1,148 @@
+import os
+import queue
+import threading
+import zipfile
+
+from . import instrumentation
+
+ARCHIVE_FILE_NAME = "reports.zip"
+
+_STOP = object()
+
+
+def is_archive(toml):
+    return bool(toml["params"].get("report_archive", False))
+
+
+class ReportSink:
+    def __init__(self, log_path, max_pending=256):
+        """
+        Write per-student reports on a background thread, so that file I/O
+        overlaps with the calculation. Reports are queued in a bounded queue;
+        write() blocks only when max_pending reports are waiting. If writing fails,
+        the thread keeps draining the queue, and the error is raised by the next
+        write() or by close().
+        Reports are written to log_path/<student_id>.txt.
+        :param log_path: Directory where per-student reports are written
+        :param max_pending: Maximum number of queued reports
+        """
+        self.log_path = log_path
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def exists(self, student_id):
+        return os.path.exists(os.path.join(self.log_path, f"{student_id}.txt"))
+
+    def write(self, student_id, log_str):
+        if self._error is not None:
+            raise self._error
+        self._queue.put((student_id, log_str))
+
+    def close(self):
+        """
+        Wait until every queued report is written.
+        """
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            if self._error is not None:
+                continue  # drain the queue so that write() never blocks forever
+            try:
+                with instrumentation.phase("write report"):
+                    self._write(*item)
+            except BaseException as e:  # noqa: BLE001 - re-raised by write() and close()
+                self._error = e
+        try:
+            self._finish()
+        except BaseException as e:  # noqa: BLE001 - re-raised by close()
+            if self._error is None:
+                self._error = e
+
+    def _write(self, student_id, log_str):
+        with open(
+            os.path.join(self.log_path, f"{student_id}.txt"), "w", encoding="utf-8"
+        ) as f:
+            f.write(log_str)
+
+    def _finish(self):
+        pass
+
+
+class ArchiveReportSink(ReportSink):
+    def __init__(self, log_path, max_pending=256):
+        """
+        Write all reports into log_path/reports.zip instead of one file each.
+        Reports of the previous archive that are not rewritten in this run are
+        carried over when the sink is closed.
+        """
+        self.archive_path = os.path.join(log_path, ARCHIVE_FILE_NAME)
+        self._tmp_path = self.archive_path + ".tmp"
+        self._previous = set()
+        if os.path.exists(self.archive_path):
+            with zipfile.ZipFile(self.archive_path) as zf:
+                self._previous = set(zf.namelist())
+        self._written = set()
+        self._zf = zipfile.ZipFile(
+            self._tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1
+        )
+        super().__init__(log_path, max_pending=max_pending)
+
+    def exists(self, student_id):
+        return f"{student_id}.txt" in self._previous
+
+    def _write(self, student_id, log_str):
+        name = f"{student_id}.txt"
+        self._zf.writestr(name, log_str)
+        self._written.add(name)
+
+    def _finish(self):
+        replaced = False
+        try:
+            if self._error is None and self._previous - self._written:
+                with zipfile.ZipFile(self.archive_path) as zin:
+                    for name in sorted(self._previous - self._written):
+                        self._zf.writestr(zin.getinfo(name), zin.read(name))
+            self._zf.close()
+            if self._error is None:
+                os.replace(self._tmp_path, self.archive_path)
+                replaced = True
+        finally:
+            if not replaced:
+                self._zf.close()
+                os.remove(self._tmp_path)
+
+
+def open_sink(toml, log_path):
+    """
+    :return: ArchiveReportSink if params.report_archive is true, otherwise ReportSink
+    """
+    if is_archive(toml):
+        return ArchiveReportSink(log_path)
+    return ReportSink(log_path)
+
+
+def read_report(toml, log_path, student_id):
+    """
+    Read one student's report from wherever open_sink(toml, log_path) wrote it.
+    A zip archive has a central index, so this does not scan other reports.
+    :raises FileNotFoundError: If the student has no report
+    """
+    name = f"{student_id}.txt"
+    if is_archive(toml):
+        archive_path = os.path.join(log_path, ARCHIVE_FILE_NAME)
+        with zipfile.ZipFile(archive_path) as zf:
+            try:
+                return zf.read(name).decode("utf-8")
+            except KeyError:
+                raise FileNotFoundError(f"{name} not found in {archive_path}")
+    with open(os.path.join(log_path, name), "r", encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from . import __version__, instrumentation
+from .rules_toml import thaw
+
+CACHE_FILE_NAME = "results_cache.pkl"
+# Bump when the layout of cache entries changes
+CACHE_FORMAT = 2
+
+# params that change how results are read, shown or scheduled but not the results
+_PARAMS_NOT_AFFECTING_RESULTS = {
+    "csv_encoding",
+    "font_in_report",
+    "workers",
+    "report_archive",
+    "profile",
+    "profile_top",
+    "profile_dump",
+    "engine",
+}
+
+
+def is_enabled(toml):
+    return bool(toml["params"].get("incremental", True))
+
+
+class ResultCache:
+    def __init__(self, toml, lectures_df, log_path, report_exists=None):
+        """
+        Persistent per-student results, keyed by a fingerprint of everything the
+        result depends on: the student's grade rows, the catalog rows of the
+        lectures they took, the normalized rules and the calculator version.
+        The cache file is stored next to the reports in log_path.
+        :param toml: Dictionary containing rules
+        :param lectures_df: Lecture catalog indexed by key, as returned by Lectures.get_lectures()
+        :param log_path: Directory where per-student reports are written
+        :param report_exists: Function telling whether a student's report was written, e.g. ReportSink.exists. If None, reports are not checked.
+        """
+        self.log_path = log_path
+        self.report_exists = report_exists
+        self.cache_path = os.path.join(log_path, CACHE_FILE_NAME)
+        self.lecture_key_col_name = toml["columns_in_lectures"]["key"]
+        self.lectures_df = lectures_df
+        self.hits = 0
+        self.recomputes = 0
+
+        rules = {k: thaw(v) for k, v in toml.items() if k != "params"}
+        rules["params"] = {
+            k: thaw(v)
+            for k, v in toml["params"].items()
+            if k not in _PARAMS_NOT_AFFECTING_RESULTS
+        }
+        rules["lecture_columns"] = list(lectures_df.columns)
+        rules["version"] = __version__
+        rules["cache_format"] = CACHE_FORMAT
+        normalized = json.dumps(rules, sort_keys=True, ensure_ascii=False, default=str)
+        self._rules_digest = hashlib.sha256(normalized.encode("utf-8")).digest()
+
+        # Hash every catalog row once; students only gather their rows
+        self._lecture_hashes = pd.util.hash_pandas_object(
+            lectures_df, index=False
+        ).to_numpy()
+
+        self._entries = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "rb") as f:
+                    self._entries = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                print(f"Ignoring unreadable result cache: {self.cache_path}")
+        self._seen = set()
+
+    @instrumentation.timed("cache fingerprint")
+    def fingerprint(self, grade_df: pd.DataFrame) -> str:
+        """
+        :param grade_df: DataFrame of the student's grade rows
+        :return: Hex digest identifying the inputs of the student's result
+        """
+        h = hashlib.sha256(self._rules_digest)
+        h.update(json.dumps(list(grade_df.columns), default=str).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(grade_df, index=False).to_numpy().tobytes())
+        codes = grade_df[self.lecture_key_col_name].unique()
+        positions = self.lectures_df.index.get_indexer(codes)
+        positions = np.sort(positions[positions >= 0])
+        h.update(self._lecture_hashes[positions].tobytes())
+        return h.hexdigest()
+
+    def get(self, student_id, fingerprint):
+        """
+        :return: Cached result dictionary and trace, or None if the student must be recalculated
+        """
+        self._seen.add(student_id)
+        entry = self._entries.get(student_id)
+        if (
+            entry is None
+            or entry[0] != fingerprint
+            or (self.report_exists is not None and not self.report_exists(student_id))
+        ):
+            self.recomputes += 1
+            return None
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, student_id, fingerprint, res_dict, trace):
+        self._entries[student_id] = (fingerprint, res_dict, trace)
+
+    def save(self):
+        """
+        Write the cache, dropping students that were not part of this run.
+        """
+        entries = {k: v for k, v in self._entries.items() if k in self._seen}
+        with open(self.cache_path, "wb") as f:
+            pickle.dump(entries, f)
+
+    def summary(self):
+        return f"Result cache: {self.hits} hits, {self.recomputes} recomputed"
@@ -0,0 +1,260 @@
+import tkinter as tk
+from tkinter import ttk
+
+COLUMNS = (
+    ("student_id", "Student ID"),
+    ("student_name", "Student Name"),
+    ("gpp", "Points"),
+    ("gpa", "GPA"),
+    ("total_credits", "Credits"),
+    ("extrapolate_gpp", "Extrapolate Points"),
+    ("credits_in_pool", "Credits in Pool"),
+)
+NUMERIC_COLUMNS = {"gpp", "gpa", "total_credits", "extrapolate_gpp", "credits_in_pool"}
+
+
+def format_row(res):
+    return (
+        res["student_id"],
+        res["student_name"],
+        f"{res['gpp']:.1f}",
+        f"{res['gpa']:.2f}",
+        f"{res['total_credits']:.1f}",
+        f"{res['extrapolate_gpp']:.2f}",
+        f"{res['credits_in_pool']:.1f}",
+    )
+
+
+class ResultsView(ttk.Frame):
+    def __init__(self, master, on_open=None):
+        """
+        Results table that only materializes the rows on screen.
+        The Treeview holds one item per visible line, and scrolling rewrites the
+        values of those items from the list of results, so adding, sorting or
+        clearing tens of thousands of results never inserts or deletes items.
+        :param master: Parent widget
+        :param on_open: Function called with the result dictionary of a double-clicked row
+        """
+        super().__init__(master)
+        self.on_open = on_open
+
+        self.tree = ttk.Treeview(
+            self,
+            columns=[c for c, _ in COLUMNS],
+            show="headings",
+            selectmode="browse",
+        )
+        for col_name, text in COLUMNS:
+            self.tree.heading(
+                col_name, text=text, command=lambda c=col_name: self.sort_by(c)
+            )
+            self.tree.column(col_name, width=100)
+        self.tree.pack(
+            padx=(10, 0), pady=(0, 10), fill=tk.BOTH, expand=True, side=tk.LEFT
+        )
+
+        self.scrollbar = ttk.Scrollbar(
+            self, orient=tk.VERTICAL, command=self._on_scrollbar
+        )
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.rows = []  # result dictionaries
+        self.values = []  # formatted values of each row
+        self.ids = []  # student IDs as lower-case strings, for search
+        self.order = []  # row indices in display order
+        self.top = 0  # position in self.order of the first visible line
+        self.lines = 1  # number of visible lines
+        self.height = 0  # height of the Treeview in pixels
+        self.line_height = None  # measured on the first item shown
+        self.selected = None  # row index of the selected row
+        self.sort_col = None
+        self.sort_desc = False
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<Double-1>", self._on_open)
+        self.tree.bind("<Return>", self._on_open)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.move_selection(-self.lines))
+        self.tree.bind("<Next>", lambda event: self.move_selection(self.lines))
+
+    def clear(self):
+        self.set_rows([])
+
+    def set_rows(self, rows):
+        """
+        Replace all results, keeping the current sort order.
+        """
+        self.rows = list(rows)
+        self.values = [format_row(res) for res in self.rows]
+        self.ids = [str(res["student_id"]).lower() for res in self.rows]
+        self.selected = None
+        self.top = 0
+        self._apply_sort()
+        self.refresh()
+
+    def append(self, res):
+        """
+        Add one result at the end, regardless of the sort order. Call refresh()
+        once after appending a batch.
+        """
+        self.rows.append(res)
+        self.values.append(format_row(res))
+        self.ids.append(str(res["student_id"]).lower())
+        self.order.append(len(self.rows) - 1)
+
+    def sort_by(self, col_name):
+        """
+        Sort by col_name, toggling between ascending and descending.
+        """
+        if self.sort_col == col_name:
+            self.sort_desc = not self.sort_desc
+        else:
+            self.sort_col = col_name
+            self.sort_desc = False
+        for c, text in COLUMNS:
+            if c == col_name:
+                text += " ▼" if self.sort_desc else " ▲"
+            self.tree.heading(c, text=text)
+        self._apply_sort()
+        self._show_selected()
+        self.refresh()
+
+    def _apply_sort(self):
+        self.order = list(range(len(self.rows)))
+        if self.sort_col is None:
+            return
+        col_name = self.sort_col
+        if col_name in NUMERIC_COLUMNS:
+
+            def key(i):
+                return float(self.rows[i][col_name])
+        else:
+
+            def key(i):
+                return str(self.rows[i][col_name])
+
+        self.order.sort(key=key, reverse=self.sort_desc)
+
+    def search(self, text):
+        """
+        Select and show the first row, in display order, whose student ID
+        starts with text (case-insensitive).
+        :return: True if a row was found
+        """
+        text = text.strip().lower()
+        if not text:
+            return False
+        for pos, i in enumerate(self.order):
+            if self.ids[i].startswith(text):
+                self.selected = i
+                self.top = pos
+                self.refresh()
+                return True
+        return False
+
+    def get_selected(self):
+        """
+        :return: Result dictionary of the selected row, or None
+        """
+        if self.selected is None:
+            return None
+        return self.rows[self.selected]
+
+    def scroll(self, lines):
+        self.top += lines
+        self.refresh()
+        return "break"
+
+    def move_selection(self, step):
+        if not self.order:
+            return "break"
+        if self.selected is None:
+            pos = self.top
+        else:
+            pos = self.order.index(self.selected) + step
+        pos = min(max(pos, 0), len(self.order) - 1)
+        self.selected = self.order[pos]
+        self._show_selected()
+        self.refresh()
+        return "break"
+
+    def _show_selected(self):
+        if self.selected is None:
+            return
+        pos = self.order.index(self.selected)
+        if pos < self.top:
+            self.top = pos
+        elif pos >= self.top + self.lines:
+            self.top = pos - self.lines + 1
+
+    def refresh(self):
+        """
+        Write the visible part of the results into the Treeview items.
+        """
+        self.top = max(0, min(self.top, len(self.order) - self.lines))
+        visible = self.order[self.top : self.top + self.lines]
+
+        items = self.tree.get_children()
+        if len(items) > len(visible):
+            self.tree.delete(*items[len(visible) :])
+        for line in range(len(items), len(visible)):
+            self.tree.insert("", tk.END, iid=str(line))
+        for line, i in enumerate(visible):
+            self.tree.item(str(line), values=self.values[i])
+
+        if self.selected in visible:
+            self.tree.selection_set(str(visible.index(self.selected)))
+        else:
+            self.tree.selection_set(())
+
+        total = max(len(self.order), 1)
+        self.scrollbar.set(self.top / total, (self.top + len(visible)) / total)
+
+        if self.line_height is None and visible:
+            self.after_idle(self._measure_line_height)
+
+    def _fit_lines(self):
+        # One line is taken by the headings
+        self.lines = max(1, self.height // (self.line_height or 20) - 1)
+
+    def _measure_line_height(self):
+        bbox = self.tree.bbox("0") if self.tree.exists("0") else ""
+        if bbox and self.line_height is None:
+            self.line_height = bbox[3]
+            self._fit_lines()
+            self.refresh()
+
+    def _on_configure(self, event):
+        self.height = event.height
+        self._fit_lines()
+        self.refresh()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.order))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self.top += amount * self.lines if args[2] == "pages" else amount
+        self.refresh()
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120, macOS small steps
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.scroll(-3 * delta)
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            pos = self.top + int(selection[0])
+            if pos < len(self.order):
+                self.selected = self.order[pos]
+
+    def _on_open(self, event):
+        res = self.get_selected()
+        if res is not None and self.on_open is not None:
+            self.on_open(res)
@@ -1,34 +1,333 @@
+import hashlib
+import json
 import os
+import re
 import tomllib
-
-import toml
+import unicodedata
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
 
 from .runtime_path import get_runtime_root_path
 
+# Calculation engines selectable with params.engine
+ENGINES = ("student", "cohort")
+
+# GP of each grade when rules.toml has no [grade_scale] table. Grades are looked
+# up after normalize_grade(), so full-width and lower-case grades map here too.
+DEFAULT_GRADE_SCALE = {
+    "S": 4.0,
+    "A": 3.0,
+    "B": 2.0,
+    "C": 1.0,
+    "F": 0.0,
+    "4": 4.0,
+    "3": 3.0,
+    "2": 2.0,
+    "1": 1.0,
+    "0": 0.0,
+}
+
+
+def get_csv_encoding(toml):
+    """
+    params.csv_encoding of rules.toml, "utf-8" if it is not set.
+    """
+    return toml.get("params", {}).get("csv_encoding", "utf-8")
+
+
+def normalize_grade(grade):
+    """
+    NFKC-normalize and upper-case a grade, e.g. "Ａ" and "a" to "A".
+    """
+    return unicodedata.normalize("NFKC", grade).upper()
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """
+    Plain dict and list copy of a value frozen by compile_rules, e.g. of
+    CompiledRules.toml to serialize it.
+    """
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryRule:
+    name: str
+    max_credits: int | float
+    patterns: tuple[str, ...]
+    my_courses: tuple[str, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class PoolRule:
+    name: str
+    max_credits: int | float
+    patterns: tuple[str, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledRules:
+    """
+    Validated rules for one calculation, built by compile_rules().
+    toml is a read-only copy of the rules as loaded, for the modules that read
+    other settings from it: tables are MappingProxyType and arrays tuples.
+    """
+
+    toml: Mapping
+    digest: str
+    lecture_columns: Mapping[str, str]
+    student_columns: Mapping[str, str]
+    categories: tuple[CategoryRule, ...]
+    secondary_categories: tuple[PoolRule, ...]
+    extrapolate_target_credits: int
+    year_filter: bool
+    engine: str
+    workers: int
+    csv_encoding: str
+    grade_scale: Mapping[str, float]
+    grades_without_gp: frozenset[str]
+
+    def __reduce__(self):
+        # Mapping proxies cannot be pickled, e.g. to send the rules to workers
+        return compile_rules, (thaw(self.toml),)
+
+
+def _columns(toml, section, names):
+    columns = toml.get(section, {})
+    for name in names:
+        if not isinstance(columns.get(name), str) or not columns[name]:
+            raise ValueError(f"{section}.{name} is not set in rules.toml.")
+    return {name: columns[name] for name in names}
+
+
+def _limit(value, where):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"{where}.max_credits must be a non-negative number: {value}")
+    return value
+
+
+def _patterns(value, where, allow_empty=False):
+    if not isinstance(value, list) or not all(isinstance(p, str) for p in value):
+        raise ValueError(f"{where} must be a list of strings: {value}")
+    if not value and not allow_empty:
+        raise ValueError(f"{where} must not be empty.")
+    for pattern in value + ["|".join(value)]:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"{where} has an invalid pattern {pattern!r}: {e}")
+    return tuple(value)
+
+
+def get_grade_scale(toml):
+    """
+    GP of each normalized grade, from the [grade_scale] table of rules.toml or
+    DEFAULT_GRADE_SCALE if there is none.
+    :raises ValueError: If a GP is not a non-negative number, or two grades
+        that normalize to the same one have different GP
+    """
+    grade_scale = {}
+    scale = toml.get("grade_scale", DEFAULT_GRADE_SCALE)
+    if not isinstance(scale, Mapping) or not scale:
+        raise ValueError("grade_scale must be a table of grade = GP.")
+    for grade, gp in scale.items():
+        if isinstance(gp, bool) or not isinstance(gp, (int, float)) or gp < 0:
+            raise ValueError(f"grade_scale.{grade} must be a non-negative number: {gp}")
+        grade_key = normalize_grade(grade)
+        if grade_scale.get(grade_key, gp) != gp:
+            raise ValueError(f"grade_scale has different GP for {grade_key}.")
+        grade_scale[grade_key] = float(gp)
+    return grade_scale
+
+
+def compile_rules(toml):
+    """
+    Validate rules.toml and compile it into an immutable CompiledRules, so that
+    invalid rules fail here rather than partway through a calculation.
+    :param toml: Dictionary of rules.toml
+    :return: CompiledRules
+    :raises ValueError: If a setting is missing or invalid
+    """
+    params = toml.get("params", {})
+    toml = {**toml, "params": params}
+
+    categories = []
+    for name, v in toml.get("categories", {}).items():
+        where = f"categories.{name}"
+        categories.append(
+            CategoryRule(
+                name,
+                _limit(v.get("max_credits"), where),
+                _patterns(v.get("category"), f"{where}.category"),
+                _patterns(
+                    v.get("my_courses", []), f"{where}.my_courses", allow_empty=True
+                ),
+            )
+        )
+    pools = []
+    for name, v in toml.get("secondary_categories", {}).items():
+        where = f"secondary_categories.{name}"
+        # A pool is drawn on by the category of the same name; any other would
+        # only ever collect credits
+        if name not in toml.get("categories", {}):
+            raise ValueError(f"{where} is not named after a category in [categories].")
+        pools.append(
+            PoolRule(
+                name,
+                _limit(v.get("max_credits"), where),
+                # The GUI saves a new pool with no categories
+                _patterns(v.get("category"), f"{where}.category", allow_empty=True),
+            )
+        )
+
+    target_credits = params.get("extrapolate_target_credits", 100)
+    try:
+        if isinstance(target_credits, bool):
+            raise TypeError
+        target_credits = int(target_credits)
+    except (TypeError, ValueError):
+        raise ValueError(
+            f"extrapolate_target_credits must be an integer: {target_credits}"
+        )
+
+    grade_scale = get_grade_scale(toml)
+    without_gp = params.get("grades_without_gp", [])
+    if not isinstance(without_gp, list) or not all(
+        isinstance(g, str) for g in without_gp
+    ):
+        raise ValueError(f"grades_without_gp must be a list of strings: {without_gp}")
+
+    engine = params.get("engine", "student")
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}: {engine}")
+    workers = params.get("workers", 1)
+    try:
+        workers = int(workers)
+    except (TypeError, ValueError):
+        raise ValueError(f"workers must be an integer: {workers}")
+    if workers < 1:
+        raise ValueError(f"workers must be 1 or more: {workers}")
+
+    digest = hashlib.sha256(
+        json.dumps(toml, sort_keys=True, ensure_ascii=False, default=str).encode()
+    ).hexdigest()
+    return CompiledRules(
+        toml=_freeze(toml),
+        digest=digest,
+        lecture_columns=MappingProxyType(
+            _columns(toml, "columns_in_lectures", ("key", "name", "category", "credit"))
+        ),
+        student_columns=MappingProxyType(
+            _columns(toml, "columns_in_students", ("key", "name", "grade"))
+        ),
+        categories=tuple(categories),
+        secondary_categories=tuple(pools),
+        extrapolate_target_credits=target_credits,
+        year_filter=bool(params.get("year_filter", False)),
+        engine=engine,
+        workers=workers,
+        csv_encoding=get_csv_encoding(toml),
+        grade_scale=MappingProxyType(grade_scale),
+        grades_without_gp=frozenset(normalize_grade(g) for g in without_gp),
+    )
+
 
 class Rules:
-    def __init__(self):
+    def __init__(self, rules_toml_path=None):
         self.toml = None
-        root_path = get_runtime_root_path()
-        self.rules_toml_path = os.path.join(root_path, "rules.toml")
+        self._rules_digest = None
+        self._category_resolver = None
+        self._compiled_rules = None
+        self._checked_font = None
+        self._file_signature = None
+        # Error of a changed rules.toml that could not be read, until it is fixed
+        self.load_error = None
+        if rules_toml_path is None:
+            root_path = get_runtime_root_path()
+            rules_toml_path = os.path.join(root_path, "rules.toml")
+        self.rules_toml_path = rules_toml_path
+
+    def _stat_signature(self):
+        st = os.stat(self.rules_toml_path)
+        return (st.st_mtime_ns, st.st_size)
 
     def load_rules(self):
         if not os.path.exists(self.rules_toml_path):
             self._generate_rules()
+        signature = self._stat_signature()
+        with open(self.rules_toml_path, "rb") as f:
+            content = f.read()
+        self._file_signature = signature
+        self._parse(content)
+
+    def reload_if_changed(self):
+        """
+        Re-read rules.toml if its mtime or size changed since it was last read,
+        and re-parse it only if its content changed too.
+        A missing file keeps the current rules.
+        :return: True if the rules were replaced
+        :raises ValueError: If the changed file is not valid TOML; the current
+            rules are kept until the file changes again
+        """
+        if self.toml is None and self.load_error is None:
+            self.load_rules()
+            return True
+        try:
+            signature = self._stat_signature()
+        except FileNotFoundError:
+            return False
+        if signature == self._file_signature:
+            return False
         with open(self.rules_toml_path, "rb") as f:
-            toml = tomllib.load(f)
+            content = f.read()
+        self._file_signature = signature
+        if hashlib.sha256(content).hexdigest() == self._rules_digest:
+            self.load_error = None
+            return False
+        self._parse(content)
+        return True
+
+    def _parse(self, content):
+        try:
+            toml = tomllib.loads(content.decode("utf-8"))
+        except ValueError as e:
+            self.load_error = e
+            raise
+        self.load_error = None
         self.toml = toml
+        self._compiled_rules = None
+        # Drop caches compiled from the previous rules only if the file changed
+        digest = hashlib.sha256(content).hexdigest()
+        if digest != self._rules_digest:
+            self._rules_digest = digest
+            self._category_resolver = None
         if "params" not in toml:
             toml["params"] = {}
         if "columns_in_students" not in toml:
             toml["columns_in_students"] = {}
         if "columns_in_lectures" not in toml:
             toml["columns_in_lectures"] = {}
-        if "font_in_report" in toml.get("params", {}):
-            self._check_font_exist(toml["params"]["font_in_report"])
 
     def set_toml(self, toml):
         self.toml = toml
+        self._rules_digest = None
+        self._category_resolver = None
+        self._compiled_rules = None
+        # Not read from the file; reload_if_changed reads it again
+        self._file_signature = None
 
     def get_toml(self):
         if self.toml is None:
@@ -37,7 +336,29 @@ class Rules:
             )
         return self.toml
 
+    def get_category_resolver(self):
+        """
+        Return the CategoryResolver for the current rules, building it on first use.
+        It is kept across calculations until load_rules sees a changed rules.toml.
+        """
+        if self._category_resolver is None:
+            from .category_resolver import CategoryResolver
+
+            self._category_resolver = CategoryResolver(self.get_toml())
+        return self._category_resolver
+
+    def get_compiled_rules(self):
+        """
+        Return the rules compiled by compile_rules, compiling them once per load.
+        :raises ValueError: If the rules are invalid
+        """
+        if self._compiled_rules is None:
+            self._compiled_rules = compile_rules(self.get_toml())
+        return self._compiled_rules
+
     def save_rules(self):
+        import toml
+
         if self.toml is None:
             raise ValueError("TOML data is not set.")
         with open(self.rules_toml_path, "w", encoding="utf-8") as f:
@@ -50,7 +371,10 @@ class Rules:
         return self.toml["params"].get("font_in_report", "Arial")
 
     def get_csv_encoding(self):
-        return self.toml["params"].get("csv_encoding", "utf-8")
+        return get_csv_encoding(self.toml)
+
+    def get_workers(self):
+        return self.toml["params"].get("workers", 1)
 
     def get_student_rules(self):
         res = {
@@ -84,6 +408,18 @@ class Rules:
             category_names.extend(categories[cat]["category"])
         return category_names
 
+    def check_font_in_report(self):
+        """
+        Warn if font_in_report is not installed. Enumerating system fonts needs
+        tkinter and is slow, so it is done when a report is first shown rather
+        than when rules are loaded, and only once per font name.
+        """
+        font_name = self.toml["params"].get("font_in_report")
+        if font_name is None or font_name == self._checked_font:
+            return
+        self._check_font_exist(font_name)
+        self._checked_font = font_name
+
     def _check_font_exist(self, font_name):
         from tkinter import font
 
@@ -0,0 +1,45 @@
+class RulesWatcher:
+    def __init__(self, rules):
+        """
+        Watch rules.toml of a Rules object by polling, and tell subscribers when
+        it changed. No OS file events are used; call poll() periodically, e.g.
+        from the Tk main loop with after().
+        :param rules: Rules object, loaded or not
+        """
+        self.rules = rules
+        self._callbacks = []
+
+    @property
+    def error(self):
+        """
+        Error of the changed rules.toml that could not be read, or None.
+        """
+        return self.rules.load_error
+
+    def subscribe(self, callback):
+        """
+        :param callback: Called as callback(rules, error) after the rules were
+            replaced or a read error was fixed (error is None), or when the
+            changed file could not be read (error is the exception; the previous
+            rules are kept)
+        """
+        self._callbacks.append(callback)
+
+    def poll(self):
+        """
+        Reload rules.toml if it changed since it was last read.
+        :return: True if the rules were replaced
+        """
+        had_error = self.error is not None
+        try:
+            changed = self.rules.reload_if_changed()
+        except (ValueError, OSError) as e:
+            self._notify(e)
+            return False
+        if changed or (had_error and self.error is None):
+            self._notify(None)
+        return changed
+
+    def _notify(self, error):
+        for callback in self._callbacks:
+            callback(self.rules, error)
@@ -0,0 +1,152 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from . import instrumentation, lectures, report
+from .rules_toml import normalize_grade
+
+
+def new_report():
+    """
+    Empty validation report:
+    undefined_lectures maps each student ID to the lecture keys of their grade
+    rows that are not in lectures.csv, in order of first appearance;
+    unmatched_categories maps each category of lectures.csv that no category in
+    rules.toml matches to the keys of its lectures. Lectures without a category
+    are listed under "Closed", as they are calculated;
+    unknown_grades maps each grade, as written in students.csv, that is neither
+    in the grade scale nor in params.grades_without_gp to its number of rows.
+    """
+    return {"undefined_lectures": {}, "unmatched_categories": {}, "unknown_grades": {}}
+
+
+@instrumentation.timed("validate categories")
+def check_categories(report_dict, rules, lec, resolver):
+    """
+    Match every category of the lecture catalog against rules.categories once.
+    :param report_dict: Report from new_report(), updated in place
+    :param resolver: CategoryResolver built from rules.toml
+    """
+    lectures_df = lec.get_lectures()
+    col = rules.lecture_columns
+    category_sr = lectures_df[col["category"]].astype(object).fillna("Closed")
+    codes, categories = pd.factorize(category_sr)
+    unmatched = np.array([not resolver.resolve(c).primary for c in categories])
+    if not unmatched.any():
+        return
+    keys = lectures_df[col["key"]].to_numpy()
+    for i in np.flatnonzero(unmatched):
+        report_dict["unmatched_categories"][report.plain(categories[i])] = [
+            report.plain(k) for k in keys[codes == i]
+        ]
+
+
+@instrumentation.timed("validate lectures of grades")
+def check_grades(report_dict, rules, lec, grades_df):
+    """
+    Anti-join the lecture keys of all grade rows with the lecture catalog, and
+    count the grades without a GP that are not known to have none.
+    Rows without a student ID are left out, as they are not calculated.
+    :param report_dict: Report from new_report(), updated in place
+    :param grades_df: Grade rows of any number of students, with the GP column
+    """
+    gp, positions = lectures.lookup_grades(
+        lec.get_lectures(),
+        grades_df,
+        rules.lecture_columns["key"],
+        rules.student_columns["grade"],
+    )
+    has_id = grades_df[rules.student_columns["key"]].notna().to_numpy()
+
+    no_gp = np.isnan(gp) & has_id
+    if no_gp.any():
+        codes, grades = pd.factorize(grades_df[rules.student_columns["grade"]][no_gp])
+        counts = np.bincount(codes[codes >= 0], minlength=len(grades))
+        unknown_grades = report_dict["unknown_grades"]
+        for grade, count in zip(grades, counts):
+            if (
+                isinstance(grade, str)
+                and normalize_grade(grade) in rules.grades_without_gp
+            ):
+                continue
+            grade = report.plain(grade)
+            unknown_grades[grade] = unknown_grades.get(grade, 0) + int(count)
+
+    undefined = np.flatnonzero(positions < 0)
+    if len(undefined) == 0:
+        return
+    rows = grades_df.iloc[undefined]
+    rows = rows[rows[rules.student_columns["key"]].notna()]
+    pairs = pd.DataFrame(
+        {
+            "student": rows[rules.student_columns["key"]].astype(object).to_numpy(),
+            "key": rows[rules.lecture_columns["key"]].astype(object).to_numpy(),
+        }
+    ).drop_duplicates()
+    undefined_lectures = report_dict["undefined_lectures"]
+    for student_id, keys in pairs.groupby("student", sort=False)["key"]:
+        student_id = report.plain(student_id)
+        known = undefined_lectures.setdefault(student_id, [])
+        known.extend(report.plain(k) for k in keys if k not in known)
+
+
+def has_issues(report_dict):
+    return bool(
+        report_dict["undefined_lectures"]
+        or report_dict["unmatched_categories"]
+        or report_dict["unknown_grades"]
+    )
+
+
+def summary(report_dict):
+    undefined_lectures = report_dict["undefined_lectures"]
+    n_keys = len({k for keys in undefined_lectures.values() for k in keys})
+    return (
+        f"Validation: {len(undefined_lectures)} students have lectures missing"
+        f" from lectures.csv ({n_keys} distinct),"
+        f" {len(report_dict['unmatched_categories'])} categories of lectures.csv"
+        " match no category in rules.toml,"
+        f" {sum(report_dict['unknown_grades'].values())} grade rows have an unknown"
+        " grade"
+    )
+
+
+def render(report_dict):
+    """
+    Text of the report, as shown in the GUI.
+    """
+    text = summary(report_dict) + "\n"
+    text += "\n===== undefined lectures (by student) =====\n"
+    for student_id, keys in report_dict["undefined_lectures"].items():
+        text += f"{student_id}: {', '.join(str(k) for k in keys)}\n"
+    text += "\n===== categories matching no category in rules.toml =====\n"
+    for category, keys in report_dict["unmatched_categories"].items():
+        text += (
+            f"{category} ({len(keys)} lectures): {', '.join(str(k) for k in keys)}\n"
+        )
+    text += "\n===== unknown grades (not in the grade scale) =====\n"
+    for grade, count in report_dict["unknown_grades"].items():
+        text += f"{grade}: {count} rows\n"
+    return text
+
+
+def dump_json(report_dict, file_path):
+    """
+    Write the report as JSON; student IDs become strings.
+    """
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "undefined_lectures": {
+                    str(k): v for k, v in report_dict["undefined_lectures"].items()
+                },
+                "unmatched_categories": report_dict["unmatched_categories"],
+                "unknown_grades": {
+                    str(k): v for k, v in report_dict["unknown_grades"].items()
+                },
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
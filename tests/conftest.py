@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from benchmarks import synth
+
+# Columns as in synth.make_rules(). L6 is in a category no rule matches and L7
+# has none.
+LECTURES = {
+    "Lecture ID": ["L1", "L2", "L3", "L4", "L5", "L6", "L7"],
+    "Lecture name": ["Core", "Home", "ElecA", "ElecB", "Gen", "Lab", "Open"],
+    "Category": ["CoreA", "CoreHomeX", "ElecA", "ElecB", "GenA", "Lab", None],
+    "Credits": [2.0, 2.0, 1.5, 2.0, 4.0, 1.0, 2.0],
+}
+
+# Grouped by student, as params.stream_students needs. Grades include full-width
+# and lower-case ones, a pass grade without GP (P), an unknown one (x), a lecture
+# missing from the catalog (LX) and a row without a student ID.
+STUDENTS = [
+    ("S1", "Alice", "L1", "A"),
+    ("S1", "Alice", "L2", "ａ"),
+    ("S1", "Alice", "L3", "４"),
+    ("S1", "Alice", "L4", "B"),
+    ("S1", "Alice", "L5", "S"),
+    ("S1", "Alice", "LX", "A"),
+    ("S2", "Bob", "L1", "F"),
+    ("S2", "Bob", "L2", "P"),
+    ("S2", "Bob", "L3", "x"),
+    ("S2", "Bob", "L5", "C"),
+    ("S2", "Bob", "L6", "A"),
+    ("S3", "Cho", "L1", "S"),
+    ("S3", "Cho", "L4", "ｓ"),
+    ("S3", "Cho", "L6", "2"),
+    ("S3", "Cho", "L2", "b"),
+    ("S3", "Cho", "LX", "C"),
+    (None, None, "L1", "Q"),
+]
+
+
+@pytest.fixture
+def toml():
+    return synth.make_rules()
+
+
+@pytest.fixture
+def lectures_df():
+    return pd.DataFrame(LECTURES)
+
+
+@pytest.fixture
+def students_df():
+    return pd.DataFrame(
+        STUDENTS, columns=["Student ID", "Student name", "Lecture ID", "Grade"]
+    )
+
+
+@pytest.fixture
+def inputs_dir(tmp_path, toml, lectures_df, students_df):
+    """
+    Directory with rules.toml, lectures.csv and students.csv of the fixtures.
+    """
+    synth.write_inputs(tmp_path, toml, lectures_df, students_df)
+    return tmp_path
@@ -0,0 +1,59 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks import synth
+from gpp_calculator import calculator, lectures, rules_toml
+
+
+def make_cohort(seed):
+    """
+    Small synthetic cohort with home courses (my_courses), two secondary pools,
+    a zero-capacity pool, retaken lectures and lectures with non-integer
+    credits, which the cohort engine leaves to calculator.calc_student.
+    """
+    scale = synth.Scale(
+        n_lectures=120, n_students=30, grades_per_student=20, n_pools=2, seed=seed
+    )
+    toml, lectures_df, students_df = synth.make_scaled_inputs(scale)
+    rng = np.random.default_rng(seed)
+    lectures_df.loc[rng.random(len(lectures_df)) < 0.03, "Credits"] = "0.3"
+    retakes = students_df.sample(frac=0.1, random_state=seed)
+    retakes = retakes.assign(Grade=rng.choice(["S", "A", "F"], len(retakes)))
+    students_df = pd.concat([students_df, retakes], ignore_index=True)
+    toml["secondary_categories"]["Cat2"] = {"max_credits": 0, "category": ["G0.*"]}
+    return toml, lectures_df, students_df
+
+
+def calc(toml, lectures_df, students_df, engine, tmp_path):
+    toml = copy.deepcopy(toml)
+    toml["params"].update(engine=engine, incremental=False)
+    rules = rules_toml.compile_rules(toml)
+    lec = lectures.Lectures(toml, lectures_df)
+    log_path = tmp_path / engine
+    log_path.mkdir()
+    return calculator.calc_students(rules, lec, students_df, str(log_path), traces={})
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_cohort_engine_matches_student_engine(seed, tmp_path):
+    toml, lectures_df, students_df = make_cohort(seed)
+    assert students_df.duplicated(["Student ID", "Lecture ID"]).any()
+    inexact = lectures_df.loc[lectures_df["Credits"] == "0.3", "Lecture ID"]
+    assert students_df["Lecture ID"].isin(inexact).any()
+
+    expected = calc(toml, lectures_df, students_df, "student", tmp_path)
+    actual = calc(toml, lectures_df, students_df, "cohort", tmp_path)
+    assert actual == expected
+
+
+def test_cohort_engine_with_inexact_limit_matches_student_engine(tmp_path):
+    # A limit that is not a multiple of 1/1024 sends every student to calc_student
+    toml, lectures_df, students_df = make_cohort(0)
+    toml["categories"]["Cat1"]["max_credits"] = 7.3
+
+    expected = calc(toml, lectures_df, students_df, "student", tmp_path)
+    actual = calc(toml, lectures_df, students_df, "cohort", tmp_path)
+    assert actual == expected
@@ -0,0 +1,50 @@
+import copy
+
+import pytest
+
+from benchmarks import compare_engines, suite, synth
+from gpp_calculator import lectures
+
+# The small benchmark scale with fewer students, to keep the reference run short
+SCALE = suite.SCALES["small"]._replace(n_students=50)
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    toml, lectures_df, students_df = synth.make_scaled_inputs(SCALE)
+    return toml, lectures.Lectures(toml, lectures_df), students_df
+
+
+@pytest.fixture(scope="module")
+def reference(dataset):
+    return compare_engines.run_engine(compare_engines.reference_engine, *dataset)
+
+
+def numeric_columns(toml):
+    return [toml["columns_in_lectures"]["credit"], "GP", "point"]
+
+
+def test_cohort_engine_matches_reference(dataset, reference):
+    toml = dataset[0]
+    alternative = compare_engines.run_engine(compare_engines.cohort_engine, *dataset)
+    assert len(alternative[0]) == SCALE.n_students
+    diffs = compare_engines.compare(
+        reference, alternative, numeric_columns(toml), 1e-9, 1e-9
+    )
+    assert diffs == []
+
+
+def test_compare_reports_first_diverging_step(dataset, reference):
+    toml = dataset[0]
+    results, traces = copy.deepcopy(reference)
+    student_id = next(iter(results))
+    results[student_id]["gpp"] += 1
+    traces[student_id]["categories"][0]["points"] += 1
+
+    diffs = compare_engines.compare(
+        reference, (results, traces), numeric_columns(toml), 1e-9, 1e-9
+    )
+    assert len(diffs) == 1
+    assert diffs[0][0] == student_id
+    name = traces[student_id]["categories"][0]["name"]
+    assert f"first divergence at [{name}] points" in diffs[0][1]
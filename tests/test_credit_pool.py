@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from gpp_calculator.credit_pool import CreditPool, CreditPoolBank
+
+
+def make_bank(capacity=5, n_students=3):
+    return CreditPoolBank({"P": capacity}, {"P": ["G.*"]}, n_students)
+
+
+def test_per_student_and_scalar_amounts():
+    bank = make_bank()
+    np.testing.assert_array_equal(bank.add_credits("P", [1, 4, 7]), [0, 0, 2])
+    np.testing.assert_array_equal(bank.credits("P"), [1, 4, 5])
+    np.testing.assert_array_equal(bank.add_credits("P", 2), [0, 1, 2])
+    np.testing.assert_array_equal(bank.credits("P"), [3, 5, 5])
+
+    np.testing.assert_array_equal(bank.use_credits("P", 4), [3, 4, 4])
+    np.testing.assert_array_equal(bank.credits("P"), [0, 1, 1])
+    np.testing.assert_array_equal(bank.use_credits("P", [0, 1, 2]), [0, 1, 1])
+    np.testing.assert_array_equal(bank.credits("P"), [0, 0, 0])
+
+
+def test_clamping_at_capacity():
+    bank = make_bank(capacity=2.5)
+    np.testing.assert_array_equal(bank.add_credits("P", [2.5, 2, 3.5]), [0, 0, 1])
+    np.testing.assert_array_equal(bank.credits("P"), [2.5, 2, 2.5])
+    np.testing.assert_array_equal(bank.add_credits("P", 1), [1, 0.5, 1])
+    np.testing.assert_array_equal(bank.credits("P"), [2.5, 2.5, 2.5])
+
+
+def test_zero_capacity_pool():
+    bank = make_bank(capacity=0)
+    np.testing.assert_array_equal(bank.add_credits("P", [1, 0, 2.5]), [1, 0, 2.5])
+    np.testing.assert_array_equal(bank.credits("P"), [0, 0, 0])
+    np.testing.assert_array_equal(bank.use_credits("P", 3), [0, 0, 0])
+
+
+@pytest.mark.parametrize("method", ["add_credits", "use_credits"])
+@pytest.mark.parametrize("amounts", [-1, [1, -0.5, 0]])
+def test_negative_amounts(method, amounts):
+    bank = make_bank()
+    with pytest.raises(ValueError, match="negative credits"):
+        getattr(bank, method)("P", amounts)
+    np.testing.assert_array_equal(bank.credits("P"), [0, 0, 0])
+
+
+def test_negative_capacity():
+    with pytest.raises(ValueError, match="Capacity"):
+        make_bank(capacity=-1)
+    with pytest.raises(ValueError, match="Capacity"):
+        CreditPool(-1, [])
+
+
+def test_credit_pool_agrees_with_bank():
+    pool = CreditPool(5, ["G.*"])
+    bank = make_bank(n_students=1)
+    for method, amount in [
+        ("add_credits", 3),
+        ("add_credits", 4),
+        ("use_credits", 1.5),
+        ("add_credits", 0),
+        ("use_credits", 10),
+        ("use_credits", 1),
+    ]:
+        expected = getattr(bank, method)("P", amount)[0]
+        assert getattr(pool, method)(amount) == expected
+        assert pool.credits() == bank.credits("P")[0]
+    assert pool.get_category_names() == ["G.*"]
+
+
+def test_credit_pool_keeps_python_numbers():
+    # Reports print the balance, so an int must stay an int
+    pool = CreditPool(5, [])
+    pool.add_credits(2)
+    assert type(pool.credits()) is int
+
+
+def test_view_changes_one_student_of_the_bank():
+    bank = make_bank()
+    view = bank.view("P", student=1)
+    assert view.add_credits(7) == 2
+    np.testing.assert_array_equal(bank.credits("P"), [0, 5, 0])
+    assert view.use_credits(1) == 1
+    assert view.credits() == 4
+    np.testing.assert_array_equal(bank.credits("P"), [0, 4, 0])
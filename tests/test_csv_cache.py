@@ -0,0 +1,81 @@
+import pickle
+
+import pandas as pd
+import pytest
+
+from gpp_calculator import csv_cache
+
+
+@pytest.fixture
+def csv_path(tmp_path, lectures_df):
+    path = tmp_path / "lectures.csv"
+    lectures_df.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def parse(csv_path):
+    def parse():
+        parse.calls += 1
+        return pd.read_csv(csv_path)
+
+    parse.calls = 0
+    return parse
+
+
+def test_sidecar_is_reused(csv_path, toml, parse):
+    first = csv_cache.read_cached(csv_path, toml, "utf-8", parse)
+    second = csv_cache.read_cached(csv_path, toml, "utf-8", parse)
+    assert parse.calls == 1
+    pd.testing.assert_frame_equal(second, first)
+
+
+def test_stale_header_parses_again(csv_path, toml, parse):
+    csv_cache.read_cached(csv_path, toml, "utf-8", parse)
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write("L8,Extra,GenA,1.0\n")
+    df = csv_cache.read_cached(csv_path, toml, "utf-8", parse)
+    assert parse.calls == 2
+    assert df["Lecture ID"].iloc[-1] == "L8"
+
+    csv_cache.read_cached(csv_path, toml, "cp932", parse)
+    assert parse.calls == 3
+    toml["columns_in_lectures"]["credit"] = "Units"
+    csv_cache.read_cached(csv_path, toml, "cp932", parse)
+    assert parse.calls == 4
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b"",
+        b"not a pickle",
+        # A class that no longer exists
+        b"cgpp_calculator_gone\nThing\n.",
+        # Constructors that fail on what they are given
+        b"c__builtin__\nint\n(S'x'\nS'y'\nS'z'\ntR.",
+        b"c__builtin__\nint\n(S'x'\ntR.",
+    ],
+)
+def test_corrupt_sidecar_parses_again(csv_path, toml, parse, content):
+    with open(csv_path + csv_cache.SIDECAR_SUFFIX, "wb") as f:
+        f.write(content)
+    df = csv_cache.read_cached(csv_path, toml, "utf-8", parse)
+    assert parse.calls == 1
+    pd.testing.assert_frame_equal(df, parse())
+    # The sidecar was rewritten
+    csv_cache.read_cached(csv_path, toml, "utf-8", parse)
+    assert parse.calls == 2
+
+
+def test_truncated_table_parses_again(csv_path, toml, parse):
+    csv_cache.read_cached(csv_path, toml, "utf-8", parse)
+    sidecar_path = csv_path + csv_cache.SIDECAR_SUFFIX
+    with open(sidecar_path, "rb") as f:
+        pickle.load(f)
+        size = f.tell() + 10
+    with open(sidecar_path, "r+b") as f:
+        f.truncate(size)
+    df = csv_cache.read_cached(csv_path, toml, "utf-8", parse)
+    assert parse.calls == 2
+    pd.testing.assert_frame_equal(df, parse())
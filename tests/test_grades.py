@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gpp_calculator import calculator, lectures, rules_toml, validation
+
+
+@pytest.mark.parametrize(
+    "grade, expected",
+    [("A", "A"), ("a", "A"), ("ａ", "A"), ("Ａ", "A"), ("ｓ", "S"), ("４", "4")],
+)
+def test_normalize_grade(grade, expected):
+    assert rules_toml.normalize_grade(grade) == expected
+
+
+def test_grade_points_with_default_scale():
+    grades = pd.Series(["A", "ａ", "４", "s", "P", None, "A"])
+    np.testing.assert_array_equal(
+        lectures.grade_points(grades, rules_toml.DEFAULT_GRADE_SCALE),
+        [3.0, 3.0, 4.0, 4.0, np.nan, np.nan, 3.0],
+    )
+
+
+def test_custom_grade_scale(toml):
+    toml["grade_scale"] = {"秀": 4, "優": 3, "ｐ": 0.5}
+    rules = rules_toml.compile_rules(toml)
+    assert dict(rules.grade_scale) == {"秀": 4.0, "優": 3.0, "P": 0.5}
+    np.testing.assert_array_equal(
+        lectures.grade_points(pd.Series(["秀", "p", "A"]), rules.grade_scale),
+        [4.0, 0.5, np.nan],
+    )
+
+
+@pytest.mark.parametrize(
+    "grade_scale, message",
+    [
+        ({"A": 3, "ａ": 4}, "different GP for A"),
+        ({"A": -1}, "grade_scale.A must be a non-negative number"),
+        ({"A": True}, "grade_scale.A must be a non-negative number"),
+        ({}, "must be a table"),
+    ],
+)
+def test_invalid_grade_scale(toml, grade_scale, message):
+    toml["grade_scale"] = grade_scale
+    with pytest.raises(ValueError, match=message):
+        rules_toml.compile_rules(toml)
+
+
+def unknown_grades(toml, lectures_df, students_df):
+    rules = rules_toml.compile_rules(toml)
+    lec = lectures.Lectures(toml, lectures_df)
+    grades_df = lectures.add_gp_column(students_df, "Grade", rules.grade_scale)
+    report_dict = validation.new_report()
+    validation.check_grades(report_dict, rules, lec, grades_df)
+    return report_dict["unknown_grades"]
+
+
+def test_unknown_grades_are_counted(toml, lectures_df, students_df):
+    # Q has no student ID, so it is not calculated and not reported
+    assert unknown_grades(toml, lectures_df, students_df) == {"P": 1, "x": 1}
+
+    students_df.loc[len(students_df)] = ["S4", "Dan", "L1", "x"]
+    assert unknown_grades(toml, lectures_df, students_df) == {"P": 1, "x": 2}
+
+
+def test_grades_without_gp_are_not_reported(toml, lectures_df, students_df):
+    toml["params"]["grades_without_gp"] = ["ｐ"]
+    assert rules_toml.compile_rules(toml).grades_without_gp == {"P"}
+    assert unknown_grades(toml, lectures_df, students_df) == {"x": 1}
+
+
+def test_streamed_chunks_get_gp(inputs_dir, toml):
+    toml["params"].update(csv_cache=False, stream_students=True, stream_chunk_rows=4)
+    paths = (inputs_dir / "lectures.csv", inputs_dir / "students.csv")
+    _, stream = calculator.load_inputs(toml, *paths)
+    streamed = dict(iter(stream))
+
+    assert list(streamed["S1"][lectures.GP_COL_NAME]) == [3, 3, 4, 2, 4, 3]
+    assert list(streamed["S3"][lectures.GP_COL_NAME]) == [4, 4, 2, 2, 1]
+
+    toml["params"]["stream_students"] = False
+    _, students_df = calculator.load_inputs(toml, *paths)
+    for student_id, grade_df in streamed.items():
+        if pd.isna(student_id):
+            continue
+        expected = students_df[students_df["Student ID"] == student_id]
+        np.testing.assert_array_equal(
+            grade_df[lectures.GP_COL_NAME], expected[lectures.GP_COL_NAME]
+        )
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.check_import_time import BUDGETS
+
+# Timing is left to benchmarks/check_import_time.py, as it depends on the machine.
+# Only what gets imported is checked here.
+FORBIDDEN = {
+    "gpp_calculator": {"pandas", "numpy", "tkinter", "ttkthemes"},
+    **{module: forbidden for module, (_, forbidden) in BUDGETS.items()},
+}
+
+
+def imported_packages(module):
+    """
+    :return: top-level packages in sys.modules after importing module in a fresh interpreter
+    """
+    src_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src_path, env.get("PYTHONPATH")]))
+    code = f"import sys, {module}; print('\\n'.join(sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return {name.split(".")[0] for name in proc.stdout.split()}
+
+
+@pytest.mark.parametrize("module", list(FORBIDDEN))
+def test_entry_point_imports(module):
+    packages = imported_packages(module)
+    assert module.split(".")[0] in packages
+    unexpected = sorted(packages & FORBIDDEN[module])
+    assert not unexpected, f"{module} imports {', '.join(unexpected)}"
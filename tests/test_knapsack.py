@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bench_knapsack import (
+    COL_NAMES,
+    make_lectures,
+    reference_select_lecture_to_knapsack,
+)
+from gpp_calculator import lectures
+
+
+def assert_same(actual, expected):
+    pd.testing.assert_frame_equal(actual, expected)
+    assert actual.to_string() == expected.to_string()
+    for col in actual.columns:
+        assert [type(v) for v in actual[col]] == [type(v) for v in expected[col]], col
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_select_lecture_to_knapsack_matches_reference(seed):
+    """
+    The vectorized selection returns the same frames, down to the types of the
+    values, as the row-by-row implementation it replaced, on randomized inputs.
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(100):
+        src_df = make_lectures(rng, int(rng.integers(0, 30)), rng.random() < 0.5)
+        max_credits = float(rng.choice([0, 2, 10, 12.5, 20, 40]))
+        expected = reference_select_lecture_to_knapsack(src_df, max_credits, COL_NAMES)
+        actual = lectures.select_lecture_to_knapsack(src_df, max_credits, COL_NAMES)
+        assert_same(actual[0], expected[0])
+        assert_same(actual[1], expected[1])
+
+
+def test_lecture_chosen_by_step_3_alone():
+    src_df = make_lectures(np.random.default_rng(0), 5, with_is_home=True)
+    src_df["Credits"] = src_df["Credits"].astype(int) + 1
+    expected = reference_select_lecture_to_knapsack(src_df, 0.5, COL_NAMES)
+    actual = lectures.select_lecture_to_knapsack(src_df, 0.5, COL_NAMES)
+    assert len(actual[0]) == 1
+    assert_same(actual[0], expected[0])
+    assert_same(actual[1], expected[1])
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_appended_to_empty_matches_concat():
+    df = pd.DataFrame(
+        {
+            "int": [1, 2],
+            "bool": [True, False],
+            "float": [1.5, 2.0],
+            "str": ["x", "y"],
+            "Int64": pd.array([1, None], dtype="Int64"),
+            "category": pd.Categorical(["p", "q"]),
+        }
+    )
+    expected = pd.concat([pd.DataFrame(columns=df.columns), df])
+    assert_same(lectures.appended_to_empty(df), expected)
@@ -0,0 +1,78 @@
+import os
+import zipfile
+
+import pytest
+
+from gpp_calculator import report_sink
+
+
+class FailingSink(report_sink.ReportSink):
+    def _write(self, student_id, log_str):
+        if student_id == "S2":
+            raise RuntimeError("disk on fire")
+        super()._write(student_id, log_str)
+
+
+def test_writes_one_file_per_student(tmp_path):
+    sink = report_sink.ReportSink(str(tmp_path))
+    sink.write("S1", "report 1")
+    sink.write("S2", "report 2")
+    sink.close()
+    assert (tmp_path / "S1.txt").read_text(encoding="utf-8") == "report 1"
+    assert sink.exists("S2")
+    assert not sink.exists("S3")
+
+
+def test_write_failure_is_raised_by_close(tmp_path):
+    sink = FailingSink(str(tmp_path), max_pending=2)
+    # The thread keeps draining after the failure, so later writes never block
+    with pytest.raises(RuntimeError, match="disk on fire"):
+        for i in range(20):
+            sink.write(f"S{i}", "report")
+    with pytest.raises(RuntimeError, match="disk on fire"):
+        sink.close()
+
+
+def test_missing_directory_is_raised_by_close(tmp_path):
+    sink = report_sink.ReportSink(str(tmp_path / "missing"))
+    sink.write("S1", "report")
+    with pytest.raises(FileNotFoundError):
+        sink.close()
+
+
+def make_archive(log_path, reports):
+    with zipfile.ZipFile(log_path / report_sink.ARCHIVE_FILE_NAME, "w") as zf:
+        for student_id, text in reports.items():
+            zf.writestr(f"{student_id}.txt", text)
+
+
+def read_archive(log_path):
+    with zipfile.ZipFile(log_path / report_sink.ARCHIVE_FILE_NAME) as zf:
+        return {name: zf.read(name).decode("utf-8") for name in zf.namelist()}
+
+
+def test_archive_carries_over_previous_reports(tmp_path):
+    make_archive(tmp_path, {"S1": "old 1", "S2": "old 2"})
+    sink = report_sink.ArchiveReportSink(str(tmp_path))
+    assert sink.exists("S1")
+    sink.write("S2", "new 2")
+    sink.write("S3", "new 3")
+    sink.close()
+    assert read_archive(tmp_path) == {
+        "S1.txt": "old 1",
+        "S2.txt": "new 2",
+        "S3.txt": "new 3",
+    }
+    assert os.listdir(tmp_path) == [report_sink.ARCHIVE_FILE_NAME]
+
+
+def test_archive_failure_keeps_previous_archive(tmp_path):
+    make_archive(tmp_path, {"S1": "old 1"})
+    sink = report_sink.ArchiveReportSink(str(tmp_path))
+    # A report listed in the previous archive that cannot be carried over
+    sink._previous.add("S9.txt")
+    sink.write("S2", "new 2")
+    with pytest.raises(KeyError):
+        sink.close()
+    assert read_archive(tmp_path) == {"S1.txt": "old 1"}
+    assert os.listdir(tmp_path) == [report_sink.ARCHIVE_FILE_NAME]
@@ -0,0 +1,104 @@
+import copy
+
+import pytest
+
+from gpp_calculator import calculator, lectures, rules_toml
+
+
+@pytest.fixture
+def students_df(students_df):
+    return students_df.dropna(subset=["Student ID"]).reset_index(drop=True)
+
+
+@pytest.fixture
+def calculated(monkeypatch):
+    """
+    IDs of the students calculated (not taken from the cache) since last cleared.
+    """
+    student_ids = set()
+    calc_student = calculator.calc_student
+
+    def recording_calc_student(rules, lec, student_id, *args, **kwargs):
+        student_ids.add(student_id)
+        return calc_student(rules, lec, student_id, *args, **kwargs)
+
+    monkeypatch.setattr(calculator, "calc_student", recording_calc_student)
+    return student_ids
+
+
+def calc(toml, lectures_df, students_df, log_path, calculated=None):
+    rules = rules_toml.compile_rules(toml)
+    lec = lectures.Lectures(toml, lectures_df)
+    if calculated is not None:
+        calculated.clear()
+    return calculator.calc_students(rules, lec, students_df, str(log_path))
+
+
+def fresh(toml, lectures_df, students_df, tmp_path):
+    toml = copy.deepcopy(toml)
+    toml["params"]["incremental"] = False
+    log_path = tmp_path / "fresh"
+    log_path.mkdir(exist_ok=True)
+    return calc(toml, lectures_df, students_df, log_path)
+
+
+def test_untouched_students_are_cache_hits(
+    toml, lectures_df, students_df, tmp_path, calculated
+):
+    first = calc(toml, lectures_df, students_df, tmp_path, calculated)
+    assert calculated == {"S1", "S2", "S3"}
+    second = calc(toml, lectures_df, students_df, tmp_path, calculated)
+    assert calculated == set()
+    assert second == first
+
+
+def test_changed_grades_invalidate_the_student(
+    toml, lectures_df, students_df, tmp_path, calculated
+):
+    first = calc(toml, lectures_df, students_df, tmp_path, calculated)
+    row = (students_df["Student ID"] == "S1") & (students_df["Lecture ID"] == "L4")
+    students_df.loc[row, "Grade"] = "S"
+    second = calc(toml, lectures_df, students_df, tmp_path, calculated)
+    assert calculated == {"S1"}
+    assert second[0]["gpp"] != first[0]["gpp"]
+    assert second == fresh(toml, lectures_df, students_df, tmp_path)
+
+
+def test_changed_lecture_invalidates_the_students_taking_it(
+    toml, lectures_df, students_df, tmp_path, calculated
+):
+    calc(toml, lectures_df, students_df, tmp_path, calculated)
+    # L6 is taken by S2 and S3 only
+    lectures_df.loc[lectures_df["Lecture ID"] == "L6", "Credits"] = 3.0
+    second = calc(toml, lectures_df, students_df, tmp_path, calculated)
+    assert calculated == {"S2", "S3"}
+    assert second == fresh(toml, lectures_df, students_df, tmp_path)
+
+
+def test_changed_rules_invalidate_every_student(
+    toml, lectures_df, students_df, tmp_path, calculated
+):
+    calc(toml, lectures_df, students_df, tmp_path, calculated)
+    toml["categories"]["Core"]["max_credits"] = 3
+    second = calc(toml, lectures_df, students_df, tmp_path, calculated)
+    assert calculated == {"S1", "S2", "S3"}
+    assert second == fresh(toml, lectures_df, students_df, tmp_path)
+
+
+def test_params_not_affecting_results_keep_the_cache(
+    toml, lectures_df, students_df, tmp_path, calculated
+):
+    calc(toml, lectures_df, students_df, tmp_path, calculated)
+    toml["params"].update(csv_encoding="cp932", font_in_report="Meiryo")
+    calc(toml, lectures_df, students_df, tmp_path, calculated)
+    assert calculated == set()
+
+
+def test_missing_report_invalidates_the_student(
+    toml, lectures_df, students_df, tmp_path, calculated
+):
+    calc(toml, lectures_df, students_df, tmp_path, calculated)
+    (tmp_path / "S2.txt").unlink()
+    calc(toml, lectures_df, students_df, tmp_path, calculated)
+    assert calculated == {"S2"}
+    assert (tmp_path / "S2.txt").exists()
@@ -0,0 +1,117 @@
+import copy
+import dataclasses
+import multiprocessing
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from gpp_calculator import rules_toml
+
+
+def test_compile_rules(toml):
+    rules = rules_toml.compile_rules(toml)
+    assert [rule.name for rule in rules.categories] == ["Core", "Elective", "General"]
+    assert rules.categories[0] == rules_toml.CategoryRule(
+        "Core", 20, ("Core.*",), ("CoreHome.*",)
+    )
+    assert rules.secondary_categories == (
+        rules_toml.PoolRule("Elective", 8, ("Gen.*",)),
+    )
+    assert rules.lecture_columns["credit"] == "Credits"
+    assert rules.student_columns["grade"] == "Grade"
+    assert (rules.engine, rules.workers, rules.csv_encoding) == ("student", 1, "utf-8")
+
+
+@pytest.mark.parametrize(
+    "edit, message",
+    [
+        (
+            lambda t: t["categories"]["Core"].pop("max_credits"),
+            "categories.Core.max_credits must be a non-negative number: None",
+        ),
+        (
+            lambda t: t["secondary_categories"]["Elective"].pop("max_credits"),
+            "secondary_categories.Elective.max_credits must be a non-negative number",
+        ),
+        (
+            lambda t: t["categories"]["Core"].update(max_credits=-1),
+            "categories.Core.max_credits must be a non-negative number: -1",
+        ),
+        (
+            lambda t: t["secondary_categories"].update(
+                Extra={"max_credits": 4, "category": ["Gen.*"]}
+            ),
+            "secondary_categories.Extra is not named after a category",
+        ),
+        (
+            lambda t: t["categories"]["Core"].update(category=[]),
+            "categories.Core.category must not be empty",
+        ),
+        (
+            lambda t: t["categories"]["Core"].update(category=["Core("]),
+            "categories.Core.category has an invalid pattern",
+        ),
+        (
+            lambda t: t["columns_in_lectures"].pop("credit"),
+            "columns_in_lectures.credit is not set",
+        ),
+        (
+            lambda t: t["params"].update(engine="turbo"),
+            "engine must be one of student, cohort: turbo",
+        ),
+        (lambda t: t["params"].update(workers=0), "workers must be 1 or more"),
+    ],
+)
+def test_invalid_rules(toml, edit, message):
+    edit(toml)
+    with pytest.raises(ValueError, match=re.escape(message)):
+        rules_toml.compile_rules(toml)
+
+
+def test_empty_secondary_pool(toml):
+    # The rules editor saves a new pool with no categories
+    toml["secondary_categories"]["Elective"]["category"] = []
+    rules = rules_toml.compile_rules(toml)
+    assert rules.secondary_categories[0].patterns == ()
+
+
+def test_compiled_rules_are_read_only(toml):
+    rules = rules_toml.compile_rules(toml)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        rules.engine = "cohort"
+    for mapping, key in [
+        (rules.toml, "params"),
+        (rules.toml["params"], "engine"),
+        (rules.toml["categories"]["Core"], "max_credits"),
+        (rules.lecture_columns, "key"),
+        (rules.student_columns, "key"),
+        (rules.grade_scale, "A"),
+    ]:
+        with pytest.raises(TypeError):
+            mapping[key] = "x"
+    assert rules.toml["categories"]["Core"]["category"] == ("Core.*",)
+
+
+def test_compile_rules_copies_the_toml(toml):
+    original = copy.deepcopy(toml)
+    rules = rules_toml.compile_rules(toml)
+    toml["categories"]["Core"]["category"].append("Elec.*")
+    toml["params"]["engine"] = "cohort"
+    assert rules_toml.thaw(rules.toml) == original
+    assert rules.digest == rules_toml.compile_rules(original).digest
+
+
+def test_compiled_rules_pickle(toml):
+    toml["grade_scale"] = {"秀": 4, "ｐ": 0.5}
+    rules = rules_toml.compile_rules(toml)
+    assert pickle.loads(pickle.dumps(rules)) == rules
+
+
+def test_compiled_rules_reach_spawned_workers(toml):
+    rules = rules_toml.compile_rules(toml)
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        assert executor.submit(getattr, rules, "digest").result() == rules.digest
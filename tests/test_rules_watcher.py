@@ -0,0 +1,120 @@
+import os
+import types
+
+import pytest
+import toml as toml_lib
+
+from gpp_calculator import rules_toml, rules_watcher
+
+
+def write(path, content):
+    """
+    Write rules.toml with an mtime later than the previous one, as the watcher
+    polls mtime and size.
+    """
+    mtime_ns = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+
+
+@pytest.fixture
+def watcher(tmp_path, toml):
+    path = tmp_path / "rules.toml"
+    write(path, toml_lib.dumps(toml))
+    rules = rules_toml.Rules(str(path))
+    rules.load_rules()
+    watcher = rules_watcher.RulesWatcher(rules)
+    watcher.calls = []
+    watcher.subscribe(lambda rules, error: watcher.calls.append(error))
+    return watcher
+
+
+def edit(watcher, toml, max_credits):
+    toml["categories"]["Core"]["max_credits"] = max_credits
+    write(watcher.rules.rules_toml_path, toml_lib.dumps(toml))
+
+
+def test_unchanged_file_is_not_reported(watcher):
+    assert not watcher.poll()
+    # Saved again with the same content
+    path = watcher.rules.rules_toml_path
+    write(path, open(path, encoding="utf-8").read())
+    assert not watcher.poll()
+    assert watcher.calls == []
+
+
+def test_changed_file_is_reloaded(watcher, toml):
+    digest = watcher.rules.get_compiled_rules().digest
+    edit(watcher, toml, 3)
+    assert watcher.poll()
+    assert watcher.calls == [None]
+    assert watcher.rules.toml["categories"]["Core"]["max_credits"] == 3
+    assert watcher.rules.get_compiled_rules().digest != digest
+    assert not watcher.poll()
+    assert watcher.calls == [None]
+
+
+def test_invalid_file_keeps_the_rules(watcher, toml):
+    write(watcher.rules.rules_toml_path, "[categories\n")
+    assert not watcher.poll()
+    assert len(watcher.calls) == 1
+    assert isinstance(watcher.calls[0], ValueError)
+    assert watcher.error is watcher.calls[0]
+    assert watcher.rules.toml["categories"]["Core"]["max_credits"] == 20
+
+    edit(watcher, toml, 3)
+    assert watcher.poll()
+    assert watcher.calls[1:] == [None]
+    assert watcher.error is None
+
+
+def test_missing_file_keeps_the_rules(watcher):
+    os.remove(watcher.rules.rules_toml_path)
+    assert not watcher.poll()
+    assert watcher.calls == []
+    assert watcher.rules.toml is not None
+
+
+class Var:
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+def test_results_are_marked_outdated(watcher, toml):
+    from gpp_calculator.app_calculator import App
+
+    # The parts of App that _on_rules_changed uses, after a calculation
+    app = types.SimpleNamespace(
+        toml=watcher.rules.toml,
+        results_rules=watcher.rules.get_compiled_rules(),
+        error_var=Var(),
+        _rules_message="",
+    )
+    watcher.subscribe(lambda rules, error: App._on_rules_changed(app, rules, error))
+
+    edit(watcher, toml, 3)
+    watcher.poll()
+    assert "Results are outdated" in app.error_var.get()
+    assert app.toml["categories"]["Core"]["max_credits"] == 3
+
+    write(watcher.rules.rules_toml_path, "[categories\n")
+    watcher.poll()
+    assert app.error_var.get().startswith("Invalid rules.toml")
+
+    # Back to the rules the results were calculated with
+    edit(watcher, toml, 20)
+    watcher.poll()
+    assert app.error_var.get() == ""
+
+    # A comment changes the file but not the rules; other errors are left alone
+    app.error_var.set("students.csv not found.")
+    write(watcher.rules.rules_toml_path, "# edited\n" + toml_lib.dumps(toml))
+    assert watcher.poll()
+    assert app.error_var.get() == "students.csv not found."
@@ -0,0 +1,61 @@
+import copy
+import os
+
+import pytest
+
+from benchmarks import synth
+from gpp_calculator import calculator, rules_toml
+
+SCALE = synth.Scale(n_lectures=200, n_students=40, grades_per_student=15, n_pools=2)
+
+
+@pytest.fixture(scope="module")
+def inputs(tmp_path_factory):
+    toml, lectures_df, students_df = synth.make_scaled_inputs(SCALE)
+    # params.stream_students needs the rows of a student together
+    students_df = students_df.sort_values("Student ID", kind="stable")
+    dir_path = tmp_path_factory.mktemp("inputs")
+    synth.write_inputs(dir_path, toml, lectures_df, students_df)
+    return toml, dir_path
+
+
+def calc(inputs, log_path, engine, **params):
+    toml, dir_path = inputs
+    toml = copy.deepcopy(toml)
+    toml["params"].update(engine=engine, incremental=False, csv_cache=False, **params)
+    lec, students = calculator.load_inputs(
+        toml, str(dir_path / "lectures.csv"), str(dir_path / "students.csv")
+    )
+    os.makedirs(log_path)
+    rules = rules_toml.compile_rules(toml)
+    return calculator.calc_students(rules, lec, students, str(log_path))
+
+
+def reports(log_path):
+    return {
+        name: (log_path / name).read_text(encoding="utf-8")
+        for name in os.listdir(log_path)
+    }
+
+
+@pytest.mark.parametrize("engine", ["student", "cohort"])
+@pytest.mark.parametrize("chunk_rows", [1, 7, 15, 100_000])
+def test_streamed_students_match_table(
+    inputs, tmp_path, monkeypatch, engine, chunk_rows
+):
+    """
+    Students split across chunks (and across batches of calculated students)
+    get the same results and reports as when students.csv is read at once.
+    """
+    expected = calc(inputs, tmp_path / "table", engine)
+    monkeypatch.setattr(calculator, "STREAM_BATCH_STUDENTS", 3)
+    actual = calc(
+        inputs,
+        tmp_path / "stream",
+        engine,
+        stream_students=True,
+        stream_chunk_rows=chunk_rows,
+    )
+    assert len(actual) == SCALE.n_students
+    assert actual == expected
+    assert reports(tmp_path / "stream") == reports(tmp_path / "table")
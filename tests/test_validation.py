@@ -0,0 +1,80 @@
+import copy
+
+import pytest
+
+from gpp_calculator import calculator, rules_toml, validation
+
+# From the fixtures in conftest.py
+EXPECTED = {
+    "undefined_lectures": {"S1": ["LX"], "S3": ["LX"]},
+    "unmatched_categories": {"Lab": ["L6"], "Closed": ["L7"]},
+    "unknown_grades": {"P": 1, "x": 1},
+}
+
+
+def calc(inputs_dir, toml, log_path, **params):
+    toml = copy.deepcopy(toml)
+    toml["params"].update(incremental=False, csv_cache=False, **params)
+    lec, students = calculator.load_inputs(
+        toml, str(inputs_dir / "lectures.csv"), str(inputs_dir / "students.csv")
+    )
+    log_path.mkdir()
+    report_dict = {}
+    calculator.calc_students(
+        rules_toml.compile_rules(toml),
+        lec,
+        students,
+        str(log_path),
+        validation_report=report_dict,
+    )
+    return report_dict
+
+
+@pytest.mark.parametrize("engine", ["student", "cohort"])
+@pytest.mark.parametrize(
+    "params",
+    [{}, {"stream_students": True, "stream_chunk_rows": 1}],
+    ids=["table", "streamed"],
+)
+def test_issues_are_reported_once_per_run(
+    inputs_dir, toml, tmp_path, monkeypatch, capsys, engine, params
+):
+    # Streamed students are also checked one at a time
+    monkeypatch.setattr(calculator, "STREAM_BATCH_STUDENTS", 1)
+    report_dict = calc(inputs_dir, toml, tmp_path / "log", engine=engine, **params)
+    assert report_dict == EXPECTED
+    assert capsys.readouterr().out.count("Validation:") == 1
+    assert validation.summary(report_dict) == (
+        "Validation: 2 students have lectures missing from lectures.csv"
+        " (1 distinct), 2 categories of lectures.csv match no category in"
+        " rules.toml, 2 grade rows have an unknown grade"
+    )
+
+
+def test_report_is_reset_every_run(inputs_dir, toml, tmp_path):
+    assert calc(inputs_dir, toml, tmp_path / "first") == EXPECTED
+    assert calc(inputs_dir, toml, tmp_path / "second") == EXPECTED
+
+
+def test_retaken_undefined_lecture_is_listed_once(
+    inputs_dir, toml, students_df, tmp_path
+):
+    # S1 takes LX again in a later chunk, and S2 takes it twice
+    students_df.loc[len(students_df)] = ["S1", "Alice", "LX", "B"]
+    students_df.loc[len(students_df)] = ["S2", "Bob", "LX", "A"]
+    students_df.loc[len(students_df)] = ["S2", "Bob", "LX", "x"]
+    students_df = students_df.sort_values("Student ID", kind="stable")
+    students_df.to_csv(inputs_dir / "students.csv", index=False)
+    report_dict = calc(
+        inputs_dir,
+        toml,
+        tmp_path / "log",
+        stream_students=True,
+        stream_chunk_rows=2,
+    )
+    assert report_dict["undefined_lectures"] == {
+        "S1": ["LX"],
+        "S2": ["LX"],
+        "S3": ["LX"],
+    }
+    assert report_dict["unknown_grades"] == {"P": 1, "x": 2}